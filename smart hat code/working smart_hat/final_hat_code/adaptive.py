@@ -0,0 +1,92 @@
+# Smart Hat adaptive inference rate
+# Decides per captured frame whether the detector has to run. A tiny
+# grayscale thumbnail of the lores frame is compared with the one from the
+# last inference; a still wearer looking at a still scene drops to one
+# inference every couple of seconds, while walking, a near obstacle or a
+# changing scene brings it straight back to every frame.
+
+import collections
+import time
+
+import cv2
+import numpy as np
+
+
+class AdaptiveInference:
+    def __init__(self, min_interval=0.0, idle_interval=0.5, max_interval=2.0, change_low=0.02, change_high=0.08,
+                 near_cm=150, thumb_size=(32, 24)):
+        self.min_interval = min_interval      # seconds between inferences when anything is happening
+        self.idle_interval = idle_interval    # ... when the scene changes a little
+        self.max_interval = max_interval      # ... when nothing changes at all
+        self.change_low = change_low          # mean absolute difference, 0..1
+        self.change_high = change_high
+        self.near_cm = near_cm
+        self.thumb_size = thumb_size
+        self.max_fps = 0                      # hard cap set by the performance governor, 0 = none
+        self._ref = None
+        self._last_run = 0.0
+        self._runs = collections.deque(maxlen=64)
+        self.inferred = 0
+        self.skipped = 0
+        self.score = 0.0
+        self.interval = min_interval
+        self.reason = "start"
+
+    def _thumb(self, lores):
+        thumb = cv2.resize(lores, self.thumb_size, interpolation=cv2.INTER_AREA)
+        if thumb.ndim == 3:
+            thumb = thumb.mean(axis=2)
+        return thumb.astype(np.float32) / 255.0
+
+    def decide(self, lores, now, motion_active=False, nearest_cm=None, adaptive=True):
+        """Return True if this frame should go through the detector.
+
+        With adaptive=False only the max_fps cap applies.
+        """
+        thumb = self._thumb(lores) if adaptive else None
+        # Compared with the last inferred frame, so slow drift still adds up
+        self.score = float(np.abs(thumb - self._ref).mean()) if adaptive and self._ref is not None else 1.0
+
+        if not adaptive:
+            self.interval, self.reason = self.min_interval, "fixed"
+        elif self.score >= self.change_high:
+            self.interval, self.reason = self.min_interval, "scene change"
+        elif motion_active:
+            self.interval, self.reason = self.min_interval, "motion"
+        elif nearest_cm is not None and nearest_cm < self.near_cm:
+            self.interval, self.reason = self.min_interval, "proximity"
+        else:
+            # Linear between max_interval (static) and idle_interval (almost a scene change)
+            frac = min(1.0, max(0.0, (self.score - self.change_low) / (self.change_high - self.change_low)))
+            self.interval = self.max_interval + frac * (self.idle_interval - self.max_interval)
+            self.reason = "static" if frac == 0.0 else "drift"
+        if self.max_fps and self.interval < 1.0 / self.max_fps:
+            self.interval = 1.0 / self.max_fps
+            self.reason += ", capped"
+
+        if now - self._last_run < self.interval:
+            self.skipped += 1
+            return False
+        self._ref = thumb
+        self._last_run = now
+        self._runs.append(now)
+        self.inferred += 1
+        return True
+
+    def effective_fps(self, now=None):
+        if len(self._runs) < 2:
+            return 0.0
+        now = now or self._runs[-1]
+        # Stretch the window to now, so a long pause shows up as a low rate
+        span = max(now, self._runs[-1]) - self._runs[0]
+        return round((len(self._runs) - 1) / span, 2) if span > 0 else 0.0
+
+    def stats(self):
+        return {
+            "effective_fps": self.effective_fps(time.time()),
+            "interval_s": round(self.interval, 2),
+            "change_score": round(self.score, 4),
+            "reason": self.reason,
+            "inferred": self.inferred,
+            "skipped": self.skipped,
+        }
@@ -0,0 +1,93 @@
+# Smart Hat time-series aggregation
+# Shrinks long histories to roughly one point per chart pixel before they are
+# sent to the browser: min/max/mean buckets for multi-series charts and LTTB
+# for single series where the visual shape matters more than the envelope.
+
+import numpy as np
+import pandas as pd
+
+
+def time_slice(df, start=None, end=None, x='timestamp'):
+    if df.empty or x not in df.columns:
+        return df
+    mask = np.ones(len(df), dtype=bool)
+    if start is not None:
+        mask &= (df[x] >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        mask &= (df[x] <= pd.Timestamp(end)).to_numpy()
+    return df[mask] if not mask.all() else df
+
+
+def bucket_stats(df, columns, n_buckets, x='timestamp'):
+    """Equal-width time buckets with mean, min and max per column.
+
+    Returns one row per non-empty bucket: `x` (bucket start), each column as
+    its mean, plus `<column>_min` and `<column>_max`.
+    """
+    columns = [c for c in columns if c in df.columns]
+    if df.empty or not columns or n_buckets <= 0:
+        return pd.DataFrame()
+
+    t = df[x].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    t0 = t.min()
+    width = max(1, (t.max() - t0) // n_buckets + 1)
+    bucket = (t - t0) // width
+
+    values = df[columns].apply(pd.to_numeric, errors='coerce')
+    grouped = values.groupby(bucket)
+    out = grouped.mean()
+    mins = grouped.min().add_suffix('_min')
+    maxs = grouped.max().add_suffix('_max')
+    out = pd.concat([out, mins, maxs], axis=1)
+    out.insert(0, x, pd.to_datetime(t0 + out.index.to_numpy() * width))
+    return out.reset_index(drop=True)
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: indices of the n_out points that best keep the shape."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket is the third triangle vertex
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nlo:nhi].mean()
+        avg_y = y[nlo:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def lttb(df, column, n_out, x='timestamp'):
+    if df.empty or column not in df.columns:
+        return df
+    data = df[[x, column]].copy()
+    data[column] = pd.to_numeric(data[column], errors='coerce')
+    data = data.dropna()
+    t = data[x].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    return data.iloc[lttb_indices(t, data[column].to_numpy(), n_out)].reset_index(drop=True)
+
+
+def downsample(df, columns, width_px, start=None, end=None, method='minmax', x='timestamp'):
+    """Slice to [start, end] and reduce to about one point per pixel.
+
+    method is 'minmax' (bucket mean/min/max, any number of columns) or 'lttb'
+    (single column). Small frames are returned unchanged.
+    """
+    if width_px < 1:
+        raise ValueError(f"width_px must be at least 1, got {width_px}")
+    df = time_slice(df, start, end, x)
+    if df.empty or len(df) <= width_px:
+        return df
+    if method == 'lttb' and len(columns) == 1:
+        return lttb(df, columns[0], width_px, x)
+    return bucket_stats(df, columns, width_px, x)
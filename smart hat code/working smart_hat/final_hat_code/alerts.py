@@ -0,0 +1,267 @@
+# Smart Hat alert arbiter
+# Every spoken message goes through one queue ordered by severity. Equivalent
+# messages share a key: a queued one is updated in place instead of queued
+# twice, and a key that was just spoken is not repeated. Critical alerts do
+# not wait for a battery or detection message to finish, they interrupt it,
+# and criticals that are due together are spoken as one sentence.
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+SEVERITY = {"critical": 0, "warning": 1, "info": 2}
+# Seconds before the same key may be spoken again at the same severity
+REPEAT_AFTER = {"critical": 2.0, "warning": 4.0, "info": 5.0}
+# A message that waited longer than this is no longer worth saying
+MAX_AGE = {"critical": 1.5, "warning": 4.0, "info": 10.0}
+WORDS_PER_SECOND = 2.5
+
+
+class Alert:
+    __slots__ = ("message", "severity", "rank", "key", "event_time", "arrived", "repeat_after", "max_age", "seq",
+                 "on_drop")
+
+    def __init__(self, message, severity, key, event_time, repeat_after, max_age, seq, on_drop=None):
+        self.message = message
+        self.severity = severity
+        self.rank = SEVERITY[severity]
+        self.key = key
+        self.event_time = event_time
+        self.arrived = time.time()
+        self.repeat_after = repeat_after
+        self.max_age = max_age
+        self.seq = seq
+        self.on_drop = [on_drop] if on_drop else []
+
+
+def _speech_seconds(message):
+    return len(message.split()) / WORDS_PER_SECOND + 0.3
+
+
+def merge_messages(messages):
+    """One sentence for several alerts: shared leading words are said once.
+
+    "Stop. Obstacle on left at 40 cm" + "Stop. Obstacle on right at 55 cm"
+    -> "Stop. Obstacle on left at 40 cm and right at 55 cm"
+    """
+    if len(messages) == 1:
+        return messages[0]
+    words = [m.split() for m in messages]
+    common = 0
+    while all(len(w) > common + 1 and w[common] == words[0][common] for w in words):
+        common += 1
+    if not common:
+        return ". ".join(m.rstrip(".") for m in messages)
+    return " ".join(words[0][:common]) + " " + " and ".join(" ".join(w[common:]) for w in words)
+
+
+def _call_drops(callbacks):
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception as e:
+            print("[ALERT] on_drop callback failed:", e)
+
+
+class AlertArbiter:
+    """Single speaker for all alert sources.
+
+    emit(message, severity, interrupt) is called from the arbiter thread;
+    interrupt is True when a critical alert cuts off a lower one still being
+    spoken. A submit's on_drop() is called if that alert ends up never being
+    spoken (repeat, expired or failed to emit), so callers can undo cooldowns.
+    """
+
+    def __init__(self, emit, coalesce_window=0.15, history=200):
+        self.emit = emit
+        self.coalesce_window = coalesce_window
+        self._cond = threading.Condition()
+        self._heap = []          # (rank, event_time, seq, key), stale entries skipped on pop
+        self._queued = {}        # key -> Alert
+        self._seq = itertools.count()
+        self._last_spoken = {}   # key -> (rank, time)
+        self._busy_until = 0.0
+        self._critical_until = 0.0   # end of the last critical utterance
+        self._speaking_rank = None
+        self._running = False
+        self._thread = None
+        self.counters = {"submitted": 0, "spoken": 0, "deduped": 0, "coalesced": 0, "merged": 0,
+                         "expired": 0, "preempted": 0, "errors": 0}
+        self._latency = {severity: deque(maxlen=history) for severity in SEVERITY}
+
+    def submit(self, message, severity="info", key=None, event_time=None, repeat_after=None, max_age=None,
+               on_drop=None):
+        """Queue a message; returns False if it was dropped as a repeat."""
+        if not message:
+            return False
+        if self._queue(message, severity, key, event_time, repeat_after, max_age, on_drop):
+            return True
+        if on_drop:
+            _call_drops([on_drop])
+        return False
+
+    def _queue(self, message, severity, key, event_time, repeat_after, max_age, on_drop):
+        now = time.time()
+        key = key or message
+        rank = SEVERITY[severity]
+        repeat_after = REPEAT_AFTER[severity] if repeat_after is None else repeat_after
+        with self._cond:
+            self.counters["submitted"] += 1
+            last = self._last_spoken.get(key)
+            if last and last[0] <= rank and now - last[1] < repeat_after:
+                self.counters["deduped"] += 1
+                return False
+
+            queued = self._queued.get(key)
+            if queued:
+                # Newest wording wins; the older event time keeps the latency honest
+                self.counters["coalesced"] += 1
+                queued.message = message
+                if on_drop:
+                    queued.on_drop.append(on_drop)
+                if rank < queued.rank:
+                    # An escalation is a new event; ageing it from the old one could expire it unspoken
+                    queued.severity, queued.rank = severity, rank
+                    queued.event_time = event_time or now
+                    queued.max_age = MAX_AGE[severity] if max_age is None else max_age
+                    queued.seq = next(self._seq)
+                    heapq.heappush(self._heap, (rank, queued.event_time, queued.seq, key))
+                    self._cond.notify()
+                return True
+
+            alert = Alert(message, severity, key, event_time or now, repeat_after,
+                          MAX_AGE[severity] if max_age is None else max_age, next(self._seq), on_drop)
+            self._queued[key] = alert
+            heapq.heappush(self._heap, (rank, alert.event_time, alert.seq, key))
+            self._cond.notify()
+        return True
+
+    def _head(self):
+        while self._heap:
+            rank, _, seq, key = self._heap[0]
+            alert = self._queued.get(key)
+            if alert is not None and alert.seq == seq:
+                return alert
+            heapq.heappop(self._heap)
+        return None
+
+    def _expired(self, alert, now):
+        # Time spent queued behind another critical does not count against a critical
+        start = max(alert.event_time, self._critical_until) if alert.rank == 0 else alert.event_time
+        return now - start > alert.max_age
+
+    def _next(self, dropped):
+        """Alerts to speak together, as a list; expired ones are appended to dropped.
+
+        Called with the lock held; blocks until an alert is due or the arbiter stops.
+        """
+        while self._running:
+            alert = self._head()
+            if alert is None:
+                self._cond.wait(0.5)
+                continue
+            now = time.time()
+            if alert.rank == 0:
+                # Critical only waits for another critical, never for lower messages
+                ready_at = self._busy_until if self._speaking_rank == 0 else now
+            else:
+                # Give simultaneous events a moment to arrive so the most severe one goes first
+                ready_at = max(alert.arrived + self.coalesce_window, self._busy_until)
+            if ready_at > now:
+                self._cond.wait(ready_at - now)
+                continue
+            heapq.heappop(self._heap)
+            del self._queued[alert.key]
+            batch = [alert]
+            if alert.rank == 0:
+                # Obstacles on both sides at once: one sentence, not one after the other
+                others = sorted((a for a in self._queued.values() if a.rank == 0), key=lambda a: a.seq)
+                for other in others:
+                    del self._queued[other.key]
+                batch += others
+            live = []
+            for item in batch:
+                if self._expired(item, now):
+                    self.counters["expired"] += 1
+                    dropped.append(item)
+                else:
+                    live.append(item)
+            if live or dropped:
+                # Return to run on_drop callbacks outside the lock
+                return live
+        return []
+
+    def _speak(self, batch):
+        now = time.time()
+        lead = batch[0]
+        message = merge_messages([alert.message for alert in batch])
+        with self._cond:
+            interrupt = (lead.rank == 0 and now < self._busy_until
+                         and self._speaking_rank is not None and self._speaking_rank > 0)
+            if interrupt:
+                self.counters["preempted"] += 1
+            for alert in batch:
+                self._last_spoken[alert.key] = (alert.rank, now)
+            self._busy_until = now + _speech_seconds(message)
+            if lead.rank == 0:
+                self._critical_until = self._busy_until
+            self._speaking_rank = lead.rank
+        try:
+            self.emit(message, lead.severity, interrupt)
+        except Exception as e:
+            print("[ALERT] Failed to emit:", e)
+            with self._cond:
+                self.counters["errors"] += 1
+            _call_drops([cb for alert in batch for cb in alert.on_drop])
+            return
+        with self._cond:
+            self.counters["spoken"] += len(batch)
+            self.counters["merged"] += len(batch) - 1
+            for alert in batch:
+                self._latency[alert.severity].append((time.time() - alert.event_time) * 1000)
+
+    def _run(self):
+        while self._running:
+            dropped = []
+            with self._cond:
+                batch = self._next(dropped)
+            _call_drops([cb for alert in dropped for cb in alert.on_drop])
+            if batch:
+                self._speak(batch)
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="alerts", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self.counters)
+            stats["queued"] = len(self._queued)
+            latency = {}
+            for severity, samples in self._latency.items():
+                if not samples:
+                    continue
+                ordered = sorted(samples)
+                latency[severity] = {
+                    "count": len(ordered),
+                    "avg_ms": round(sum(ordered) / len(ordered), 1),
+                    "p50_ms": round(ordered[len(ordered) // 2], 1),
+                    "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+                    "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 1),
+                    "max_ms": round(ordered[-1], 1),
+                }
+            stats["latency"] = latency
+        return stats
@@ -0,0 +1,236 @@
+# Smart Hat analytics dashboard
+# The Dash app behind /analytics/. Dash, plotly and pandas take seconds to
+# import on the Pi, so new_app.py only imports this module on the first
+# request under /analytics/ and mounts the result as a WSGI app there.
+
+import math
+import time
+
+import dash_bootstrap_components as dbc
+import pandas as pd
+import plotly.express as px
+from dash import Dash, dcc, html, Input, Output
+
+from aggregation import downsample, time_slice
+from dashboard_data import IncrementalCollection, StoreCollection, TTLCache, flatten_ultrasonic
+
+# Every open tab fires the same callbacks each interval; they share one fetch
+# and one figure per DASHBOARD_CACHE_TTL seconds
+DASHBOARD_CACHE_TTL = 8
+# Each collection is cached in memory and only new documents are fetched per tick
+DASHBOARD_RETENTION_HOURS = 24
+
+# Charts get roughly one point per pixel of their width over the chosen range
+DEFAULT_CHART_POINTS = 600
+# Widths are rounded up to one of these before they reach the cache, so tabs
+# of slightly different sizes share one figure instead of one each
+CHART_WIDTH_BUCKETS = (400, 600, 800, 1200, 1600)
+TIME_RANGE_OPTIONS = [
+    {"label": "Last 15 minutes", "value": 15},
+    {"label": "Last hour", "value": 60},
+    {"label": "Last 6 hours", "value": 360},
+    {"label": "Last 24 hours", "value": 1440},
+]
+
+CHART_INPUTS = [Input('interval', 'n_intervals'), Input('time-range', 'value'), Input('chart-width', 'data')]
+
+
+def layout():
+    # Layout with 6 graphs
+    return dbc.Container(fluid=True, children=[
+        html.H2("Smart Hat Analytics Dashboard", className="text-center my-4"),
+        # Refresh interval
+        dcc.Interval(id='interval', interval=10*1000, n_intervals=0),
+        dcc.Store(id='chart-width'),
+        dbc.Row([
+            dbc.Col(dcc.Dropdown(id='time-range', options=TIME_RANGE_OPTIONS, value=60, clearable=False), md=3),
+        ], className="mb-4"),
+        dbc.Row([
+            dbc.Col(dcc.Graph(id='battery-graph'), md=6),
+            dbc.Col(dcc.Graph(id='ultrasonic-graph'), md=6),
+        ], className="mb-4"),
+        dbc.Row([
+            dbc.Col(dcc.Graph(id='system-health-graph'), md=6),
+            dbc.Col(dcc.Graph(id='motion-status-graph'), md=6),
+        ], className="mb-4"),
+        dbc.Row([
+            dbc.Col(dcc.Graph(id='detection-log-graph'), md=6),
+            dbc.Col(dcc.Graph(id='system-health-heatmap'), md=6),
+        ], className="mb-4")
+    ])
+
+
+def width_bucket(width):
+    width = width or DEFAULT_CHART_POINTS
+    return next((bucket for bucket in CHART_WIDTH_BUCKETS if bucket >= width), CHART_WIDTH_BUCKETS[-1])
+
+
+def bucketed_width(fn):
+    def wrapper(tick, range_minutes, width):
+        return fn(tick, range_minutes, width_bucket(width))
+    return wrapper
+
+
+def chart_range(range_minutes):
+    end = pd.Timestamp(int(time.time() * 1000), unit='ms')
+    return end - pd.Timedelta(minutes=range_minutes or 60), end
+
+
+def chart_data(df, columns, range_minutes, width, method='minmax'):
+    # Slice to the selected range and bucket to about one point per pixel
+    start, end = chart_range(range_minutes)
+    df = downsample(df, columns, width or DEFAULT_CHART_POINTS, start=start, end=end, method=method)
+    if not df.empty:
+        df['formatted_time'] = df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    return df
+
+
+class Dashboard:
+    """Dash app on its own Flask server; callable as a WSGI app mounted at url_prefix."""
+
+    def __init__(self, db, is_paused, url_prefix='/analytics/', store=None):
+        self.is_paused = is_paused   # fetches return nothing while logs are being deleted
+        self.cache = TTLCache()
+        # The hat's own LocalStore when given: complete while offline, no Firestore reads
+        if store is not None:
+            source = lambda name, **kwargs: StoreCollection(store, name, DASHBOARD_RETENTION_HOURS, **kwargs)
+        else:
+            source = lambda name, **kwargs: IncrementalCollection(db, name, DASHBOARD_RETENTION_HOURS, **kwargs)
+        self.sources = {
+            'motion_logs': source('motion_logs'),
+            'battery_logs': source('battery_logs'),
+            'ultrasonic_logs': source('ultrasonic_logs', flatten=flatten_ultrasonic),
+            'system_health_logs': source('system_health_logs'),
+            'detection_logs': source('detection_logs'),
+        }
+
+        # Mounted under url_prefix by the main app, so routes are relative to it
+        self.dash_app = Dash(__name__, requests_pathname_prefix=url_prefix, routes_pathname_prefix='/',
+                             external_stylesheets=[dbc.themes.DARKLY])
+        self.dash_app.title = "Smart Hat Analytics"
+        self.dash_app.layout = layout()
+
+        # Half the window width, since charts sit two per row
+        self.dash_app.clientside_callback(
+            "function(n) { return Math.max(300, Math.floor(window.innerWidth / 2)); }",
+            Output('chart-width', 'data'),
+            Input('interval', 'n_intervals')
+        )
+        for graph, figure in [('battery-graph', self.update_battery),
+                              ('ultrasonic-graph', self.update_ultrasonic),
+                              ('system-health-graph', self.update_system_health),
+                              ('motion-status-graph', self.update_motion),
+                              ('detection-log-graph', self.update_detection_log),
+                              ('system-health-heatmap', self.update_health_heatmap)]:
+            self.dash_app.callback(Output(graph, 'figure'), *CHART_INPUTS)(
+                bucketed_width(self.cache.shared(DASHBOARD_CACHE_TTL)(figure)))
+
+    def __call__(self, environ, start_response):
+        return self.dash_app.server(environ, start_response)
+
+    def reset(self, collection=None):
+        # Forget cached documents after logs are deleted
+        for name, source in self.sources.items():
+            if collection is None or name == collection:
+                source.reset()
+        self.cache.invalidate()
+
+    def stats(self):
+        return self.cache.stats()
+
+    # --- CALLBACKS ---
+    def update_battery(self, n, range_minutes, width):
+        df = self.fetch('battery_logs')
+        if df.empty or 'battery_percentage' not in df.columns:
+            return px.line(title="No battery data available")
+        df = chart_data(df, ['battery_percentage'], range_minutes, width, method='lttb')
+        if df.empty:
+            return px.line(title="No battery data in this range")
+        return px.line(df, x='formatted_time', y='battery_percentage', title='Battery Level Over Time')
+
+    def update_ultrasonic(self, n, range_minutes, width):
+        df = self.fetch('ultrasonic_logs')
+        if df.empty or df.shape[1] <= 1:
+            return px.line(title="No ultrasonic data available")
+        sensors = list(df.columns.drop('timestamp'))
+        df = chart_data(df, sensors, range_minutes, width)
+        if df.empty:
+            return px.line(title="No ultrasonic data in this range")
+        return px.line(df, x='formatted_time', y=sensors, title='Ultrasonic Sensor Readings')
+
+    def update_system_health(self, n, range_minutes, width):
+        df = self.fetch('system_health_logs')
+        if df.empty:
+            return px.line(title="No system health data")
+        cols = [col for col in ['cpu', 'memory', 'temperature'] if col in df.columns]
+        if not cols:
+            return px.line(title="No system metrics available")
+        df = chart_data(df, cols, range_minutes, width)
+        if df.empty:
+            return px.line(title="No system health data in this range")
+        return px.line(df, x='formatted_time', y=cols, title='System Health Over Time')
+
+    def update_motion(self, n, range_minutes, width):
+        df = self.fetch('motion_logs')
+        if df.empty or 'motion_status' not in df.columns:
+            return px.line(title="No motion data")
+        df['motion_binary'] = (df['motion_status'].astype(str).str.lower() == 'active').astype(int)
+        # Bucketed, this becomes the fraction of each bucket spent moving
+        df = chart_data(df, ['motion_binary'], range_minutes, width)
+        if df.empty:
+            return px.line(title="No motion data in this range")
+        return px.line(df, x='formatted_time', y='motion_binary', title='Motion Activity Over Time')
+
+    def update_detection_log(self, n, range_minutes, width):
+        df = self.fetch_detection_counts()
+        if df.empty or 'detection_count' not in df.columns:
+            return px.bar(title="No detection log available")
+        start, end = chart_range(range_minutes)
+        df = time_slice(df, start, end)
+        # Counts are summed, not averaged, when there are more minutes than bars
+        bars = max(1, (width or DEFAULT_CHART_POINTS) // 4)
+        if len(df) > bars:
+            seconds = math.ceil((range_minutes or 60) * 60 / bars)
+            df = df.resample(f"{seconds}s", on='timestamp').sum(numeric_only=True).reset_index()
+        if df.empty:
+            return px.bar(title="No detections in this range")
+        df['formatted_time'] = df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
+        return px.bar(df, x='formatted_time', y='detection_count', title='Detections Over Time')
+
+    def update_health_heatmap(self, n, range_minutes, width):
+        df = self.fetch('system_health_logs')
+        if df.empty or 'timestamp' not in df.columns:
+            return px.imshow([[0]], title="No heatmap data available")
+        cols = list(df.select_dtypes(include='number').columns)
+        # A heatmap cell narrower than a few pixels is invisible anyway
+        df = chart_data(df, cols, range_minutes, max(1, (width or DEFAULT_CHART_POINTS) // 4))
+        if df.empty:
+            return px.imshow([[0]], title="No heatmap data in this range")
+        df = df.set_index('timestamp')[cols]
+        return px.imshow(df.T, aspect='auto', color_continuous_scale='Viridis', title='System Health Heatmap')
+
+    # --- FETCH FUNCTIONS ---
+    def cached_frame(self, collection):
+        # Concurrent callers share one refresh; each gets its own copy to modify
+        source = self.sources[collection]
+        return self.cache.get_or_compute(collection, source.refresh, DASHBOARD_CACHE_TTL).copy()
+
+    def fetch(self, collection):
+        if self.is_paused():
+            return pd.DataFrame()
+        try:
+            return self.cached_frame(collection)
+        except Exception as e:
+            print(f"[Fetch Error] {collection}:", e)
+            return pd.DataFrame()
+
+    def fetch_detection_counts(self):
+        df = self.fetch('detection_logs')
+        if 'timestamp' not in df.columns:
+            return pd.DataFrame()
+        try:
+            df['detection_count'] = 1
+            return df.groupby(pd.Grouper(key='timestamp', freq='1min')).sum(numeric_only=True).reset_index()
+        except Exception as e:
+            print("[Fetch Error] Detection:", e)
+            return pd.DataFrame()
@@ -0,0 +1,350 @@
+# Smart Hat benchmark
+# Replays a fixed frame source and ultrasonic trace through the same code
+# detection_loop and ultrasonic_loop run (perception.DetectionStages on a
+# FramePipeline, AlertArbiter, RangingScheduler, SensorFilter,
+# CollisionPredictor, and the sensor layout from settings.py) and writes one
+# JSON report, so runs can be diffed across commits.
+#
+#   python benchmark.py --frames 300 --out bench.json
+#   python benchmark.py --camera clip.mp4 --ranges ultrasonic.jsonl \
+#       --model mobilenet_v2.tflite --labels coco_labels.txt
+#   python benchmark.py --startup
+#
+# Without --model simulation.SyntheticDetector replaces the TFLite detector so
+# the harness runs anywhere; the report says which one was used. --startup
+# also boots new_app.py in "sim" mode and times each subsystem via /ready.
+
+import argparse
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+import simulation
+from alerts import AlertArbiter
+from collision import CollisionPredictor
+from model_registry import registry
+from pipeline import FramePipeline
+from perception import DetectionStages, ultrasonic_reading
+from ranging import RangingScheduler
+from sensor_filter import SensorFilter
+from settings import DEFAULT_CONFIG, FRAME_SIZE, LORES_SIZE, SENSORS, ULTRASONIC_GROUPS, ULTRASONIC_RATES_HZ
+from streaming import StreamHub, StreamProfile
+from tracking import ObjectTracker
+
+# Every frame is encoded, at the size and quality the clip buffer uses
+BENCH_PROFILE = StreamProfile(640, 480, 70, 1000)
+
+
+def percentiles(samples):
+    if not samples:
+        return {"count": 0}
+    a = np.asarray(samples, dtype=np.float64)
+    return {
+        "count": int(a.size),
+        "mean": round(float(a.mean()), 3),
+        "p50": round(float(np.percentile(a, 50)), 3),
+        "p95": round(float(np.percentile(a, 95)), 3),
+        "p99": round(float(np.percentile(a, 99)), 3),
+        "max": round(float(a.max()), 3),
+    }
+
+
+class Timed:
+    """Wraps a stage function and keeps every call's duration in ms."""
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.samples = []
+
+    def __call__(self, *args):
+        t0 = time.perf_counter()
+        try:
+            return self.fn(*args)
+        finally:
+            self.samples.append((time.perf_counter() - t0) * 1000)
+
+
+def perception_stages(camera, detector, alerts):
+    """detection_loop's stages as the app builds them, minus Socket.IO, Firestore and clips.
+
+    Every frame goes through the model (no adaptive skipping) and is encoded
+    once at BENCH_PROFILE.
+    """
+    hub = StreamHub()
+    hub.add_viewer(BENCH_PROFILE)
+    config = dict(DEFAULT_CONFIG, filter_classes=list(detector.labels.values()))
+    return DetectionStages(camera, detector, ObjectTracker(FRAME_SIZE), alerts, hub, FRAME_SIZE,
+                           settings=lambda: config)
+
+
+def run_perception(stages, frames, warmup):
+    # Threaded, like the app: capture, inference and encode overlap
+    capture, infer, encode = Timed(stages.capture), Timed(stages.infer), Timed(stages.encode)
+    done = threading.Event()
+    encoded = [0]
+    window = {}
+    # Per-frame time of each step inside the inference stage, from perception's stage timers
+    steps = {name: [] for name in ("inference", "postprocess", "tracking", "alerts")}
+
+    def counted_encode(packet):
+        # Frames past the budget still flow until the pipeline stops, but are not counted
+        if done.is_set():
+            return
+        encode(packet)
+        encoded[0] += 1
+        if encoded[0] > warmup:
+            for name, seconds in packet.get("stage_seconds", {}).items():
+                if name in steps:
+                    steps[name].append(seconds * 1000)
+        if encoded[0] == warmup:
+            window["start"] = time.perf_counter()
+        if encoded[0] == warmup + frames:
+            window["end"] = time.perf_counter()
+            done.set()
+
+    pipeline = FramePipeline(capture, infer, counted_encode)
+    stages.camera.start()
+    if warmup == 0:
+        window["start"] = time.perf_counter()
+    pipeline.start()
+    done.wait(timeout=max(60.0, frames))
+    end = window.get("end", time.perf_counter())
+    pipeline.stop()
+    snapshot = pipeline.snapshot()
+
+    measured = min(max(encoded[0] - warmup, 0), frames)
+    elapsed = end - window["start"] if "start" in window else 0.0
+    measured_window = slice(warmup, warmup + frames)
+    return {
+        "frames": measured,
+        "fps": round(measured / elapsed, 2) if elapsed > 0 else 0.0,
+        "captured": snapshot["capture"]["processed"],
+        "dropped": {name: s["dropped"] for name, s in snapshot.items()},
+        "track_events": stages.events,
+        # Warm-up calls are excluded so model load and first-frame costs do not skew the tail
+        # "infer_stage" is the whole pipeline stage; the model alone is "inference"
+        "stages_ms": dict(
+            capture=percentiles(capture.samples[measured_window]),
+            infer_stage=percentiles(infer.samples[measured_window]),
+            **{name: percentiles(samples) for name, samples in steps.items()},
+            encode=percentiles(encode.samples[measured_window]),
+        ),
+    }
+
+
+def run_allocations(stages, frames):
+    # Sequential and traced: how much Python-visible memory one frame allocates at its peak,
+    # and how many blocks stay allocated afterwards (a leak shows up as a positive number)
+    packets = [stages.capture() for _ in range(3)]
+    for packet in packets:
+        stages.encode(stages.infer(packet))
+    peaks = []
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    try:
+        for _ in range(frames):
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            stages.encode(stages.infer(stages.capture()))
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+    return {
+        "frames": frames,
+        "peak_bytes_per_frame": percentiles(peaks),
+        "retained_blocks_per_frame": round((sys.getallocatedblocks() - blocks_before) / max(1, frames), 2),
+    }
+
+
+def run_ranging(trace, alerts, seconds):
+    ranger = simulation.SimulatedRanging(SENSORS, trace).open()
+    scheduler = RangingScheduler(ranger, SENSORS, ULTRASONIC_GROUPS, ULTRASONIC_RATES_HZ)
+    filters = {name: SensorFilter() for name in SENSORS}
+    predictor = CollisionPredictor()
+    processing = []
+    readings = 0
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        for name, raw, stamp in scheduler.run_due():
+            t0 = time.perf_counter()
+            # Walking, as in the scripted trace; sensors listed in forward_sensors add the wearer's pace
+            ultrasonic_reading(name, raw, stamp, filters[name], predictor, alerts, DEFAULT_CONFIG, motion_active=True)
+            processing.append((time.perf_counter() - t0) * 1000)
+            readings += 1
+        time.sleep(scheduler.time_to_next())
+    ranger.close()
+    return {
+        "seconds": seconds,
+        "readings_per_s": round(readings / seconds, 1),
+        "processing_ms": percentiles(processing),
+    }
+
+
+def _get_json(url, timeout=2.0):
+    # /ready answers 503 with the same JSON body until the hat is ready
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return json.loads(e.read())
+
+
+def run_startup(timeout, camera=None, ranges=None):
+    """Boot new_app.py against simulated devices and report when each subsystem came up."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    data_dir = tempfile.mkdtemp(prefix="smart_hat_startup_")
+    env = dict(os.environ, SMART_HAT_HAL="sim", SMART_HAT_DIR=data_dir, SMART_HAT_PORT=str(port),
+               PYTHONUNBUFFERED="1")
+    for key, value in (("SMART_HAT_CAMERA", camera), ("SMART_HAT_RANGES", ranges)):
+        if value:
+            env[key] = value
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "new_app.py")
+    url = f"http://127.0.0.1:{port}"
+
+    log_path = os.path.join(data_dir, "app.log")
+    log = open(log_path, "w")
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, app_path], env=env, cwd=data_dir, stdout=log, stderr=subprocess.STDOUT)
+    result = {"timeout_s": timeout}
+    try:
+        report = None
+        deadline = t0 + timeout
+        while time.perf_counter() < deadline and proc.poll() is None:
+            try:
+                report = _get_json(f"{url}/ready")
+            except (OSError, ValueError):
+                time.sleep(0.05)
+                continue
+            if report["ready"] and "first_ready_s" not in result:
+                # Wall clock from spawn, including interpreter start and imports
+                result["first_ready_s"] = round(time.perf_counter() - t0, 3)
+            if report["subsystems"].get("detection") is not None or report.get("failed"):
+                # Up, or given up: either way there is nothing more to wait for
+                break
+            time.sleep(0.1)
+
+        if report is not None and proc.poll() is None:
+            # The dashboard is built by the first request under /analytics/
+            t1 = time.perf_counter()
+            try:
+                urllib.request.urlopen(f"{url}/analytics/", timeout=timeout).read()
+                result["analytics_first_request_s"] = round(time.perf_counter() - t1, 3)
+            except OSError as e:
+                result["analytics_error"] = str(e)
+            report = _get_json(f"{url}/ready")
+        result["subsystems_s"] = report["subsystems"] if report else {}
+        if report and report.get("failed"):
+            result["failed"] = report["failed"]
+        result["exit_code"] = proc.poll()
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        log.close()
+    if result["exit_code"] is not None:
+        # The app died on its own; its last words are usually the reason
+        with open(log_path) as f:
+            result["error"] = (f.read().strip().splitlines() or [""])[-1]
+    result["log"] = log_path
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Smart Hat perception and alert pipeline")
+    parser.add_argument("--frames", type=int, default=300, help="frames to measure after warm-up")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--alloc-frames", type=int, default=30, help="frames for the tracemalloc pass, 0 to skip")
+    parser.add_argument("--ranging-seconds", type=float, default=10.0)
+    parser.add_argument("--camera", help="video file or image directory (default: synthetic scene)")
+    parser.add_argument("--ranges", help="ultrasonic trace, JSONL or CSV (default: scripted walk)")
+    parser.add_argument("--model", help="TFLite model (default: synthetic detector)")
+    parser.add_argument("--labels", help="label file for --model")
+    parser.add_argument("--startup", action="store_true", help="also time a full new_app.py boot in sim mode")
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    spoken = []
+    alerts = AlertArbiter(lambda message, severity, interrupt: spoken.append(severity))
+    alerts.start()
+
+    camera = simulation.open_camera(args.camera, FRAME_SIZE, LORES_SIZE, realtime=False)
+    detector = registry.detector(args.model, args.labels) if args.model else simulation.SyntheticDetector()
+    stages = perception_stages(camera, detector, alerts)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "time": int(time.time()),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "detector": "tflite" if args.model else "synthetic",
+            "camera": args.camera or "synthetic",
+            "ranges": args.ranges or "scripted",
+        },
+    }
+    # The ranging thread runs alongside the perception pipeline, as on the hat
+    ranging_result = {}
+    ranging_thread = threading.Thread(
+        target=lambda: ranging_result.update(run_ranging(simulation.open_trace(args.ranges, SENSORS), alerts,
+                                                         args.ranging_seconds)), daemon=True)
+    ranging_thread.start()
+    report["perception"] = run_perception(stages, args.frames, args.warmup)
+    ranging_thread.join()
+    report["ranging"] = ranging_result
+    if args.alloc_frames:
+        report["allocations"] = run_allocations(stages, args.alloc_frames)
+    camera.stop()
+    detector.close()
+
+    alerts.stop()
+    alert_stats = alerts.stats()
+    report["alerts"] = {
+        "spoken": alert_stats["spoken"],
+        "deduped": alert_stats["deduped"],
+        "expired": alert_stats["expired"],
+        # Event time (capture or ping) to the moment the speak message is emitted
+        "event_to_speak_ms": alert_stats["latency"],
+    }
+    if args.startup:
+        report["startup"] = run_startup(args.startup_timeout, args.camera, args.ranges)
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report["memory"] = {"peak_rss_mb": round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)}
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+        print(f"[BENCH] Wrote {args.out}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# Smart Hat alert clips
+# The detection pipeline drops every encoded clip frame into a ring buffer
+# bounded by bytes. An alert only marks a time window; a background thread
+# waits for the post-roll to arrive and writes pre-roll + post-roll from the
+# buffer, so clips never touch the camera or run the model a second time.
+# Clips are therefore exactly what that stream carried: the CLIP_STREAM size,
+# quality and rate from settings.py, capped further by the governor, with
+# boxes only when render_mode is "inplace" ("metadata" draws none into frames).
+
+import collections
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class FrameRing:
+    """Recent JPEG frames with their capture time, oldest dropped first."""
+
+    def __init__(self, max_bytes=24 * 1024 * 1024, max_age=15.0):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._frames = collections.deque()   # (time, jpeg bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def push(self, jpeg, t):
+        with self._lock:
+            self._frames.append((t, jpeg))
+            self._bytes += len(jpeg)
+            while self._frames and (self._bytes > self.max_bytes or t - self._frames[0][0] > self.max_age):
+                _, old = self._frames.popleft()
+                self._bytes -= len(old)
+                self.evicted += 1
+
+    def window(self, start, end):
+        with self._lock:
+            return [(t, jpeg) for t, jpeg in self._frames if start <= t <= end]
+
+    def newest_time(self):
+        with self._lock:
+            return self._frames[-1][0] if self._frames else None
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            span = self._frames[-1][0] - self._frames[0][0] if len(self._frames) > 1 else 0.0
+            return {"frames": len(self._frames), "bytes": self._bytes, "seconds": round(span, 1),
+                    "evicted": self.evicted}
+
+
+def write_clip(frames, filename):
+    """Decode JPEG frames and write them as an XVID AVI at their measured frame rate."""
+    first = cv2.imdecode(np.frombuffer(frames[0][1], np.uint8), cv2.IMREAD_COLOR)
+    height, width = first.shape[:2]
+    span = frames[-1][0] - frames[0][0]
+    fps = min(30.0, max(1.0, (len(frames) - 1) / span)) if span > 0 else 10.0
+    out = cv2.VideoWriter(filename, cv2.VideoWriter_fourcc(*'XVID'), fps, (width, height))
+    try:
+        for _, jpeg in frames:
+            image = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+            if image is not None and image.shape[:2] == (height, width):
+                out.write(image)
+    finally:
+        out.release()
+    return fps
+
+
+class ClipRecorder:
+    """Turns alert triggers into clips built from a FrameRing.
+
+    on_clip(filename, info) is called from the recorder thread once the file
+    is written; it owns the file from then on (upload, delete).
+    """
+
+    def __init__(self, ring, video_dir, on_clip, pre_roll=3.0, post_roll=2.0, max_wait=5.0):
+        self.ring = ring
+        self.video_dir = video_dir
+        self.on_clip = on_clip
+        self.pre_roll = pre_roll
+        self.post_roll = post_roll
+        self.max_wait = max_wait      # give up waiting for post-roll frames after this long
+        self.enabled = True
+        self._pending = collections.deque()   # [start, end, reason] windows, oldest first
+        self._cond = threading.Condition()
+        self._thread = None
+        self.counters = {"triggered": 0, "merged": 0, "written": 0, "empty": 0, "errors": 0}
+
+    def trigger(self, event_time, reason=""):
+        """Request a clip around event_time; overlapping requests extend one clip."""
+        if not self.enabled:
+            return False
+        with self._cond:
+            self.counters["triggered"] += 1
+            last = self._pending[-1] if self._pending else None
+            if last and event_time - self.pre_roll <= last[1]:
+                last[1] = max(last[1], event_time + self.post_roll)
+                self.counters["merged"] += 1
+            else:
+                self._pending.append([event_time - self.pre_roll, event_time + self.post_roll, reason])
+            self._cond.notify()
+        self._ensure_thread()
+        return True
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="clips", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                start, end, reason = self._pending[0]
+                # Wait until post-roll frames are in the buffer (or the camera stalled)
+                newest = self.ring.newest_time()
+                if (newest is None or newest < end) and time.time() < end + self.max_wait:
+                    self._cond.wait(0.2)
+                    continue
+                self._pending.popleft()
+            self._write(start, end, reason)
+
+    def _write(self, start, end, reason):
+        frames = self.ring.window(start, end)
+        if not frames:
+            print("[VIDEO] No buffered frames for clip window, skipping")
+            self.counters["empty"] += 1
+            return
+        os.makedirs(self.video_dir, exist_ok=True)
+        filename = os.path.join(self.video_dir, f"alert_{int(end)}.avi")
+        try:
+            fps = write_clip(frames, filename)
+        except Exception as e:
+            print("[VIDEO] Failed to write clip:", e)
+            self.counters["errors"] += 1
+            return
+        self.counters["written"] += 1
+        info = {"start": start, "end": end, "reason": reason, "frames": len(frames), "fps": round(fps, 1)}
+        print(f"[VIDEO] Wrote {filename} ({len(frames)} frames, {fps:.1f} fps, {reason})")
+        try:
+            self.on_clip(filename, info)
+        except Exception as e:
+            print("[VIDEO] Clip handler failed:", e)
+            self.counters["errors"] += 1
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self.counters)
+            stats["pending"] = len(self._pending)
+        stats["enabled"] = self.enabled
+        stats["buffer"] = self.ring.stats()
+        return stats
@@ -0,0 +1,91 @@
+# Smart Hat time-to-collision alerts
+# Decides obstacle warnings by predicted seconds to impact instead of a fixed
+# distance: a wall approached at walking pace is announced early, a chair the
+# wearer is standing next to is not announced over and over.
+
+import math
+import time
+
+WALKING_SPEED_CM_S = 120.0
+
+
+class CollisionPredictor:
+    def __init__(self, warn_ttc=2.5, critical_ttc=1.2, min_closing_cm_s=15.0, near_cm=25.0,
+                 cooldown=4.0, gps_max_age=5.0):
+        self.warn_ttc = warn_ttc
+        self.critical_ttc = critical_ttc
+        self.min_closing_cm_s = min_closing_cm_s
+        self.near_cm = near_cm            # always critical this close, moving or not
+        self.cooldown = cooldown
+        self.gps_max_age = gps_max_age
+        self._gps_speed_cm_s = None
+        self._gps_time = 0.0
+        self._last_alert = {}             # sensor -> (level, time)
+        self._previous = {}               # sensor -> entry should_alert replaced, for release()
+
+    def update_gps_speed(self, speed_kmh, now=None):
+        try:
+            self._gps_speed_cm_s = float(speed_kmh) * 100000 / 3600
+        except (TypeError, ValueError):
+            return
+        self._gps_time = now or time.time()
+
+    def wearer_speed(self, motion_active, now):
+        """Best guess of how fast the wearer walks forward, in cm/s."""
+        if self._gps_speed_cm_s is not None and now - self._gps_time < self.gps_max_age:
+            return self._gps_speed_cm_s
+        return WALKING_SPEED_CM_S if motion_active else 0.0
+
+    def assess(self, name, distance, sensor_closing_cm_s, motion_active=False, now=None, forward=False):
+        """Return {"ttc", "closing_cm_s", "level"}; level is None, "warn" or "critical".
+
+        forward marks a sensor that looks along the walking direction. Only
+        those get the wearer's pace as a floor on the closing speed; a sensor
+        looking sideways sees a wall being walked past at a constant distance.
+        """
+        now = now or time.time()
+        if not isinstance(distance, (int, float)):
+            return {"ttc": math.inf, "closing_cm_s": 0.0, "level": None}
+
+        closing = sensor_closing_cm_s or 0.0
+        if forward:
+            # A freshly seen obstacle has no velocity history yet; the wearer's
+            # own pace is a lower bound for anything straight ahead
+            closing = max(closing, self.wearer_speed(motion_active, now))
+
+        ttc = distance / closing if closing > self.min_closing_cm_s else math.inf
+        if distance < self.near_cm or ttc < self.critical_ttc:
+            level = "critical"
+        elif ttc < self.warn_ttc:
+            level = "warn"
+        else:
+            level = None
+        return {"ttc": ttc, "closing_cm_s": round(closing, 1), "level": level}
+
+    def should_alert(self, name, level, now=None):
+        """Cooldown per sensor, except that an escalation to critical always goes out."""
+        if level is None:
+            return False
+        now = now or time.time()
+        last_level, last_time = self._last_alert.get(name, (None, 0.0))
+        escalated = level == "critical" and last_level != "critical"
+        if not escalated and now - last_time < self.cooldown:
+            return False
+        self._previous[name] = self._last_alert.get(name)
+        self._last_alert[name] = (level, now)
+        return True
+
+    def release(self, name, now):
+        """Undo should_alert(name, ..., now) when that alert was never spoken.
+
+        The cooldown is only meant to start once the user has heard the
+        warning; a dropped alert must not silence the sensor.
+        """
+        last = self._last_alert.get(name)
+        if last is None or last[1] != now:
+            return   # a newer alert has taken its place
+        previous = self._previous.pop(name, None)
+        if previous is None:
+            del self._last_alert[name]
+        else:
+            self._last_alert[name] = previous
@@ -0,0 +1,218 @@
+# Smart Hat dashboard data layer
+# Keeps one DataFrame per log collection in memory and only asks for
+# documents it has not seen yet, so a dashboard refresh costs the same on day
+# 30 as on day 1. StoreCollection reads the hat's LocalStore, which has every
+# document even while offline; IncrementalCollection reads Firestore. A
+# shared TTL cache in front of them lets every open dashboard tab reuse one
+# fetch and one figure.
+
+import functools
+import threading
+import time
+
+import pandas as pd
+
+
+def flatten_ultrasonic(docs):
+    # ultrasonic_logs store readings as a nested map; the charts want one column per sensor
+    rows = []
+    for doc in docs:
+        if 'timestamp' in doc and 'readings' in doc:
+            row = {'timestamp': doc['timestamp']}
+            row.update(doc['readings'])
+            rows.append(row)
+    return rows
+
+
+class IncrementalCollection:
+    """In-memory tail of one Firestore collection, refreshed with a `timestamp >=` cursor.
+
+    The cursor is inclusive so documents written in the same millisecond as
+    the last one seen are not lost; the ids already seen at that timestamp
+    are skipped instead.
+    """
+
+    def __init__(self, db, collection, retention_hours=24, flatten=None):
+        self.db = db
+        self.collection = collection
+        self.retention_ms = int(retention_hours * 3600 * 1000)
+        self.flatten = flatten
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.df = pd.DataFrame()
+        self.last_ts = None
+        self._seen_at_last_ts = set()
+        self.fetched = 0
+
+    def _query(self, since_ms):
+        """(id, doc) pairs with timestamp >= since_ms, oldest first."""
+        query = self.db.collection(self.collection)
+        if since_ms is None:
+            # First load only pulls the retention window, not the whole history
+            since_ms = int(time.time() * 1000) - self.retention_ms
+        query = query.where('timestamp', '>=', since_ms)
+        return [(doc.id, doc.to_dict()) for doc in query.order_by('timestamp').stream()]
+
+    def _fetch(self):
+        docs = []
+        for doc_id, doc in self._query(self.last_ts):
+            if doc_id in self._seen_at_last_ts:
+                continue
+            docs.append(doc)
+            ts = doc.get('timestamp')
+            if not isinstance(ts, (int, float)):
+                continue
+            if self.last_ts is None or ts > self.last_ts:
+                self.last_ts, self._seen_at_last_ts = ts, {doc_id}
+            elif ts == self.last_ts:
+                self._seen_at_last_ts.add(doc_id)
+        return docs
+
+    def refresh(self):
+        """Fetch new documents, append, trim to the retention window and return a copy."""
+        with self._lock:
+            docs = self._fetch()
+            rows = self.flatten(docs) if self.flatten else docs
+            rows = [row for row in rows if isinstance(row.get('timestamp'), (int, float))]
+            if rows:
+                self.fetched += len(rows)
+                new = pd.DataFrame(rows)
+                new['timestamp'] = pd.to_datetime(new['timestamp'], unit='ms', errors='coerce')
+                new = new.dropna(subset=['timestamp'])
+                self.df = new if self.df.empty else pd.concat([self.df, new], ignore_index=True)
+                if not self.df['timestamp'].is_monotonic_increasing:
+                    # Documents uploaded late carry older timestamps; the charts expect time order
+                    self.df = self.df.sort_values('timestamp', kind='stable').reset_index(drop=True)
+
+            if not self.df.empty:
+                cutoff = pd.Timestamp(int(time.time() * 1000) - self.retention_ms, unit='ms')
+                if self.df['timestamp'].iloc[0] < cutoff:
+                    self.df = self.df[self.df['timestamp'] >= cutoff].reset_index(drop=True)
+            # Callers add columns for display, so never hand out the cached frame itself
+            return self.df.copy()
+
+    def stats(self):
+        return {"rows": len(self.df), "fetched": self.fetched, "last_ts": self.last_ts}
+
+
+class StoreCollection(IncrementalCollection):
+    """In-memory tail of one LocalStore collection, refreshed by row id."""
+
+    def __init__(self, store, collection, retention_hours=24, flatten=None):
+        self.store = store
+        super().__init__(None, collection, retention_hours, flatten)
+
+    def reset(self):
+        super().reset()
+        self.last_id = 0
+
+    def _fetch(self):
+        # First load only pulls the retention window, not the whole local history
+        start_ms = int(time.time() * 1000) - self.retention_ms if self.last_id == 0 else None
+        rows = self.store.since(self.collection, self.last_id, start_ms=start_ms)
+        if rows:
+            self.last_id = rows[-1][0]
+            stamps = [doc['timestamp'] for _, doc in rows if isinstance(doc.get('timestamp'), (int, float))]
+            if stamps:
+                self.last_ts = max([self.last_ts or 0] + stamps)
+        return [doc for _, doc in rows]
+
+    def stats(self):
+        stats = super().stats()
+        stats["last_id"] = self.last_id
+        return stats
+
+
+class TTLCache:
+    """Small TTL cache with single-flight refresh.
+
+    When an entry expires, the first caller recomputes it and any concurrent
+    callers for the same key wait for that result instead of repeating the work,
+    for at most wait_timeout seconds. Expired entries are dropped whenever the
+    cache reaches max_entries, and the soonest-expiring ones after that.
+    """
+
+    def __init__(self, max_entries=256, wait_timeout=30.0):
+        self.max_entries = max_entries
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._inflight = {}
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0, "evicted": 0, "timeouts": 0}
+
+    def _evict(self, now):
+        # Called with the lock held, only when the cache is full
+        expired = [key for key, (expires, _) in self._entries.items() if expires <= now]
+        for key in expired:
+            del self._entries[key]
+        overflow = len(self._entries) - self.max_entries + 1
+        if overflow > 0:
+            for key in sorted(self._entries, key=lambda k: self._entries[k][0])[:overflow]:
+                del self._entries[key]
+        self.counters["evicted"] += len(expired) + max(0, overflow)
+
+    def get_or_compute(self, key, fn, ttl):
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry and entry[0] > time.monotonic():
+                    self.counters["hits"] += 1
+                    return entry[1]
+                done = self._inflight.get(key)
+                leader = done is None
+                if leader:
+                    done = self._inflight[key] = threading.Event()
+                    self.counters["misses"] += 1
+                else:
+                    self.counters["coalesced"] += 1
+            if not leader:
+                # Loop back: either the leader stored a fresh value or it failed and we retry
+                if not done.wait(self.wait_timeout):
+                    with self._lock:
+                        self.counters["timeouts"] += 1
+                    raise TimeoutError(f"Gave up after {self.wait_timeout:g} s waiting for {key!r}")
+                continue
+            try:
+                value = fn()
+            except Exception:
+                with self._lock:
+                    self.counters["errors"] += 1
+                    del self._inflight[key]
+                done.set()
+                raise
+            with self._lock:
+                now = time.monotonic()
+                if key not in self._entries and len(self._entries) >= self.max_entries:
+                    self._evict(now)
+                self._entries[key] = (now + ttl, value)
+                del self._inflight[key]
+            done.set()
+            return value
+
+    def shared(self, ttl):
+        """Decorator for Dash callbacks whose first input is the refresh tick.
+
+        The tick differs per browser tab, so it is left out of the key; any
+        further arguments (time range, chart width) are part of it.
+        """
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(tick, *args):
+                return self.get_or_compute((fn.__name__,) + args, lambda: fn(tick, *args), ttl)
+            return wrapper
+        return decorator
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["entries"] = len(self._entries)
+        return stats
@@ -19,6 +19,7 @@ socket.on('speak', (data) => {
   if (data.message && !quietMode) {
     console.log("Speaking:", data.message);
     lastDetectionMessage = data.message;
+    if (data.interrupt) Speech.interrupt();
     speak(data.message);
     const logList = document.getElementById("detectionList");
     const newItem = document.createElement("li");
@@ -32,6 +33,39 @@ socket.on('speak', (data) => {
   }
 });
 
+// Boxes sent as metadata when the server runs with render_mode "metadata".
+// They arrive with every frame, so a quiet spell means the server went back
+// to "inplace" (or stalled) and the last boxes must not stay on screen.
+const OVERLAY_TIMEOUT_MS = 1000;
+let overlayTimer = null;
+
+function clearOverlay() {
+  const canvas = document.getElementById("videoOverlay");
+  if (canvas) canvas.getContext("2d").clearRect(0, 0, canvas.width, canvas.height);
+}
+
+socket.on('detections', (data) => {
+  const video = document.getElementById("liveVideo");
+  const canvas = document.getElementById("videoOverlay");
+  if (!video || !canvas) return;
+  clearTimeout(overlayTimer);
+  overlayTimer = setTimeout(clearOverlay, OVERLAY_TIMEOUT_MS);
+  canvas.width = video.clientWidth;
+  canvas.height = video.clientHeight;
+  const ctx = canvas.getContext("2d");
+  ctx.clearRect(0, 0, canvas.width, canvas.height);
+  const sx = canvas.width / data.width;
+  const sy = canvas.height / data.height;
+  ctx.lineWidth = 2;
+  ctx.font = "14px sans-serif";
+  (data.boxes || []).forEach(box => {
+    ctx.strokeStyle = "#00ff00";
+    ctx.strokeRect(box.x1 * sx, box.y1 * sy, (box.x2 - box.x1) * sx, (box.y2 - box.y1) * sy);
+    ctx.fillStyle = "#ffffff";
+    ctx.fillText(`${box.label} (${(box.score * 100).toFixed(1)}%)`, box.x1 * sx, Math.max(12, box.y1 * sy - 4));
+  });
+});
+
 function speakLastDetection() {
   if (!quietMode && lastDetectionMessage) {
     speak(lastDetectionMessage);
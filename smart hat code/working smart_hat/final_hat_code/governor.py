@@ -0,0 +1,109 @@
+# Smart Hat performance governor
+# Picks a performance profile from CPU temperature and battery level so the
+# hat slows itself down before the Pi starts thermal throttling or the
+# battery runs flat. Each signal has its own thresholds and a hysteresis
+# margin, and the governor only steps back up after a minimum dwell time.
+
+import time
+from collections import deque
+
+# Ordered from full speed to bare minimum; obstacle ranging never stops
+PROFILES = {
+    "performance": {"max_inference_fps": 0, "threads": 4, "stream_max_width": 2028, "stream_max_quality": 95,
+                    "stream_max_fps": 20, "ultrasonic_scale": 1.0, "record_clips": True},
+    "balanced": {"max_inference_fps": 10, "threads": 3, "stream_max_width": 1280, "stream_max_quality": 80,
+                 "stream_max_fps": 15, "ultrasonic_scale": 1.0, "record_clips": True},
+    "saver": {"max_inference_fps": 4, "threads": 2, "stream_max_width": 640, "stream_max_quality": 60,
+              "stream_max_fps": 8, "ultrasonic_scale": 0.5, "record_clips": False},
+    "critical": {"max_inference_fps": 1, "threads": 1, "stream_max_width": 320, "stream_max_quality": 50,
+                 "stream_max_fps": 4, "ultrasonic_scale": 0.5, "record_clips": False},
+}
+LEVELS = list(PROFILES)
+
+# Thresholds for entering balanced, saver and critical
+TEMP_C = (65.0, 72.0, 80.0)
+BATTERY_PCT = (50.0, 25.0, 10.0)
+TEMP_MARGIN = 5.0
+BATTERY_MARGIN = 5.0
+
+
+def _level(value, thresholds, current, margin, higher_is_worse):
+    if value is None:
+        return 0
+    if higher_is_worse:
+        level = sum(value >= t for t in thresholds)
+        held = sum(value >= t - margin for t in thresholds)
+    else:
+        level = sum(value <= t for t in thresholds)
+        held = sum(value <= t + margin for t in thresholds)
+    # Stay at the current level until the signal clears it by the margin
+    return max(level, min(current, held))
+
+
+class PerformanceGovernor:
+    def __init__(self, min_dwell=30.0):
+        self.min_dwell = min_dwell
+        self.level = 0
+        self.changed_at = 0.0
+        self.reason = "startup"
+        self.signals = {}
+        # Each signal keeps its own hysteresis, so one that has cleared never
+        # holds the profile down on the strength of the other's level
+        self.signal_levels = {"temperature": 0, "battery": 0}
+        self.history = deque(maxlen=10)
+
+    @property
+    def profile_name(self):
+        return LEVELS[self.level]
+
+    @property
+    def profile(self):
+        return PROFILES[self.profile_name]
+
+    def update(self, temperature=None, battery=None, plugged=False, cpu=None, override=None, now=None):
+        """Feed one sample; returns True if the active profile changed."""
+        now = now or time.time()
+        self.signals = {"temperature": temperature, "battery": battery, "plugged": plugged, "cpu": cpu}
+
+        if override in PROFILES:
+            target, reason = LEVELS.index(override), "manual"
+        else:
+            target, reason = self._target(temperature, battery, plugged)
+
+        if target == self.level:
+            if reason != "manual":
+                # Same profile, but the signal holding it there may have changed
+                self.reason = reason
+            return False
+        # Slow down at once, speed up only after the current profile has settled
+        if target < self.level and reason != "manual" and now - self.changed_at < self.min_dwell:
+            return False
+        self.history.append({"time": int(now * 1000), "from": self.profile_name, "to": LEVELS[target],
+                             "reason": reason})
+        self.level = target
+        self.changed_at = now
+        self.reason = reason
+        return True
+
+    def _target(self, temperature, battery, plugged):
+        levels = self.signal_levels
+        levels["temperature"] = _level(temperature, TEMP_C, levels["temperature"], TEMP_MARGIN, True)
+        # A plugged-in hat has no reason to save battery
+        levels["battery"] = 0 if plugged else _level(battery, BATTERY_PCT, levels["battery"], BATTERY_MARGIN, False)
+        temp_level, battery_level = levels["temperature"], levels["battery"]
+        if temp_level and temp_level >= battery_level:
+            return temp_level, f"temperature {temperature:.1f}C"
+        if battery_level:
+            return battery_level, f"battery {battery:.0f}%"
+        return 0, "normal"
+
+    def stats(self):
+        return {
+            "profile": self.profile_name,
+            "reason": self.reason,
+            "signal_levels": {name: LEVELS[level] for name, level in self.signal_levels.items()},
+            "since": int(self.changed_at * 1000),
+            "signals": self.signals,
+            "settings": self.profile,
+            "history": list(self.history),
+        }
@@ -0,0 +1,165 @@
+# Smart Hat hardware abstraction
+# The app talks to four small interfaces instead of the hardware libraries:
+#   camera   start() / capture() -> (lores, main) / stop()
+#   ranging  open() -> ranger with measure_distance() (and optionally
+#            trigger()/result()) / close()
+#   power    read() -> {"cpu", "memory", "temperature", "battery", "plugged"}
+#   sink     Firestore-like client (collection, batch) plus a storage bucket
+#   detector detector(image) -> (boxes, classes, scores), .labels / close()
+# "pi" backends wrap picamera2, lgpio, psutil and Firebase and import them
+# only when opened; "sim" backends come from simulation.py and run anywhere.
+
+import collections
+import os
+import time
+
+Devices = collections.namedtuple("Devices", "camera ranging power")
+
+
+class PiCamera:
+    # capture_request() already blocks until the first frame; the only cost of
+    # not sleeping is that auto-exposure settles during the first few frames
+    def __init__(self, main_size, lores_size, warmup=0.0):
+        self.main_size = main_size
+        self.lores_size = lores_size
+        self.warmup = warmup
+        self._picam2 = None
+
+    def start(self):
+        from picamera2 import Picamera2
+        self._picam2 = Picamera2()
+        camera_config = self._picam2.create_preview_configuration(
+            main={"size": self.main_size, "format": "RGB888"},
+            lores={"size": self.lores_size, "format": "RGB888"}
+        )
+        self._picam2.configure(camera_config)
+        self._picam2.start()
+        if self.warmup:
+            time.sleep(self.warmup)
+
+    def capture(self):
+        # lores and main come from the same request, so boxes line up with the frame
+        request = self._picam2.capture_request()
+        try:
+            return request.make_array("lores"), request.make_array("main")
+        finally:
+            request.release()
+
+    def stop(self):
+        if self._picam2 is not None:
+            self._picam2.stop()
+            self._picam2 = None
+
+
+class LgpioRanging:
+    def __init__(self, chip, sensors, backend="edge"):
+        self.chip = chip
+        self.sensors = sensors
+        self.backend = backend
+        self._h = None
+        self._ranger = None
+
+    def open(self):
+        import lgpio
+        from ranging import EdgeRanger, PollingRanger
+        self._h = lgpio.gpiochip_open(self.chip)
+        # Edge alerts with kernel timestamps; fall back to polling if lgpio refuses
+        if self.backend == "edge":
+            try:
+                self._ranger = EdgeRanger(self._h, self.sensors)
+            except Exception as e:
+                print("[ULTRASONIC] Edge ranging unavailable, falling back to polling:", e)
+        if self._ranger is None:
+            self._ranger = PollingRanger(self._h, self.sensors)
+        return self._ranger
+
+    def close(self):
+        import lgpio
+        if self._ranger is not None:
+            self._ranger.close()
+            self._ranger = None
+        if self._h is not None:
+            try:
+                lgpio.gpiochip_close(self._h)
+            except Exception as e:
+                print("[ULTRASONIC] Failed to close gpiochip:", e)
+            self._h = None
+
+
+# psutil names the SoC sensor after its device-tree node; on the Pi 5 that is "cpu_thermal"
+CPU_THERMAL_SENSORS = ("cpu_thermal", "cpu-thermal", "coretemp", "k10temp")
+
+
+def cpu_temperature(temperatures):
+    """Celsius from psutil.sensors_temperatures(): the CPU sensor, else the first one listed; None if there are none."""
+    for name in CPU_THERMAL_SENSORS:
+        if temperatures.get(name):
+            return temperatures[name][0].current
+    for readings in temperatures.values():
+        if readings:
+            return readings[0].current
+    return None
+
+
+class PsutilPower:
+    def read(self):
+        import psutil
+        battery = psutil.sensors_battery()
+        return {
+            "cpu": psutil.cpu_percent(),
+            "memory": psutil.virtual_memory().percent,
+            "temperature": cpu_temperature(psutil.sensors_temperatures()),
+            "battery": battery.percent if battery else None,
+            "plugged": battery.power_plugged if battery else True,
+        }
+
+
+def open_firebase(cred_path, options):
+    import firebase_admin
+    from firebase_admin import credentials, firestore, storage
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(credentials.Certificate(cred_path), options)
+    return firestore.client(), storage.bucket()
+
+
+def open_sink(mode, firebase_cred=None, firebase_options=None, sim_dir="/tmp/smart_hat_sim"):
+    """Firestore client and storage bucket: Firebase on the hat, in-memory and a local directory in "sim"."""
+    if mode == "pi":
+        return open_firebase(firebase_cred, firebase_options)
+    if mode == "sim":
+        import simulation
+        return simulation.MemoryFirestore(), simulation.LocalBucket(f"{sim_dir}/bucket")
+    raise ValueError(f"Unknown hardware mode: {mode}")
+
+
+def open_devices(mode, main_size, lores_size, sensors, chip=4, ranging_backend="edge",
+                 camera_source=None, range_source=None):
+    """Camera, ranging and power backends for `mode`: "pi" on the hat, "sim" anywhere else.
+
+    In "sim", camera_source is a video file, an image directory or None for a
+    synthetic scene; range_source is a recorded trace (JSONL or CSV) or None
+    for a scripted walk towards a wall.
+    """
+    if mode == "pi":
+        return Devices(PiCamera(main_size, lores_size), LgpioRanging(chip, sensors, ranging_backend), PsutilPower())
+    if mode == "sim":
+        import simulation
+        return Devices(simulation.open_camera(camera_source, main_size, lores_size),
+                       simulation.SimulatedRanging(sensors, simulation.open_trace(range_source, sensors)),
+                       simulation.SimulatedPower())
+    raise ValueError(f"Unknown hardware mode: {mode}")
+
+
+def open_detector(mode, model_path, label_path):
+    """Object detector for `mode`: the TFLite model on the hat; in "sim" the same
+    model if it is installed, else simulation.SyntheticDetector."""
+    from model_registry import registry
+    if mode == "pi":
+        return registry.detector(model_path, label_path)
+    if mode == "sim":
+        if os.path.exists(model_path) and os.path.exists(label_path):
+            return registry.detector(model_path, label_path)
+        import simulation
+        print(f"[SIM] No model at {model_path}; using the synthetic detector")
+        return simulation.SyntheticDetector()
+    raise ValueError(f"Unknown hardware mode: {mode}")
@@ -0,0 +1,160 @@
+# Smart Hat local time-series store
+# Every telemetry document lands here first, in one append-only SQLite (WAL)
+# table per collection indexed by timestamp. Firestore is fed from it by
+# cursor, so the hat keeps a full local history while offline and local
+# readers never wait on the network.
+
+import json
+import re
+import sqlite3
+import threading
+import time
+
+_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class LocalStore:
+    def __init__(self, path, retention_days=14):
+        self.path = path
+        self.retention_ms = int(retention_days * 24 * 3600 * 1000)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sync_state (collection TEXT PRIMARY KEY, last_id INTEGER NOT NULL)")
+        self._conn.commit()
+        self._tables = {row[0][len("log_"):] for row in self._conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name LIKE 'log_%'")}
+
+    def _table(self, collection):
+        # Collection names become table names, so only allow plain identifiers
+        if not _NAME_RE.match(collection):
+            raise ValueError(f"Invalid collection name: {collection!r}")
+        if collection not in self._tables:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS log_{collection} "
+                "(id INTEGER PRIMARY KEY AUTOINCREMENT, ts INTEGER NOT NULL, doc TEXT NOT NULL)")
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS log_{collection}_ts ON log_{collection}(ts)")
+            self._tables.add(collection)
+        return f"log_{collection}"
+
+    def collections(self):
+        with self._lock:
+            return sorted(self._tables)
+
+    # --- Writes ---
+    def append(self, collection, doc):
+        self.append_many([(collection, doc)])
+
+    def append_many(self, items):
+        """Append (collection, doc) pairs in a single transaction."""
+        now_ms = int(time.time() * 1000)
+        with self._lock:
+            for collection, doc in items:
+                table = self._table(collection)
+                self._conn.execute(f"INSERT INTO {table} (ts, doc) VALUES (?, ?)",
+                                   (int(doc.get("timestamp", now_ms)), json.dumps(doc)))
+            self._conn.commit()
+
+    # --- Reads ---
+    def query(self, collection, start_ms=None, end_ms=None, limit=None):
+        """Documents with start_ms <= timestamp <= end_ms, oldest first."""
+        sql_where, args = [], []
+        if start_ms is not None:
+            sql_where.append("ts >= ?")
+            args.append(int(start_ms))
+        if end_ms is not None:
+            sql_where.append("ts <= ?")
+            args.append(int(end_ms))
+        with self._lock:
+            if collection not in self._tables:
+                return []
+            sql = f"SELECT doc FROM log_{collection}"
+            if sql_where:
+                sql += " WHERE " + " AND ".join(sql_where)
+            sql += " ORDER BY ts"
+            if limit:
+                sql += " LIMIT ?"
+                args.append(int(limit))
+            rows = self._conn.execute(sql, args).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def since(self, collection, after_id=0, start_ms=None, limit=None):
+        """Rows added after row `after_id`, as (id, doc) pairs in insertion order.
+
+        Row ids only grow, so unlike a timestamp cursor this never skips a
+        document that shares a millisecond with the last one seen, nor one
+        that arrived late with an older timestamp.
+        """
+        sql = f"SELECT id, doc FROM log_{collection} WHERE id > ?"
+        args = [int(after_id)]
+        if start_ms is not None:
+            sql += " AND ts >= ?"
+            args.append(int(start_ms))
+        sql += " ORDER BY id"
+        if limit:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        with self._lock:
+            if collection not in self._tables:
+                return []
+            rows = self._conn.execute(sql, args).fetchall()
+        return [(row_id, json.loads(doc)) for row_id, doc in rows]
+
+    # --- Cloud sync cursor ---
+    def pending(self, collection, limit=500):
+        """Rows not yet uploaded, as (id, doc) pairs in insertion order."""
+        with self._lock:
+            if collection not in self._tables:
+                return []
+            row = self._conn.execute("SELECT last_id FROM sync_state WHERE collection = ?",
+                                     (collection,)).fetchone()
+            last_id = row[0] if row else 0
+            rows = self._conn.execute(
+                f"SELECT id, doc FROM log_{collection} WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, limit)).fetchall()
+        return [(row_id, json.loads(doc)) for row_id, doc in rows]
+
+    def mark_synced(self, collection, last_id):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sync_state (collection, last_id) VALUES (?, ?) "
+                "ON CONFLICT(collection) DO UPDATE SET last_id = excluded.last_id",
+                (collection, last_id))
+            self._conn.commit()
+
+    def backlog(self):
+        """Number of rows per collection still waiting for upload."""
+        counts = {}
+        with self._lock:
+            for collection in self._tables:
+                row = self._conn.execute("SELECT last_id FROM sync_state WHERE collection = ?",
+                                         (collection,)).fetchone()
+                counts[collection] = self._conn.execute(
+                    f"SELECT COUNT(*) FROM log_{collection} WHERE id > ?", (row[0] if row else 0,)).fetchone()[0]
+        return counts
+
+    def prune(self):
+        """Drop uploaded rows older than the retention window."""
+        cutoff = int(time.time() * 1000) - self.retention_ms
+        deleted = 0
+        with self._lock:
+            for collection in self._tables:
+                row = self._conn.execute("SELECT last_id FROM sync_state WHERE collection = ?",
+                                         (collection,)).fetchone()
+                cur = self._conn.execute(f"DELETE FROM log_{collection} WHERE ts < ? AND id <= ?",
+                                         (cutoff, row[0] if row else 0))
+                deleted += cur.rowcount
+            self._conn.commit()
+        return deleted
+
+    def clear(self, collection):
+        with self._lock:
+            if collection in self._tables:
+                self._conn.execute(f"DELETE FROM log_{collection}")
+                self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,242 @@
+# Smart Hat metrics
+# Counters, gauges and fixed-bucket histograms for the hot paths. Each thread
+# updates its own shard without taking a lock; shards are only summed when
+# /metrics or /status asks, so instrumenting a 30 fps loop costs a dict
+# lookup and an add. Rendered as Prometheus text or a JSON summary.
+
+import bisect
+import contextlib
+import threading
+import time
+
+# Seconds; covers a GPIO echo (~1 ms) up to a slow Firestore commit
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, values)) + "}"
+
+
+def _ms(seconds):
+    return None if seconds is None or seconds == float("inf") else round(seconds * 1000, 3)
+
+
+class _Sharded:
+    """Per-thread storage; every thread that writes gets its own shard."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = self._factory()
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def shards(self):
+        with self._lock:
+            return list(self._shards)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+
+    def labels(self, *values, **kw):
+        """Child for one combination of label values; cache it in hot loops."""
+        if kw:
+            values = tuple(kw[n] for n in self.labelnames)
+        return _Child(self, tuple(str(v) for v in values))
+
+
+class _Child:
+    __slots__ = ("metric", "values")
+
+    def __init__(self, metric, values):
+        self.metric = metric
+        self.values = values
+
+    def inc(self, amount=1):
+        self.metric.inc(amount, self.values)
+
+    def set(self, value):
+        self.metric.set(value, self.values)
+
+    def observe(self, value):
+        self.metric.observe(value, self.values)
+
+    def time(self):
+        return self.metric.time(self.values)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._data = _Sharded(dict)
+
+    def inc(self, amount=1, values=()):
+        shard = self._data.shard()
+        shard[values] = shard.get(values, 0) + amount
+
+    def collect(self):
+        totals = {}
+        for shard in self._data.shards():
+            for key, value in list(shard.items()):
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+
+class Gauge(_Metric):
+    """Last value set, or fn() evaluated at collection time."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labelnames=(), fn=None):
+        super().__init__(name, help_text, labelnames)
+        self.fn = fn
+        self._values = {}
+
+    def set(self, value, values=()):
+        self._values[values] = value
+
+    def inc(self, amount=1, values=()):
+        self._values[values] = self._values.get(values, 0) + amount
+
+    def collect(self):
+        if self.fn is not None:
+            try:
+                value = self.fn()
+            except Exception:
+                return {}
+            # fn may return a number or {label value tuple: number}
+            return dict(value) if isinstance(value, dict) else {(): value}
+        return dict(self._values)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._data = _Sharded(dict)   # label values -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value, values=()):
+        shard = self._data.shard()
+        row = shard.get(values)
+        if row is None:
+            row = shard[values] = [0] * (len(self.buckets) + 2)
+        row[bisect.bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    @contextlib.contextmanager
+    def time(self, values=()):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, values)
+
+    def collect(self):
+        totals = {}
+        for shard in self._data.shards():
+            for key, row in list(shard.items()):
+                total = totals.setdefault(key, [0] * len(row))
+                for i, v in enumerate(row):
+                    total[i] += v
+        return totals
+
+    def quantile(self, row, q):
+        # Upper bound of the bucket holding the q-th observation
+        count = sum(row[:-1])
+        if not count:
+            return None
+        running = 0
+        for i, n in enumerate(row[:-1]):
+            running += n
+            if running >= q * count:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+class MetricsRegistry:
+    def __init__(self, prefix="smarthat_"):
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help_text, labelnames, **kw):
+        name = self.prefix + name
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labelnames, **kw)
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._get(Counter, name, help_text, labelnames)
+
+    def gauge(self, name, help_text, labelnames=(), fn=None):
+        return self._get(Gauge, name, help_text, labelnames, fn=fn)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for values, data in sorted(metric.collect().items()):
+                if metric.kind != "histogram":
+                    lines.append(f"{metric.name}{_label_text(metric.labelnames, values)} {data}")
+                    continue
+                running = 0
+                for bound, n in zip(metric.buckets + ("+Inf",), data[:-1]):
+                    running += n
+                    labels = _label_text(metric.labelnames + ("le",), values + (str(bound),))
+                    lines.append(f"{metric.name}_bucket{labels} {running}")
+                labels = _label_text(metric.labelnames, values)
+                lines.append(f"{metric.name}_sum{labels} {data[-1]:.6f}")
+                lines.append(f"{metric.name}_count{labels} {running}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Compact JSON view: totals, current values, and count/avg/p50/p95 in ms for histograms."""
+        out = {}
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            short = metric.name[len(self.prefix):]
+            for values, data in metric.collect().items():
+                key = short + ("[" + ",".join(values) + "]" if values else "")
+                if metric.kind != "histogram":
+                    out[key] = round(data, 3) if isinstance(data, float) else data
+                    continue
+                count = sum(data[:-1])
+                out[key] = {
+                    "count": count,
+                    "avg_ms": _ms(data[-1] / count) if count else None,
+                    # Bucket upper bounds; None past the last bucket
+                    "p50_ms": _ms(metric.quantile(data, 0.5)),
+                    "p95_ms": _ms(metric.quantile(data, 0.95)),
+                }
+        return out
+
+
+metrics = MetricsRegistry()
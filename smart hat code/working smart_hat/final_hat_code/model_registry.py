@@ -0,0 +1,190 @@
+# Smart Hat model registry
+# Loads each TFLite model and label file once per process and hands out
+# interpreters from a small pool, so threads never share an interpreter and
+# never pay for a cold model load in the middle of an alert.
+
+import contextlib
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+
+def _interpreter_class():
+    # Imported on first use so the rest of the app loads on machines without the runtime;
+    # full TensorFlow works too, for benchmarks on x86 build machines
+    try:
+        import tflite_runtime.interpreter as tflite
+    except ImportError:
+        import tensorflow.lite as tflite
+    return tflite.Interpreter
+
+
+def read_label_file(path):
+    with open(path, 'r') as f:
+        return {int(line.split()[0]): line.strip().split(maxsplit=1)[1] for line in f}
+
+
+class InterpreterPool:
+    """Fixed-size pool of interpreters for one model, created lazily up to `size`."""
+
+    def __init__(self, model_path, size=2, num_threads=None):
+        self.model_path = model_path
+        self.size = max(1, int(size))
+        self.num_threads = num_threads
+        self._free = queue.LifoQueue()
+        self._threads = {}   # id(interpreter) -> num_threads it was built with
+        self._created = 0
+        self._lock = threading.Lock()
+        # Load one up front so a broken model path fails at startup, not mid-alert
+        self._free.put(self._create())
+
+    def _create(self):
+        interpreter = _interpreter_class()(model_path=self.model_path, num_threads=self.num_threads)
+        interpreter.allocate_tensors()
+        self._threads[id(interpreter)] = self.num_threads
+        self._created += 1
+        print(f"[MODEL] Loaded {self.model_path} ({self._created}/{self.size}, threads={self.num_threads})")
+        return interpreter
+
+    def is_stale(self, interpreter):
+        """True if the interpreter was built with a thread count that is no longer wanted."""
+        return self._threads.get(id(interpreter)) != self.num_threads
+
+    def _discard(self, interpreter):
+        with self._lock:
+            self._threads.pop(id(interpreter), None)
+            self._created -= 1
+
+    def acquire(self, timeout=None):
+        while True:
+            try:
+                interpreter = self._free.get_nowait()
+            except queue.Empty:
+                break
+            if not self.is_stale(interpreter):
+                return interpreter
+            self._discard(interpreter)
+        with self._lock:
+            if self._created < self.size:
+                return self._create()
+        try:
+            interpreter = self._free.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if self.is_stale(interpreter):
+            self._discard(interpreter)
+            return self.acquire(timeout)
+        return interpreter
+
+    def release(self, interpreter):
+        if interpreter is None:
+            return
+        if self.is_stale(interpreter):
+            self._discard(interpreter)
+        else:
+            self._free.put(interpreter)
+
+    def set_num_threads(self, num_threads):
+        # TFLite fixes the thread count at construction; interpreters are rebuilt as they come back
+        self.num_threads = num_threads
+
+    @contextlib.contextmanager
+    def lease(self, timeout=None):
+        """Borrow an interpreter; yields None if none frees up within `timeout`."""
+        interpreter = self.acquire(timeout)
+        try:
+            yield interpreter
+        finally:
+            self.release(interpreter)
+
+    def stats(self):
+        return {"size": self.size, "created": self._created, "idle": self._free.qsize(),
+                "num_threads": self.num_threads}
+
+
+class TFLiteDetector:
+    """SSD-style detector on an interpreter borrowed from `pool`.
+
+    detector(image) -> (boxes, classes, scores), the model's first three
+    output tensors. Rebuilds its interpreter when the pool's thread count
+    changes; close() hands it back.
+    """
+
+    def __init__(self, pool, labels):
+        self.pool = pool
+        self.labels = labels
+        self.interpreter = None
+        self._bind(pool.acquire())
+
+    def _bind(self, interpreter):
+        self.interpreter = interpreter
+        self.input_details = interpreter.get_input_details()
+        self.output_details = interpreter.get_output_details()
+        self.input_size = (self.input_details[0]['shape'][2], self.input_details[0]['shape'][1])
+
+    def __call__(self, image):
+        if self.pool.is_stale(self.interpreter):
+            # The governor changed the thread count; swap in a rebuilt interpreter
+            self.pool.release(self.interpreter)
+            self._bind(self.pool.acquire())
+        resized = cv2.resize(image, self.input_size)
+        self.interpreter.set_tensor(self.input_details[0]['index'], np.expand_dims(resized, axis=0).astype(np.uint8))
+        self.interpreter.invoke()
+        return tuple(self.interpreter.get_tensor(self.output_details[i]['index'])[0] for i in range(3))
+
+    def close(self):
+        self.pool.release(self.interpreter)
+        self.interpreter = None
+
+
+class ModelRegistry:
+    """Process-wide cache of interpreter pools and label maps, keyed by path."""
+
+    def __init__(self, pool_size=2, num_threads=None):
+        self.pool_size = pool_size
+        self.num_threads = num_threads
+        self._pools = {}
+        self._labels = {}
+        self._lock = threading.Lock()
+
+    def configure(self, pool_size=None, num_threads=None):
+        # Only affects pools created afterwards
+        if pool_size is not None:
+            self.pool_size = pool_size
+        if num_threads is not None:
+            self.num_threads = num_threads
+
+    def set_num_threads(self, num_threads):
+        """Change the thread count of existing pools as well as future ones."""
+        with self._lock:
+            self.num_threads = num_threads
+            for pool in self._pools.values():
+                pool.set_num_threads(num_threads)
+
+    def pool(self, model_path):
+        with self._lock:
+            pool = self._pools.get(model_path)
+            if pool is None:
+                pool = InterpreterPool(model_path, self.pool_size, self.num_threads)
+                self._pools[model_path] = pool
+            return pool
+
+    def labels(self, label_path):
+        with self._lock:
+            labels = self._labels.get(label_path)
+            if labels is None:
+                labels = read_label_file(label_path)
+                self._labels[label_path] = labels
+            return labels
+
+    def detector(self, model_path, label_path):
+        return TFLiteDetector(self.pool(model_path), self.labels(label_path))
+
+    def stats(self):
+        with self._lock:
+            return {path: pool.stats() for path, pool in self._pools.items()}
+
+
+registry = ModelRegistry()
@@ -1,38 +1,57 @@
 # Smart Hat Backend Server with ngrok Integration
 # Updated to support modular JS/CSS and static file serving
 
+from startup import Lazy, peek, startup  # first, so boot times include the imports below
 from flask import Flask, request, jsonify, redirect, render_template_string, Response, send_from_directory
-import subprocess, os, json, threading, cv2, numpy as np, time, lgpio, psutil, shutil, requests, socket
-import tflite_runtime.interpreter as tflite
-from picamera2 import Picamera2
+import subprocess, os, json, threading, time, shutil, requests, socket, copy
 from datetime import datetime
-import pandas as pd
-from dash import Dash, dcc, html, Input, Output
-import dash_bootstrap_components as dbc
-import plotly.express as px
 from flask_socketio import SocketIO
-import firebase_admin
-from firebase_admin import credentials, firestore, storage
+from werkzeug.middleware.dispatcher import DispatcherMiddleware
 import subprocess
 import time
 import threading
-
-
-# Initialize Firebase
-if not firebase_admin._apps:
-    cred = credentials.Certificate('/home/ada/de/smartaid-6c5c0-firebase-adminsdk-fbsvc-cee03b08da.json')
-    firebase_admin.initialize_app(cred, {
-        'databaseURL': 'https://smartaid-6c5c0-default-rtdb.firebaseio.com/',
-        'storageBucket': 'smartaid-6c5c0.appspot.com'
-    })
+from pipeline import FramePipeline
+from model_registry import registry
+from settings import (CHIP, CLIP_STREAM, DEFAULT_CONFIG, FRAME_SIZE, LORES_SIZE, SENSORS, ULTRASONIC_BACKEND,
+                      ULTRASONIC_GROUPS, ULTRASONIC_RATES_HZ)
+from perception import DetectionStages, ultrasonic_reading
+from streaming import StreamHub, parse_profile
+from telemetry import TelemetryWriter
+from local_store import LocalStore
+from ranging import RangingScheduler
+from sensor_filter import SensorFilter
+from collision import CollisionPredictor
+from alerts import AlertArbiter
+from tracking import ObjectTracker
+from adaptive import AdaptiveInference
+from governor import LEVELS, PerformanceGovernor
+from clips import ClipRecorder, FrameRing
+from metrics import metrics
+from profiler import profiler
+import hal
+
+# Hardware backends: "pi" on the hat, "sim" (replayed/synthetic devices, in-memory Firestore) anywhere else
+HAL_MODE = os.environ.get("SMART_HAT_HAL", "pi")
+DATA_DIR = os.environ.get("SMART_HAT_DIR", "/home/ada/de")
+
+PORT = int(os.environ.get("SMART_HAT_PORT", 5000))
+
+# Firebase is connected on first use (the first telemetry flush), not at boot
+firebase = Lazy(lambda: hal.open_sink(HAL_MODE, f"{DATA_DIR}/smartaid-6c5c0-firebase-adminsdk-fbsvc-cee03b08da.json", {
+    'databaseURL': 'https://smartaid-6c5c0-default-rtdb.firebaseio.com/',
+    'storageBucket': 'smartaid-6c5c0.appspot.com'
+}, sim_dir=f"{DATA_DIR}/sim"), on_load=lambda: startup.mark("firestore"))
+db = Lazy(lambda: firebase._load()[0])
+bucket = Lazy(lambda: firebase._load()[1])
 
 # Flask app setup
-app = Flask(__name__, static_folder="/home/ada/de/app_server/web_app")
+app = Flask(__name__, static_folder=f"{DATA_DIR}/app_server/web_app")
 app.config["PROPAGATE_EXCEPTIONS"] = True
 app.config["DEBUG"] = True
 socketio = SocketIO(app, cors_allowed_origins="*")
 
-db = firestore.client()
+local_store = LocalStore(f"{DATA_DIR}/telemetry.db")
+telemetry = TelemetryWriter(db, f"{DATA_DIR}/telemetry_spill.jsonl", store=local_store)
 
 frame_lock = threading.Lock()
 
@@ -40,15 +59,27 @@ frame_lock = threading.Lock()
 health_status = "OK"
 detection_active = True
 config_data = {"indoor_mode": False}
-LABEL_PATH = "/home/ada/de/coco_labels.txt"
-MODEL_PATH = "/home/ada/de/mobilenet_v2.tflite"
-CONFIG_FILE = "/home/ada/de/detection/config.json"
+LABEL_PATH = f"{DATA_DIR}/coco_labels.txt"
+MODEL_PATH = f"{DATA_DIR}/mobilenet_v2.tflite"
+CONFIG_FILE = f"{DATA_DIR}/detection/config.json"
+MODEL_POOL_SIZE = 1       # only detection_loop runs the model; each extra interpreter costs its tensor arena in RAM
+INTERPRETER_THREADS = 4   # Pi 5 has four cores
 voice_alert_enabled = True
-normalSize = (2028, 1520)
-lowresSize = (300, 300)
-latest_frame = None
+normalSize = FRAME_SIZE
+lowresSize = LORES_SIZE
 indoor_mode = False
 logging_paused = False  # ✅ Define it once here, no need for global outside
+detection_pipeline = None  # FramePipeline, set once the camera is up
+stream_hub = StreamHub()   # per-profile JPEGs for /video_feed viewers
+object_tracker = None      # ObjectTracker, owned by detection_loop
+inference_rate = AdaptiveInference()  # decides which frames go through the detector
+governor = PerformanceGovernor()      # picks a performance profile from temperature and battery
+GOVERNOR_SAMPLE_INTERVAL = 5          # seconds between temperature/battery samples
+SYSTEM_LOG_INTERVAL = 60              # seconds between system_health_logs documents
+latest_power = None                   # last devices.power.read(), taken by system_metrics_monitor
+latest_detections = {"frame_id": 0, "width": normalSize[0], "height": normalSize[1], "boxes": []}
+
+registry.configure(pool_size=MODEL_POOL_SIZE, num_threads=INTERPRETER_THREADS)
 
 
 
@@ -70,43 +101,24 @@ def serve_static(filename):
 voice_alert_enabled = True
 health_status = "OK"
 detection_active = True
-normalSize = (2028, 1520)
-lowresSize = (300, 300)
+normalSize = FRAME_SIZE
+lowresSize = LORES_SIZE
 
-latest_frame = None
 frame_lock = threading.Lock()   # ✅ Add this here!
 indoor_mode = False
 
 
-from dash import Dash, dcc, html, Input, Output
-import dash_bootstrap_components as dbc
-import plotly.express as px
-import pandas as pd
-
-# Dash setup
-dash_app = Dash(__name__, server=app, url_base_pathname='/analytics/', external_stylesheets=[dbc.themes.DARKLY])
-dash_app.title = "Smart Hat Analytics"
-
-# Refresh interval
-_dash_interval = dcc.Interval(id='interval', interval=10*1000, n_intervals=0)
-
-# Layout with 6 graphs
-dash_app.layout = dbc.Container(fluid=True, children=[
-    html.H2("Smart Hat Analytics Dashboard", className="text-center my-4"),
-    _dash_interval,
-    dbc.Row([
-        dbc.Col(dcc.Graph(id='battery-graph'), md=6),
-        dbc.Col(dcc.Graph(id='ultrasonic-graph'), md=6),
-    ], className="mb-4"),
-    dbc.Row([
-        dbc.Col(dcc.Graph(id='system-health-graph'), md=6),
-        dbc.Col(dcc.Graph(id='motion-status-graph'), md=6),
-    ], className="mb-4"),
-    dbc.Row([
-        dbc.Col(dcc.Graph(id='detection-log-graph'), md=6),
-        dbc.Col(dcc.Graph(id='system-health-heatmap'), md=6),
-    ], className="mb-4")
-])
+# --- Analytics dashboard ---
+# Dash, plotly and pandas are only imported when somebody first opens
+# /analytics/; until then the mount costs nothing at boot.
+def load_analytics():
+    import analytics
+    dashboard = analytics.Dashboard(db, lambda: logging_paused, store=local_store)
+    startup.mark("analytics")
+    return dashboard
+
+analytics_app = Lazy(load_analytics)
+app.wsgi_app = DispatcherMiddleware(app.wsgi_app, {"/analytics": analytics_app})
 
 
 # Sample log data (replace with your actual log data)
@@ -133,217 +145,55 @@ def download_logs():
     return send_file(csv_file, as_attachment=True, download_name="logs.csv")
 
 
-# --- CALLBACKS ---
-
-@dash_app.callback(Output('battery-graph', 'figure'), Input('interval', 'n_intervals'))
-def update_battery(n):
-    df = fetch_battery_data()
-    if df.empty or 'battery_percentage' not in df.columns:
-        return px.line(title="No battery data available")
-    df['formatted_time'] = df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
-    return px.line(df, x='formatted_time', y='battery_percentage', title='Battery Level Over Time')
-
-@dash_app.callback(Output('ultrasonic-graph', 'figure'), Input('interval', 'n_intervals'))
-def update_ultrasonic(n):
-    df = fetch_ultrasonic_data()
-    if df.empty or df.shape[1] <= 1:
-        return px.line(title="No ultrasonic data available")
-    df['formatted_time'] = df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
-    return px.line(df, x='formatted_time', y=df.columns.drop(['timestamp', 'formatted_time']), title='Ultrasonic Sensor Readings')
-
-@dash_app.callback(Output('system-health-graph', 'figure'), Input('interval', 'n_intervals'))
-def update_system_health(n):
-    df = fetch_system_health_data()
-    if df.empty:
-        return px.line(title="No system health data")
-    cols = [col for col in ['cpu', 'memory', 'temperature'] if col in df.columns]
-    if not cols:
-        return px.line(title="No system metrics available")
-    df['formatted_time'] = df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
-    return px.line(df, x='formatted_time', y=cols, title='System Health Over Time')
-
-@dash_app.callback(Output('motion-status-graph', 'figure'), Input('interval', 'n_intervals'))
-def update_motion(n):
-    df = fetch_motion_data()
-    if df.empty or 'motion_status' not in df.columns:
-        return px.line(title="No motion data")
-    df['motion_binary'] = df['motion_status'].apply(lambda x: 1 if str(x).lower() == 'active' else 0)
-    df['formatted_time'] = df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
-    return px.line(df, x='formatted_time', y='motion_binary', title='Motion Activity Over Time')
-
-@dash_app.callback(Output('detection-log-graph', 'figure'), Input('interval', 'n_intervals'))
-def update_detection_log(n):
-    df = fetch_detection_data()
-    if df.empty or 'detection_count' not in df.columns:
-        return px.bar(title="No detection log available")
-    df['formatted_time'] = df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
-    return px.bar(df, x='formatted_time', y='detection_count', title='Detections Over Time')
-
-@dash_app.callback(Output('system-health-heatmap', 'figure'), Input('interval', 'n_intervals'))
-def update_health_heatmap(n):
-    df = fetch_system_health_data()
-    if df.empty or 'timestamp' not in df.columns:
-        return px.imshow([[0]], title="No heatmap data available")
-    df.set_index('timestamp', inplace=True)
-    df = df.select_dtypes(include='number')
-    return px.imshow(df.T, aspect='auto', color_continuous_scale='Viridis', title='System Health Heatmap')
-
-# --- FETCH FUNCTIONS ---
-
-def fetch_motion_data():
-    if logging_paused:
-        return pd.DataFrame()
-    try:
-        docs = [doc.to_dict() for doc in db.collection('motion_logs').stream()]
-        df = pd.DataFrame(docs)
-        if 'timestamp' in df.columns:
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', errors='coerce')
-            df = df.dropna(subset=['timestamp'])
-        return df
-    except Exception as e:
-        print("[Fetch Error] Motion:", e)
-        return pd.DataFrame()
-
-
-def fetch_battery_data():
-    if logging_paused:
-        return pd.DataFrame()
-    try:
-        docs = [doc.to_dict() for doc in db.collection('battery_logs').stream()]
-        df = pd.DataFrame(docs)
-        if 'timestamp' in df.columns:
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', errors='coerce')
-            df = df.dropna(subset=['timestamp'])
-        return df
-    except Exception as e:
-        print("[Fetch Error] Battery:", e)
-        return pd.DataFrame()
-
-
-def fetch_ultrasonic_data():
-    if logging_paused:
-        return pd.DataFrame()
-    try:
-        docs = [doc.to_dict() for doc in db.collection('ultrasonic_logs').stream()]
-        rows = []
-        for doc in docs:
-            if 'timestamp' in doc and 'readings' in doc:
-                row = {'timestamp': doc['timestamp']}
-                row.update(doc['readings'])
-                rows.append(row)
-        df = pd.DataFrame(rows)
-        if 'timestamp' in df.columns:
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', errors='coerce')
-            df = df.dropna(subset=['timestamp'])
-        return df
-    except Exception as e:
-        print("[Fetch Error] Ultrasonic:", e)
-        return pd.DataFrame()
-
-
-def fetch_system_health_data():
-    if logging_paused:
-        return pd.DataFrame()
-    try:
-        docs = [doc.to_dict() for doc in db.collection('system_health_logs').stream()]
-        df = pd.DataFrame(docs)
-        if 'timestamp' in df.columns:
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', errors='coerce')
-            df = df.dropna(subset=['timestamp'])
-        return df
-    except Exception as e:
-        print("[Fetch Error] System Health:", e)
-        return pd.DataFrame()
-
-
-def fetch_detection_data():
-    if logging_paused:
-        return pd.DataFrame()
-    try:
-        docs = [doc.to_dict() for doc in db.collection('detection_logs').stream()]
-        df = pd.DataFrame(docs)
-        if 'timestamp' not in df.columns:
-            return pd.DataFrame()
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', errors='coerce')
-        df = df.dropna(subset=['timestamp'])
-        df['detection_count'] = 1
-        return df.groupby(pd.Grouper(key='timestamp', freq='1min')).sum(numeric_only=True).reset_index()
-    except Exception as e:
-        print("[Fetch Error] Detection:", e)
-        return pd.DataFrame()
-
-
 # Default config
-config_data = {
-    "filter_classes": ["person"],
-    "logging": True,
-    "ultrasonic_thresholds": {
-        "Left Front": 70,
-        "Left Middle": 70,
-        "Left Rear": 70,
-        "Right Front": 70,
-        "Right Middle": 70,
-        "Right Rear": 70
-    }
-}
-
-SENSORS = {
-    "Left Front":  {"trigger": 4,  "echo": 17},
-    "Left Middle": {"trigger": 27, "echo": 22},
-    "Left Rear":   {"trigger": 23, "echo": 24},
-    "Right Front": {"trigger": 5,  "echo": 6},
-    "Right Middle": {"trigger": 12, "echo": 13},
-    "Right Rear":   {"trigger": 19, "echo": 26}
-}
-
-CHIP = 4
+config_data = copy.deepcopy(DEFAULT_CONFIG)
+
+ULTRASONIC_LOG_INTERVAL = 1.0  # seconds between ultrasonic_logs documents
+SERIES_DEFAULT_HOURS = 24      # /api/series window when no start is given
+SERIES_DEFAULT_WIDTH = 800     # points per /api/series response
+SERIES_MAX_WIDTH = 5000        # more points than any screen has pixels
+ultrasonic_filters = {name: SensorFilter() for name in SENSORS}
+collision_predictor = CollisionPredictor()
+ultrasonic_ttc = {}
+ultrasonic_raw_readings = {}
+ultrasonic_voice_enabled = True
 ultrasonic_readings = {}
 motion_active = False  # Track motion status
-last_ultra_speak_time = {}
+devices = hal.open_devices(HAL_MODE, normalSize, lowresSize, SENSORS, chip=CHIP, ranging_backend=ULTRASONIC_BACKEND,
+                           camera_source=os.environ.get("SMART_HAT_CAMERA"),
+                           range_source=os.environ.get("SMART_HAT_RANGES"))
+
+# --- Metrics (served as Prometheus text on /metrics and summarised in /status) ---
+# Detection stage timers, frame and ultrasonic reading counters live in perception.py
+EMIT_SECONDS = metrics.histogram("socketio_emit_seconds", "Socket.IO emit time", ("event",))
+ULTRASONIC_CYCLE_SECONDS = metrics.histogram("ultrasonic_cycle_seconds",
+                                             "Ranging pings plus filtering and alert checks per cycle")
+metrics.gauge("healthy", "1 when no sensor faults are reported", fn=lambda: int(health_status == "OK"))
+metrics.gauge("ultrasonic_distance_cm", "Filtered distance per sensor", ("sensor",),
+              fn=lambda: {(name,): d for name, d in ultrasonic_readings.items() if d is not None})
+metrics.gauge("inference_fps", "Frames per second actually sent through the model",
+              fn=lambda: round(inference_rate.effective_fps(time.time()), 2))
+metrics.gauge("governor_level", "Performance profile index, 0 = performance",
+              fn=lambda: LEVELS.index(governor.profile_name))
+metrics.gauge("telemetry_queued", "Documents waiting in the telemetry queue", fn=lambda: telemetry.stats()["queued"])
+metrics.gauge("stream_viewers", "Open /video_feed and clip buffer viewers",
+              fn=lambda: sum(s["viewers"] for s in stream_hub.stats().values()))
 
 # --- Utility Functions ---
-def read_label_file(path):
-    with open(path, 'r') as f:
-        return {int(line.split()[0]): line.strip().split(maxsplit=1)[1] for line in f}
-
-def push_message_to_clients(message):
-    socketio.emit('speak', {'message': message})
-
-def measure_distance(h, trig, echo, timeout=0.02):
-    lgpio.gpio_write(h, trig, 1)
-    time.sleep(0.00001)
-    lgpio.gpio_write(h, trig, 0)
-    start = time.time()
-    timeout_start = time.time()
-    while lgpio.gpio_read(h, echo) == 0:
-        start = time.time()
-        if time.time() - timeout_start > timeout:
-            return "No Echo"
-    timeout_start = time.time()
-    while lgpio.gpio_read(h, echo) == 1:
-        stop = time.time()
-        if time.time() - timeout_start > timeout:
-            return "Echo Timeout"
-    elapsed = stop - start
-    distance = (elapsed * 34300) / 2
-    return round(distance, 2) if 2 < distance < 400 else "Out of Range"
+def push_message_to_clients(message, severity="info", interrupt=False):
+    with EMIT_SECONDS.time(("speak",)):
+        socketio.emit('speak', {'message': message, 'severity': severity, 'interrupt': interrupt})
 
+# All speech goes through the arbiter so a critical alert is never starved by a low-value one
+alerts = AlertArbiter(push_message_to_clients)
 
 def ultrasonic_loop():
-    global logging_paused, health_status, ultrasonic_readings
-
-    h = None
+    global logging_paused, health_status, ultrasonic_readings, ultrasonic_raw_readings
 
     try:
-        h = lgpio.gpiochip_open(4)
-        for s in SENSORS.values():
-            try:
-                lgpio.gpio_free(h, s["trigger"])
-                lgpio.gpio_free(h, s["echo"])
-            except:
-                pass
-            lgpio.gpio_claim_output(h, s["trigger"])
-            lgpio.gpio_claim_input(h, s["echo"])
+        ranger = devices.ranging.open()
+        scheduler = RangingScheduler(ranger, SENSORS, ULTRASONIC_GROUPS, ULTRASONIC_RATES_HZ)
+        last_log = 0
 
         while True:
             if logging_paused:
@@ -351,71 +201,89 @@ def ultrasonic_loop():
                 time.sleep(1)
                 continue
 
-            now = time.time()
-            failed = []
+            # Alerts are checked on every filtered reading, as soon as it arrives
+            filter_mode = config_data.get("ultrasonic_filter", "kalman")
+            cycle_start = time.perf_counter()
+            due = scheduler.run_due()
+            # TTC is tracked on every reading for /ultrasonic; only the speech is gated
+            speak = (ultrasonic_voice_enabled and voice_alert_enabled
+                     and not config_data.get("indoor_mode", False))
+            for name, raw, stamp in due:
+                assessment = ultrasonic_reading(name, raw, stamp, ultrasonic_filters[name], collision_predictor,
+                                                alerts, config_data, motion_active, speak)
+                if assessment is not None:
+                    ultrasonic_ttc[name] = assessment
+
+            if due:
+                ULTRASONIC_CYCLE_SECONDS.observe(time.perf_counter() - cycle_start)
+                startup.mark("ultrasonic")
+
             readings = {}
-            successful_readings = 0
-
-            for name, pin in SENSORS.items():
-                dist = measure_distance(h, pin["trigger"], pin["echo"])
-                readings[name] = dist if isinstance(dist, (int, float)) else None
-                threshold = config_data.get("ultrasonic_thresholds", {}).get(name, 100)
-
-                if isinstance(dist, (int, float)):
-                    successful_readings += 1
-                    if (ultrasonic_voice_enabled and voice_alert_enabled and not config_data.get("indoor_mode", False)
-                        and dist < threshold and now - last_ultra_speak_time.get(name, 0) > 4):
-                        push_message_to_clients(f"Obstacle on {'left' if 'Left' in name else 'right'} at {dist} cm")
-                        last_ultra_speak_time[name] = now
-                else:
-                    failed.append(name)
-
-            if successful_readings == 0:
+            for name in SENSORS:
+                if name in scheduler.latest:
+                    dist = ultrasonic_filters[name].value(filter_mode)
+                    readings[name] = dist if isinstance(dist, (int, float)) else None
+            ultrasonic_readings = readings
+            ultrasonic_raw_readings = {name: reading for name, (reading, _) in scheduler.latest.items()}
+
+            now = time.time()
+            if now - last_log < ULTRASONIC_LOG_INTERVAL or len(readings) < len(SENSORS):
+                time.sleep(scheduler.time_to_next())
+                continue
+            last_log = now
+            # The governor may slow the pings down, but never below 2 Hz for an enabled sensor
+            scale = governor.profile["ultrasonic_scale"]
+            scheduler.set_rates({name: (max(2.0, rate * scale) if rate else 0)
+                                 for name, rate in {**ULTRASONIC_RATES_HZ,
+                                                    **config_data.get("ultrasonic_rates", {})}.items()})
+
+            # A sensor only counts as faulty after several misses in a row
+            failed = [name for name in readings if ultrasonic_filters[name].last["fault"]]
+            if len(failed) == len(SENSORS):
                 print("[SKIP] All ultrasonic sensors failed — not logging this cycle.")
                 health_status = "All sensors unresponsive"
 
-                if ultrasonic_voice_enabled and voice_alert_enabled and not config_data.get("indoor_mode", False) and now - last_ultra_speak_time.get("all_failed", 0) > 10:
-                    push_message_to_clients("All ultrasonic sensors are offline. Please check connections.")
-                    last_ultra_speak_time["all_failed"] = now
-
-                time.sleep(1)
+                if ultrasonic_voice_enabled and voice_alert_enabled and not config_data.get("indoor_mode", False):
+                    alerts.submit("All ultrasonic sensors are offline. Please check connections.", "warning",
+                                  key="ultrasonic:offline", event_time=now, repeat_after=10)
                 continue
 
-            ultrasonic_readings = readings
-            db.collection('ultrasonic_logs').add({
-                'timestamp': int(time.time() * 1000),
+            telemetry.log('ultrasonic_logs', {
+                'timestamp': int(now * 1000),
                 'readings': readings,
+                'raw': {name: (r if isinstance(r, (int, float)) else None) for name, r in ultrasonic_raw_readings.items()},
                 'faults': failed
             })
             health_status = "OK" if not failed else f"Sensor fault: {', '.join(failed)}"
-            time.sleep(1)
 
     except Exception as e:
         print("[Ultrasonic Error]", e)
     finally:
-        if h is not None:
-            try:
-                lgpio.gpiochip_close(h)
-            except Exception as e:
-                print("[ULTRASONIC] Failed to close gpiochip:", e)
+        devices.ranging.close()
+
 
 
+def power_status():
+    # cpu_percent() measures since its previous call, so only system_metrics_monitor
+    # reads the sensors; everyone else gets its last sample
+    return latest_power if latest_power is not None else devices.power.read()
+
 
 # --- Example for logging with standardized timestamps ---
 def battery_monitor():
     warned = False
     while True:
-        battery = psutil.sensors_battery()
-        percent = battery.percent if battery else 100
+        battery = power_status()["battery"]
+        percent = battery if battery is not None else 100
 
         # 🔋 Log to Firestore with standardized timestamp
-        db.collection('battery_logs').add({
+        telemetry.log('battery_logs', {
             'timestamp': int(time.time() * 1000),
             'readable_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             'battery_percentage': percent
 })
         if percent <= 20 and not warned:
-            push_message_to_clients("Battery low. Please charge Smart Hat.")
+            alerts.submit("Battery low. Please charge Smart Hat.", "info", key="battery:low")
             warned = True
         if percent > 30:
             warned = False
@@ -423,16 +291,45 @@ def battery_monitor():
         time.sleep(60)  # Log every minute
 
         
+def apply_profile(profile):
+    # Push the governor's current profile into every workload it controls
+    inference_rate.max_fps = profile["max_inference_fps"]
+    registry.set_num_threads(profile["threads"])
+    stream_hub.set_limits(profile["stream_max_width"], profile["stream_max_quality"], profile["stream_max_fps"])
+    if profile["record_clips"] != clip_recorder.enabled:
+        # No clips means no reason to keep encoding the pre-roll
+        clip_recorder.enabled = profile["record_clips"]
+        if clip_recorder.enabled:
+            stream_hub.add_viewer(CLIP_PROFILE)
+        else:
+            stream_hub.remove_viewer(CLIP_PROFILE)
+            clip_buffer.clear()
+
+
 def system_metrics_monitor():
+    # Samples often enough for the governor to react to heat, logs once a minute
+    global latest_power
+    last_log = 0
+    apply_profile(governor.profile)
     while True:
+        now = time.time()
+        power = latest_power = devices.power.read()
         usage = {
-            "timestamp": int(time.time() * 1000),
-            "cpu": psutil.cpu_percent(),
-            "memory": psutil.virtual_memory().percent,
-            "temperature": psutil.sensors_temperatures().get("cpu-thermal", [{}])[0].get("current", 0)
+            "timestamp": int(now * 1000),
+            "cpu": power["cpu"],
+            "memory": power["memory"],
+            "temperature": power["temperature"]
         }
-        db.collection("system_health_logs").add(usage)
-        time.sleep(60)
+        override = config_data.get("performance_profile", "auto")
+        if governor.update(usage["temperature"], power["battery"], power["plugged"], usage["cpu"], override, now):
+            print(f"[GOVERNOR] Switched to {governor.profile_name} ({governor.reason})")
+            apply_profile(governor.profile)
+
+        if now - last_log >= SYSTEM_LOG_INTERVAL:
+            usage["profile"] = governor.profile_name
+            telemetry.log("system_health_logs", usage)
+            last_log = now
+        time.sleep(GOVERNOR_SAMPLE_INTERVAL)
         
 def clear_all_logs(keys=None):
     global logging_paused
@@ -459,6 +356,9 @@ def clear_all_logs(keys=None):
             print(f"[SKIP] Unknown collection: {col}")
             continue
 
+        local_store.clear(col)
+        if peek(analytics_app) is not None:
+            analytics_app.reset(col)
         docs = db.collection(col).stream()
         deleted = 0
         for doc in docs:
@@ -475,69 +375,22 @@ def clear_all_logs(keys=None):
 
 
 # --- Video Recording and Upload ---
-def record_video(picam2, duration_sec=2, fps=30):
-    # Define the directory where videos are saved
-    video_dir = "/home/ada/de/videos"
-
-    # Ensure the directory exists, if not create it
-    if not os.path.exists(video_dir):
-        os.makedirs(video_dir)
-
-    # Generate filename with a timestamp
-    filename = f"{video_dir}/alert_{int(time.time())}.avi"
-
-    # Initialize the video writer with XVID codec
-    fourcc = cv2.VideoWriter_fourcc(*'XVID')
-    out = cv2.VideoWriter(filename, fourcc, fps, normalSize)
-
-    # Record the video for the specified duration with bounding boxes
-    labels = read_label_file(LABEL_PATH)
-    interpreter = tflite.Interpreter(model_path=MODEL_PATH)
-    interpreter.allocate_tensors()
-    input_details = interpreter.get_input_details()
-    output_details = interpreter.get_output_details()
-
-    for _ in range(int(duration_sec * fps)):
-        lores = picam2.capture_array("lores")
-        frame = picam2.capture_array("main")
-
-        # Run inference
-        resized = cv2.resize(lores, (input_details[0]['shape'][2], input_details[0]['shape'][1]))
-        input_tensor = np.expand_dims(resized, axis=0)
-        interpreter.set_tensor(input_details[0]['index'], input_tensor)
-        interpreter.invoke()
-
-        boxes = interpreter.get_tensor(output_details[0]['index'])[0]
-        classes = interpreter.get_tensor(output_details[1]['index'])[0]
-        scores = interpreter.get_tensor(output_details[2]['index'])[0]
-
-        for i in range(len(scores)):
-            if scores[i] > 0.5:
-                ymin, xmin, ymax, xmax = boxes[i]
-                class_id = int(classes[i])
-                label = labels.get(class_id, f"id:{class_id}")
-                x1, y1 = int(xmin * normalSize[0]), int(ymin * normalSize[1])
-                x2, y2 = int(xmax * normalSize[0]), int(ymax * normalSize[1])
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-
-        out.write(frame)
-        time.sleep(1 / fps)
-
-    out.release()
-
-    # Now upload the video to Firebase Storage
-    bucket = storage.bucket()
-    blob = bucket.blob(f"videos/{filename.split('/')[-1]}")
+def upload_clip(filename, info):
+    # Upload a finished alert clip, log it and free the SD card
+    blob = bucket.blob(f"videos/{os.path.basename(filename)}")
     blob.upload_from_filename(filename)
     blob.make_public()  # Make the file publicly accessible
     print(f"[VIDEO] Uploaded to Firebase Storage: {blob.public_url}")
 
     # Save metadata in Firestore
-    db.collection('video_logs').add({
+    telemetry.log('video_logs', {
     'timestamp': int(time.time() * 1000),
     'readable_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-    'video_url': blob.public_url  # Store public URL to access the video
+    'video_url': blob.public_url,  # Store public URL to access the video
+    'event_time': int((info["start"] + CLIP_PRE_ROLL) * 1000),
+    'reason': info["reason"],
+    'frames': info["frames"],
+    'fps': info["fps"]
 })
 
     # Delete the video file from Raspberry Pi after upload
@@ -547,8 +400,19 @@ def record_video(picam2, duration_sec=2, fps=30):
     else:
         print(f"[ERROR] Video file not found for deletion: {filename}")
 
+
+# --- Alert clips from the pre-roll buffer ---
+CLIP_PRE_ROLL = 3.0    # seconds before the trigger
+CLIP_POST_ROLL = 2.0   # seconds after it
+CLIP_PROFILE = parse_profile(CLIP_STREAM, normalSize)
+clip_buffer = FrameRing(max_bytes=24 * 1024 * 1024)
+clip_recorder = ClipRecorder(clip_buffer, f"{DATA_DIR}/videos", upload_clip,
+                             pre_roll=CLIP_PRE_ROLL, post_roll=CLIP_POST_ROLL)
+# The buffer is fed like any other stream viewer, so a browser watching the same profile shares the encode
+stream_hub.add_viewer(CLIP_PROFILE)
+
+
 def upload_to_firebase_storage(local_filename, remote_filename):
-    bucket = storage.bucket()
     blob = bucket.blob(remote_filename)
     blob.upload_from_filename(local_filename)
     blob.make_public()
@@ -556,148 +420,87 @@ def upload_to_firebase_storage(local_filename, remote_filename):
 
 
 
+def publish_detections(packet, label_filter):
+    global latest_detections
+    payload = {
+        "frame_id": packet["frame_id"],
+        "width": normalSize[0],
+        "height": normalSize[1],
+        "boxes": [{
+            "label": label_filter.name(det["class_id"]),
+            "track_id": int(track_id),
+            "score": round(float(det["score"]), 3),
+            "x1": int(det["x1"]), "y1": int(det["y1"]), "x2": int(det["x2"]), "y2": int(det["y2"])
+        } for det, track_id in zip(packet["detections"], packet["track_ids"])]
+    }
+    with frame_lock:
+        latest_detections = payload
+    with EMIT_SECONDS.time(("detections",)):
+        socketio.emit('detections', payload)
+
+
 def detection_loop():
-    global latest_frame, detection_active
-    labels = read_label_file(LABEL_PATH)
-    
-    # Initialize interpreter once
+    global detection_pipeline, object_tracker
+
+    camera = devices.camera
+
+    def nearest_obstacle():
+        nearest = min((d for d in ultrasonic_readings.values() if isinstance(d, (int, float))), default=None)
+        return motion_active, nearest
+
+    def push_clip_frame(encoded, packet):
+        # The clip buffer counts as a viewer of CLIP_PROFILE
+        if CLIP_PROFILE in encoded:
+            clip_buffer.push(encoded[CLIP_PROFILE], packet["time"])
+
+    # Labels and model load here, inside the guard: without them the thread
+    # reports the failure and exits instead of dying with a traceback
     try:
-        interpreter = tflite.Interpreter(model_path=MODEL_PATH)
-        interpreter.allocate_tensors()
-        input_details = interpreter.get_input_details()
-        output_details = interpreter.get_output_details()
+        detector = hal.open_detector(HAL_MODE, MODEL_PATH, LABEL_PATH)
+        object_tracker = ObjectTracker(normalSize)
+        stages = DetectionStages(camera, detector, object_tracker, alerts, stream_hub, normalSize,
+                                 inference_rate=inference_rate,
+                                 settings=lambda: config_data,
+                                 context=nearest_obstacle,
+                                 voice_enabled=lambda: voice_alert_enabled,
+                                 log=telemetry.log,
+                                 trigger_clip=clip_recorder.trigger,
+                                 publish=publish_detections,
+                                 on_encoded=push_clip_frame)
     except Exception as e:
-        print("[ERROR] Failed to load TFLite model:", e)
+        print("[ERROR] Failed to load the detection model:", e)
+        startup.fail("model", e)
         return
-
-    last_video_time = 0
-    last_speak_time = 0
-    last_log_time = 0
+    startup.mark("model")
 
     try:
         # Initialize camera once
-        picam2 = Picamera2()
-        camera_config = picam2.create_preview_configuration(
-            main={"size": normalSize, "format": "RGB888"},
-            lores={"size": lowresSize, "format": "RGB888"}
-        )
-        picam2.configure(camera_config)
-        picam2.start()
-        time.sleep(2)
+        camera.start()
         print("[CAMERA] Camera initialized successfully.")
+        startup.mark("camera")
 
-        while True:
-            if not detection_active:
-                time.sleep(0.5)
-                continue
-
-            try:
-                lores = picam2.capture_array("lores")
-                frame = picam2.capture_array("main")
-                display_frame = frame.copy()
-            except Exception as e:
-                print("[CAMERA ERROR] Frame capture failed:", e)
-                continue
-
-            try:
-                resized = cv2.resize(lores, (input_details[0]['shape'][2], input_details[0]['shape'][1]))
-                input_tensor = np.expand_dims(resized, axis=0).astype(np.uint8)
-                interpreter.set_tensor(input_details[0]['index'], input_tensor)
-
-                t0 = time.time()
-                interpreter.invoke()
-                print(f"[INFERENCE] Time: {time.time() - t0:.3f}s")
-
-                boxes = interpreter.get_tensor(output_details[0]['index'])[0]
-                classes = interpreter.get_tensor(output_details[1]['index'])[0]
-                scores = interpreter.get_tensor(output_details[2]['index'])[0]
-            except Exception as e:
-                print("[INFERENCE ERROR]", e)
-                continue
-
-            now = time.time()
+        detection_pipeline = FramePipeline(stages.capture, stages.infer, stages.encode,
+                                           is_enabled=lambda: detection_active)
+        detection_pipeline.start()
+        startup.mark("detection")
 
-            allowed_labels = (["person", "tv", "chair", "bed"]
-                              if config_data.get("indoor_mode", False)
-                              else config_data.get("filter_classes", []))
-
-            for i in range(len(scores)):
-                if scores[i] > 0.5:
-                    try:
-                        ymin, xmin, ymax, xmax = boxes[i]
-                        class_id = int(classes[i])
-                        label = labels.get(class_id, f"id:{class_id}")
-
-                        if label.lower() not in [x.lower() for x in allowed_labels]:
-                            continue
-
-                        x1 = max(0, int(xmin * normalSize[0]))
-                        y1 = max(0, int(ymin * normalSize[1]))
-                        x2 = min(normalSize[0], int(xmax * normalSize[0]))
-                        y2 = min(normalSize[1], int(ymax * normalSize[1]))
-
-                        if x2 <= x1 or y2 <= y1:
-                            print(f"[SKIP] Invalid bounding box: ({x1},{y1}) to ({x2},{y2})")
-                            continue
-
-                        # Draw bounding box
-                        cv2.rectangle(display_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                        cv2.putText(display_frame, f"{label} ({scores[i]*100:.1f}%)", (x1, y1 - 10),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
-
-                        message = {
-                            "person": "Person ahead, stay alert",
-                            "car": "Car ahead, please wait before moving",
-                            "dog": "Dog nearby, proceed cautiously"
-                        }.get(label.lower(), f"{label} detected")
-
-                        if now - last_speak_time > 5 and voice_alert_enabled and not config_data.get("indoor_mode", False):
-                            push_message_to_clients(message)
-                            last_speak_time = now
-
-                        db.collection('detection_logs').add({
-                            'timestamp': int(now * 1000),
-                            'readable_time': datetime.fromtimestamp(now).strftime('%Y-%m-%d %H:%M:%S'),
-                            'label': label,
-                            'confidence': float(scores[i]),
-                            'bounding_box': {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2},
-                            'source': 'camera',
-                            'spoken_message': message if now - last_speak_time == 0 else ""
-                        })
-
-                        box_area = (x2 - x1) * (y2 - y1)
-                        frame_area = normalSize[0] * normalSize[1]
-                        rel_size = box_area / frame_area
-
-                        if rel_size > 0.10 and 'person' in label.lower() and (now - last_video_time > 10):
-                            video_frame_copy = display_frame.copy()
-                            threading.Thread(target=record_video_with_frame, args=(video_frame_copy,), daemon=True).start()
-                            last_video_time = now
-                    except Exception as e:
-                        print("[DETECTION LOOP ERROR]", e)
-                        continue
-
-            # Always draw a test box (debug)
-            cv2.rectangle(display_frame, (50, 50), (200, 200), (255, 0, 0), 2)
-            cv2.putText(display_frame, "TestBox", (60, 45), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
-
-            try:
-                ret, jpeg = cv2.imencode('.jpg', display_frame)
-                if ret:
-                    with frame_lock:
-                        latest_frame = jpeg.tobytes()
-            except Exception as e:
-                print("[FRAME ENCODE ERROR]", e)
-
-            if now - last_log_time > 5:
-                print("[DETECTION] Loop active...")
-                last_log_time = now
+        while detection_pipeline.is_running():
+            time.sleep(5)
+            stats = detection_pipeline.snapshot()
+            print("[DETECTION] Loop active... " + ", ".join(
+                f"{name}: {s['avg_ms']:.0f} ms / {s['fps']:.1f} fps / {s['dropped']} dropped"
+                for name, s in stats.items())
+                + f", model: {inference_rate.effective_fps(time.time()):.1f} fps ({inference_rate.reason})")
 
     except Exception as e:
         print("[DETECTION THREAD ERROR]", e)
+        startup.fail("detection", e)
     finally:
+        if detection_pipeline:
+            detection_pipeline.stop()
+        detector.close()
         try:
-            picam2.stop()
+            camera.stop()
         except Exception as e:
             print("[CAMERA CLEANUP ERROR]", e)
 
@@ -716,27 +519,102 @@ def shutdown_pi():
 
 @app.route("/video_feed")
 def video_feed():
+    # e.g. /video_feed?w=640&q=60&fps=10 for phones over the tunnel
+    profile = parse_profile(request.args, normalSize)
+
     def generate():
-        while True:
-            with frame_lock:
-                if latest_frame is None:
+        stream_hub.add_viewer(profile)
+        seq = 0
+        try:
+            while True:
+                # Blocks until the encode stage publishes a new frame for this profile
+                seq, frame = stream_hub.wait_for_frame(profile, seq)
+                if frame is None:
                     continue
-                frame = latest_frame
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-            time.sleep(0.05)
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+        finally:
+            stream_hub.remove_viewer(profile)
     return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
 
+@app.route("/ultrasonic")
+def get_ultrasonic():
+    # Raw and filtered view of every sensor
+    return jsonify({name: dict(f.last, approach_cm_s=f.approach_speed(),
+                               ttc_s=(round(ultrasonic_ttc[name]["ttc"], 2)
+                                      if name in ultrasonic_ttc and ultrasonic_ttc[name]["ttc"] != float("inf") else None))
+                    for name, f in ultrasonic_filters.items()})
+
+
+@app.route("/detections")
+def get_detections():
+    with frame_lock:
+        return jsonify(latest_detections)
+
+
 @app.route("/status")
 def get_status():
-    battery = psutil.sensors_battery()
+    battery = power_status()["battery"]
     return jsonify({
-        "battery": battery.percent if battery else -1,
+        "battery": battery if battery is not None else -1,
         "health": health_status,
-        "detection_active": detection_active
+        "detection_active": detection_active,
+        "pipeline": detection_pipeline.snapshot() if detection_pipeline else {},
+        "models": registry.stats(),
+        "streams": stream_hub.stats(),
+        "telemetry": telemetry.stats(),
+        "alerts": alerts.stats(),
+        "tracker": object_tracker.stats() if object_tracker else {},
+        "inference": inference_rate.stats(),
+        "governor": governor.stats(),
+        "clips": clip_recorder.stats(),
+        "dashboard_cache": analytics_app.stats() if peek(analytics_app) is not None else {},
+        "metrics": metrics.summary()
     })
 
+@app.route("/metrics")
+def get_metrics():
+    # Prometheus text exposition format
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/ready")
+def get_ready():
+    # Seconds from process start to each subsystem; 503 until alerts can reach the user
+    report = startup.report()
+    return jsonify(report), (200 if report["ready"] else 503)
+
+# --- On-demand profiling (time-boxed; the hat keeps running while it samples) ---
+@app.route("/profile", methods=["GET"])
+def profile_status():
+    return jsonify(profiler.status())
+
+@app.route("/profile/start", methods=["POST"])
+def profile_start():
+    options = request.get_json(silent=True) or {}
+    try:
+        started = profiler.start(duration=options.get("duration", 30), interval=options.get("interval", 0.01),
+                                 trace_memory=options.get("memory", False))
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid profile options: {e}"}), 400
+    if not started:
+        return jsonify({"error": "A profile is already running", **profiler.status()}), 409
+    return jsonify(profiler.status()), 202
+
+@app.route("/profile/stop", methods=["POST"])
+def profile_stop():
+    profiler.stop()
+    return jsonify(profiler.status())
+
+@app.route("/profile/download")
+def profile_download():
+    # Collapsed stacks: feed to flamegraph.pl, or drop onto speedscope.app
+    if not profiler.samples:
+        return jsonify({"error": "No profile has been recorded"}), 404
+    stamp = datetime.fromtimestamp(profiler.started_at).strftime('%Y%m%d_%H%M%S')
+    return Response(profiler.collapsed(), mimetype="text/plain",
+                    headers={"Content-Disposition": f"attachment; filename=smart_hat_{stamp}.folded"})
+
 @app.route("/start", methods=["POST"])
 def start_detection():
     global detection_active
@@ -767,7 +645,8 @@ def update_config():
 @app.route("/speak", methods=["POST"])
 def speak():
     msg = request.json.get("message", "")
-    push_message_to_clients(msg)
+    # Manual messages are never deduplicated against each other
+    alerts.submit(msg, "info", key=f"manual:{time.time()}")
     return jsonify({"status": "spoken", "message": msg})
 
 @app.route("/reset_wifi", methods=["POST"])
@@ -792,8 +671,10 @@ def log_location():
         speed = data.get('speed')
         distance = data.get('distance')
         timestamp = int(time.time() * 1000)
+        # Walking speed from the phone's GPS feeds the collision predictor
+        collision_predictor.update_gps_speed(speed)
 
-        db.collection('location_logs').add({
+        telemetry.log('location_logs', {
             'lat': lat,
             'lng': lng,
             'speed_kmh': speed,
@@ -812,17 +693,78 @@ def receive_motion():
     motion = data.get("moving")
     global motion_active
     motion_active = motion
-    db.collection('motion_logs').add({
+    telemetry.log('motion_logs', {
         'timestamp': int(time.time() * 1000),
         'readable_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
         'motion_status': 'active' if motion else 'inactive'
     })
     return jsonify({"status": "received", "motion": motion})
 
+@app.route("/history/<collection>")
+def get_history(collection):
+    # Local copy of a log collection, e.g. /history/ultrasonic_logs?start=<ms>&end=<ms>&limit=500
+    try:
+        docs = local_store.query(collection,
+                                 start_ms=request.args.get("start", type=int),
+                                 end_ms=request.args.get("end", type=int),
+                                 limit=request.args.get("limit", 1000, type=int))
+        return jsonify({"collection": collection, "count": len(docs), "docs": docs})
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+
+@app.route("/api/series/<collection>")
+def get_series(collection):
+    # Downsampled history from the local store, e.g.
+    # /api/series/system_health_logs?start=<ms>&end=<ms>&width=800&method=minmax
+    import pandas as pd
+    from aggregation import downsample
+    from dashboard_data import flatten_ultrasonic
+    try:
+        end_ms = _int_arg("end")
+        # Without a start only the recent past is loaded, not the whole retention window
+        start_ms = _int_arg("start")
+        if start_ms is None:
+            start_ms = (end_ms or int(time.time() * 1000)) - SERIES_DEFAULT_HOURS * 3600 * 1000
+        width = _int_arg("width", SERIES_DEFAULT_WIDTH)
+        if width < 1:
+            raise ValueError("width must be a positive number of points")
+        width = min(width, SERIES_MAX_WIDTH)
+        method = request.args.get("method", "minmax")
+        if method not in ("minmax", "lttb"):
+            raise ValueError(f"Unknown method: {method!r}")
+        docs = local_store.query(collection, start_ms=start_ms, end_ms=end_ms)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    rows = flatten_ultrasonic(docs) if collection == 'ultrasonic_logs' else docs
+    df = pd.DataFrame(rows)
+    if df.empty or 'timestamp' not in df.columns:
+        return jsonify({"collection": collection, "points": []})
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', errors='coerce')
+    df = df.dropna(subset=['timestamp'])
+    columns = list(df.select_dtypes(include='number').columns)
+    df = downsample(df, columns, width, method=method)
+    if df.empty:
+        return jsonify({"collection": collection, "points": []})
+    df['timestamp'] = (df['timestamp'] - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1)
+    return jsonify({"collection": collection, "points": json.loads(df.to_json(orient='records'))})
+
+
+def _int_arg(name, default=None):
+    # request.args.get(type=int) silently falls back to the default on garbage; this says so
+    value = request.args.get(name)
+    if value is None or value == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer, got {value!r}")
+
+
 @app.route("/latest_video_url")
 def latest_video_url():
     try:
-        with open("/home/ada/de/latest_video.txt", "r") as f:
+        with open(f"{DATA_DIR}/latest_video.txt", "r") as f:
             url = f.read().strip()
         return jsonify({"url": url})
     except:
@@ -841,6 +783,9 @@ def delete_logs():
             'video_logs'
         ]
         for col in collections:
+            local_store.clear(col)
+            if peek(analytics_app) is not None:
+                analytics_app.reset(col)
             docs = db.collection(col).stream()
             for doc in docs:
                 doc.reference.delete()
@@ -856,21 +801,28 @@ def delete_logs():
 
 def start_flask():
     print("[FLASK] Starting Flask app...")
-    socketio.run(app, host="0.0.0.0", port=5000, debug=False, use_reloader=False, allow_unsafe_werkzeug=True)
+    socketio.run(app, host="0.0.0.0", port=PORT, debug=False, use_reloader=False, allow_unsafe_werkzeug=True)
+
+def wait_for_port(port, timeout=30.0):
+    # Poll instead of sleeping a fixed time; Flask usually binds in well under a second
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.05)
+    return False
 
 def start_ngrok():
+    # Called once Flask is listening, so there is nothing to wait for
     try:
-        time.sleep(5)  # Give Flask time to bind to port 5000
-
         print("[NGROK] Launching tunnel to https://smartaid.ngrok.io ...")
         process = subprocess.Popen([
-            "ngrok", "http", "--domain=smartaid.ngrok.io", "5000"
+            "ngrok", "http", "--domain=smartaid.ngrok.io", str(PORT)
         ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-        # Optional: Wait a bit and check logs for troubleshooting
-        time.sleep(5)
-        # Show last 10 lines of ngrok log for debugging (optional)
         print("[NGROK] Tunnel started. Check dashboard or browser: https://smartaid.ngrok.io")
+        startup.mark("ngrok")
 
         return process
     except Exception as e:
@@ -879,19 +831,28 @@ def start_ngrok():
 
 if __name__ == "__main__":
     try:
-        # Start Flask server in a separate thread
-        flask_thread = threading.Thread(target=start_flask, daemon=True)
+        # Safety path first: the alert arbiter, ultrasonic ranging, then the
+        # server that pushes speech to the phone. Threads are named so profiles
+        # and tracebacks say which loop a stack belongs to.
+        alerts.start()
+        startup.mark("alerts")
+        threading.Thread(target=ultrasonic_loop, name="ultrasonic", daemon=True).start()
+        flask_thread = threading.Thread(target=start_flask, name="flask", daemon=True)
         flask_thread.start()
+        if wait_for_port(PORT):
+            startup.mark("flask")
+        else:
+            print(f"[FLASK] Not listening on port {PORT} yet, continuing startup")
+
+        # Then logging, monitors, camera and model; Firebase and the dashboard load on first use
+        telemetry.start()
+        startup.mark("telemetry")
+        threading.Thread(target=battery_monitor, name="battery", daemon=True).start()
+        threading.Thread(target=detection_loop, name="detection", daemon=True).start()
+        threading.Thread(target=system_metrics_monitor, name="system-metrics", daemon=True).start()
 
-        # Start ngrok after Flask binds
         ngrok_proc = start_ngrok()
 
-        # Start your background monitoring threads
-        threading.Thread(target=ultrasonic_loop, daemon=True).start()
-        threading.Thread(target=battery_monitor, daemon=True).start()
-        threading.Thread(target=detection_loop, daemon=True).start()
-        threading.Thread(target=system_metrics_monitor, daemon=True).start()
-
         # Keep the main thread alive
         while True:
             time.sleep(10)
@@ -903,3 +864,6 @@ if __name__ == "__main__":
             ngrok_proc.terminate()
             print("[NGROK] Tunnel closed")
 
+        alerts.stop()
+        telemetry.stop()
+
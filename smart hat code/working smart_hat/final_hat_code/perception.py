@@ -0,0 +1,248 @@
+# Smart Hat perception stages
+# The three stages detection_loop runs on a FramePipeline: capture, inference
+# (detector, postprocess, tracker, spoken alerts, detection_logs and the clip
+# trigger) and encode; and ultrasonic_reading(), what ultrasonic_loop does
+# with each ping. new_app.py wires them to the camera, the sensors, Socket.IO
+# and Firestore; benchmark.py runs the very same code against simulated
+# devices, so its numbers are the app's numbers.
+
+import contextlib
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from metrics import metrics
+from postprocess import EMPTY_DETECTIONS, LabelFilter, postprocess
+from settings import INDOOR_LABELS
+
+STAGE_SECONDS = metrics.histogram("stage_seconds", "Time spent in each detection stage", ("stage",))
+STAGE_TIMERS = {name: STAGE_SECONDS.labels(name)
+                for name in ("capture", "inference", "postprocess", "tracking", "alerts", "encode")}
+FRAMES = metrics.counter("frames_total", "Frames through the inference stage", ("result",))
+FRAMES_INFERRED, FRAMES_SKIPPED = FRAMES.labels("inferred"), FRAMES.labels("skipped")
+ULTRASONIC_READINGS = metrics.counter("ultrasonic_readings_total", "Ultrasonic readings", ("sensor", "result"))
+
+ENTER_MESSAGES = {
+    "person": "Person ahead, stay alert",
+    "car": "Car ahead, please wait before moving",
+    "dog": "Dog nearby, proceed cautiously"
+}
+CLIP_MIN_INTERVAL = 10   # seconds between clip triggers
+CLOSE_PERSON_AREA = 0.10  # share of the frame a person must fill to count as close
+
+
+def _nothing(*args):
+    return None
+
+
+@contextlib.contextmanager
+def _stage(packet, name):
+    # Into the metrics histogram, and per frame into the packet for the benchmark
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        STAGE_TIMERS[name].observe(elapsed)
+        packet.setdefault("stage_seconds", {})[name] = elapsed
+
+
+class DetectionStages:
+    """capture(), infer(packet) and encode(packet) for FramePipeline.
+
+    Everything app-specific comes in as a callable:
+      settings()        current config (filter_classes, indoor_mode, render_mode, adaptive_inference)
+      context()         (motion_active, nearest obstacle cm) for adaptive inference
+      voice_enabled()   whether track events are spoken
+      log(collection, doc), trigger_clip(time, reason) -> bool,
+      publish(packet, label_filter) for the "metadata" render mode,
+      on_encoded(encoded, packet) with the stream hub's JPEGs per profile
+    inference_rate is an AdaptiveInference, or None to run the model on every frame.
+    """
+
+    def __init__(self, camera, detector, tracker, alerts, stream_hub, frame_size, inference_rate=None,
+                 settings=dict, context=lambda: (False, None), voice_enabled=lambda: True,
+                 log=_nothing, trigger_clip=_nothing, publish=_nothing, on_encoded=_nothing):
+        self.camera = camera
+        self.detector = detector
+        self.label_filter = LabelFilter(detector.labels)
+        self.person_ids = self.label_filter.ids("person")
+        self.tracker = tracker
+        self.alerts = alerts
+        self.stream_hub = stream_hub
+        self.frame_size = frame_size
+        self.inference_rate = inference_rate
+        self.settings = settings
+        self.context = context
+        self.voice_enabled = voice_enabled
+        self.log = log
+        self.trigger_clip = trigger_clip
+        self.publish = publish
+        self.on_encoded = on_encoded
+        self.frame_id = 0
+        self.events = 0
+        self.last_clip_time = 0
+        self.detections = EMPTY_DETECTIONS
+        self.track_ids = np.zeros(0, dtype=np.int32)
+
+    # --- Stage 1: capture lores + main from the same camera request ---
+    def capture(self):
+        with STAGE_TIMERS["capture"].time():
+            lores, frame = self.camera.capture()
+        self.frame_id += 1
+        return {"frame_id": self.frame_id, "time": time.time(), "lores": lores, "frame": frame}
+
+    # --- Stage 2: inference, alerts and logging ---
+    def infer(self, packet):
+        config = self.settings()
+        if self.inference_rate is not None:
+            motion_active, nearest = self.context()
+            if not self.inference_rate.decide(packet["lores"], packet["time"], motion_active, nearest,
+                                              adaptive=config.get("adaptive_inference", True)):
+                # Nothing new to see: keep showing the last boxes and skip the model
+                packet["detections"], packet["track_ids"] = self.detections, self.track_ids
+                packet["inference_skipped"] = True
+                FRAMES_SKIPPED.inc()
+                del packet["lores"]
+                return packet
+
+        with _stage(packet, "inference"):
+            boxes, classes, scores = self.detector(packet["lores"])
+        FRAMES_INFERRED.inc()
+
+        now = time.time()
+        indoor = config.get("indoor_mode", False)
+        allowed_labels = INDOOR_LABELS if indoor else config.get("filter_classes", [])
+
+        with _stage(packet, "postprocess"):
+            detections = postprocess(boxes, classes, scores, self.label_filter.lookup(allowed_labels),
+                                     self.frame_size)
+        packet["detections"] = detections
+
+        # Speech and logging happen once per track event, not once per box per frame
+        with _stage(packet, "tracking"):
+            packet["track_ids"], events = self.tracker.update(detections, packet["time"])
+        self.detections, self.track_ids = detections, packet["track_ids"]
+        self.events += len(events)
+        with _stage(packet, "alerts"):
+            self._alert(packet, events, detections, indoor, now)
+
+        del packet["lores"]
+        return packet
+
+    def _alert(self, packet, events, detections, indoor, now):
+        # Speech and detection_logs per track event, then the clip trigger
+        person_approaching = False
+        for event in events:
+            try:
+                label = self.label_filter.name(event["class_id"])
+                x1, y1, x2, y2 = event["box"]
+
+                queued = ""
+                if event["event"] == "enter":
+                    message = ENTER_MESSAGES.get(label.lower(), f"{label} detected")
+                    severity = "info"
+                elif event["event"] == "approach":
+                    message = f"{label} approaching"
+                    severity = "warning"
+                    person_approaching |= event["class_id"] in self.person_ids
+                else:
+                    message = None
+
+                if message and self.voice_enabled() and not indoor:
+                    # Latency is measured from the moment the frame was captured. submit() only
+                    # says the arbiter queued it; a newer alert may still replace it unspoken.
+                    if self.alerts.submit(message, severity, key=f"detection:{event['event']}:{label.lower()}",
+                                          event_time=packet["time"]):
+                        queued = message
+
+                self.log('detection_logs', {
+                    'timestamp': int(now * 1000),
+                    'readable_time': datetime.fromtimestamp(now).strftime('%Y-%m-%d %H:%M:%S'),
+                    'label': label,
+                    'confidence': event["score"],
+                    'bounding_box': {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2},
+                    'source': 'camera',
+                    'event': event["event"],
+                    'track_id': event["track_id"],
+                    'duration_s': event["duration_s"],
+                    'queued_message': queued
+                })
+            except Exception as e:
+                print("[DETECTION LOOP ERROR]", e)
+                continue
+
+        # A person approaching, or filling more than 10% of the frame, triggers a clip
+        frame_area = self.frame_size[0] * self.frame_size[1]
+        close_person = (np.isin(detections["class_id"], self.person_ids)
+                        & (detections["area"] > CLOSE_PERSON_AREA * frame_area))
+        if (person_approaching or close_person.any()) and now - self.last_clip_time > CLIP_MIN_INTERVAL:
+            if self.trigger_clip(packet["time"], "person approaching" if person_approaching else "person close"):
+                self.last_clip_time = now
+
+    # --- Stage 3: annotate and JPEG-encode for /video_feed and the clip buffer ---
+    # The captured frame is a fresh array owned by this packet, so boxes are
+    # drawn straight into it; no full-size copies. In "metadata" mode nothing
+    # is drawn at all and the boxes go to the browser, which overlays them itself.
+    def encode(self, packet):
+        with STAGE_TIMERS["encode"].time():
+            self._encode(packet)
+
+    def _encode(self, packet):
+        display_frame = packet["frame"]
+        if self.settings().get("render_mode", "inplace") == "metadata":
+            self.publish(packet, self.label_filter)
+        else:
+            for det in packet["detections"]:
+                x1, y1, x2, y2 = int(det["x1"]), int(det["y1"]), int(det["x2"]), int(det["y2"])
+                cv2.rectangle(display_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                cv2.putText(display_frame, f"{self.label_filter.name(det['class_id'])} ({det['score']*100:.1f}%)",
+                            (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+
+            # Always draw a test box (debug)
+            cv2.rectangle(display_frame, (50, 50), (200, 200), (255, 0, 0), 2)
+            cv2.putText(display_frame, "TestBox", (60, 45), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+
+        # Only profiles somebody is watching get encoded
+        encoded = self.stream_hub.publish(display_frame)
+        self.on_encoded(encoded, packet)
+
+
+def ultrasonic_reading(name, raw, stamp, sensor_filter, predictor, alerts, config, motion_active=False, speak=True):
+    """Filter one ping and voice an obstacle warning if it calls for one.
+
+    Returns the TTC assessment in "ttc" alert mode (computed whether or not
+    anything is spoken), else None. The cooldown of a TTC alert the arbiter
+    drops unspoken is released again.
+    """
+    sensor_filter.update(raw, stamp)
+    ULTRASONIC_READINGS.inc(1, (name, "ok" if isinstance(raw, (int, float)) else "miss"))
+    dist = sensor_filter.value(config.get("ultrasonic_filter", "kalman"))
+    if not isinstance(dist, (int, float)):
+        return None
+    side = 'left' if 'Left' in name else 'right'
+
+    if config.get("ultrasonic_alert_mode", "ttc") == "ttc":
+        # Alert on predicted seconds to impact, using the filter's closing speed
+        assessment = predictor.assess(name, dist, sensor_filter.approach_speed(), motion_active, stamp,
+                                      forward=name in config.get("forward_sensors", ()))
+        if speak and predictor.should_alert(name, assessment["level"], stamp):
+            # The cooldown only counts if the warning was actually spoken
+            release = lambda: predictor.release(name, stamp)
+            if assessment["level"] == "critical":
+                alerts.submit(f"Stop. Obstacle on {side} at {dist:.0f} cm", "critical",
+                              key=f"obstacle:{side}", event_time=stamp, on_drop=release)
+            else:
+                alerts.submit(f"Obstacle on {side} at {dist:.0f} cm, approaching", "warning",
+                              key=f"obstacle:{side}", event_time=stamp, on_drop=release)
+        return assessment
+
+    if speak:
+        threshold = config.get("ultrasonic_thresholds", {}).get(name, 100)
+        if dist < threshold:
+            alerts.submit(f"Obstacle on {side} at {dist} cm", "warning",
+                          key=f"obstacle:{name}", event_time=stamp, repeat_after=4)
+    return None
+
@@ -0,0 +1,177 @@
+# Smart Hat frame pipeline
+# Runs capture, inference and annotate/encode as separate threads connected by
+# bounded "latest only" queues, so a slow stage drops stale frames instead of
+# holding the others back.
+
+import collections
+import threading
+import time
+
+
+class LatestQueue:
+    """Bounded queue that discards the oldest item when a new one arrives and it is full."""
+
+    def __init__(self, maxsize=1):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._items = collections.deque()
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        with self._cond:
+            while len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def clear(self):
+        with self._cond:
+            self._items.clear()
+
+
+class StageStats:
+    """Per-stage latency and throughput counters."""
+
+    def __init__(self, name, window=60):
+        self.name = name
+        self.processed = 0
+        self.errors = 0
+        self.dropped = 0
+        self.last_ms = 0.0
+        self.avg_ms = 0.0
+        self.max_ms = 0.0
+        self._done_times = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        ms = seconds * 1000.0
+        with self._lock:
+            self.processed += 1
+            self.last_ms = ms
+            # Exponential moving average keeps the number stable on a noisy Pi
+            self.avg_ms = ms if self.processed == 1 else self.avg_ms * 0.9 + ms * 0.1
+            self.max_ms = max(self.max_ms, ms)
+            self._done_times.append(time.monotonic())
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def fps(self):
+        with self._lock:
+            if len(self._done_times) < 2:
+                return 0.0
+            span = self._done_times[-1] - self._done_times[0]
+            return (len(self._done_times) - 1) / span if span > 0 else 0.0
+
+    def snapshot(self):
+        fps = self.fps()
+        with self._lock:
+            return {
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "last_ms": round(self.last_ms, 2),
+                "avg_ms": round(self.avg_ms, 2),
+                "max_ms": round(self.max_ms, 2),
+                "fps": round(fps, 2),
+            }
+
+
+class FramePipeline:
+    """Three-stage capture -> inference -> encode pipeline.
+
+    capture_fn() returns a packet (any object, usually a dict) or None to skip.
+    infer_fn(packet) returns the packet to pass on, or None to drop it.
+    encode_fn(packet) consumes the packet.
+    is_enabled() lets the capture stage idle while detection is switched off.
+    """
+
+    def __init__(self, capture_fn, infer_fn, encode_fn, is_enabled=None, queue_size=1):
+        self.capture_fn = capture_fn
+        self.infer_fn = infer_fn
+        self.encode_fn = encode_fn
+        self.is_enabled = is_enabled or (lambda: True)
+        self.infer_queue = LatestQueue(queue_size)
+        self.encode_queue = LatestQueue(queue_size)
+        self.stats = {
+            "capture": StageStats("capture"),
+            "inference": StageStats("inference"),
+            "encode": StageStats("encode"),
+        }
+        self._running = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._running.set()
+        self._threads = [
+            threading.Thread(target=self._capture_worker, name="pipeline-capture", daemon=True),
+            threading.Thread(target=self._stage_worker, name="pipeline-inference", daemon=True,
+                             args=("inference", self.infer_queue, self.infer_fn, self.encode_queue)),
+            threading.Thread(target=self._stage_worker, name="pipeline-encode", daemon=True,
+                             args=("encode", self.encode_queue, self.encode_fn, None)),
+        ]
+        for t in self._threads:
+            t.start()
+
+    def stop(self, timeout=2.0):
+        self._running.clear()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def is_running(self):
+        return self._running.is_set() and all(t.is_alive() for t in self._threads)
+
+    def _capture_worker(self):
+        stats = self.stats["capture"]
+        while self._running.is_set():
+            if not self.is_enabled():
+                self.infer_queue.clear()
+                self.encode_queue.clear()
+                time.sleep(0.5)
+                continue
+            t0 = time.perf_counter()
+            try:
+                packet = self.capture_fn()
+            except Exception as e:
+                print("[CAMERA ERROR] Frame capture failed:", e)
+                stats.record_error()
+                time.sleep(0.1)
+                continue
+            if packet is None:
+                continue
+            stats.record(time.perf_counter() - t0)
+            self.infer_queue.put(packet)
+
+    def _stage_worker(self, name, in_queue, fn, out_queue):
+        stats = self.stats[name]
+        while self._running.is_set():
+            packet = in_queue.get(timeout=0.5)
+            if packet is None:
+                continue
+            t0 = time.perf_counter()
+            try:
+                result = fn(packet)
+            except Exception as e:
+                print(f"[PIPELINE] {name} stage error:", e)
+                stats.record_error()
+                continue
+            stats.record(time.perf_counter() - t0)
+            if out_queue is not None and result is not None:
+                out_queue.put(result)
+
+    def snapshot(self):
+        # A queue's drops belong to the stage that failed to keep up with it
+        self.stats["inference"].dropped = self.infer_queue.dropped
+        self.stats["encode"].dropped = self.encode_queue.dropped
+        return {name: s.snapshot() for name, s in self.stats.items()}
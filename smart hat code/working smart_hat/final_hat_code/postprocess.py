@@ -0,0 +1,84 @@
+# Smart Hat detection post-processing
+# Turns raw SSD outputs into a compact structured array in one vectorized
+# pass: score threshold, class allow-list, box scaling, clipping and area.
+
+import numpy as np
+
+DETECTION_DTYPE = np.dtype([
+    ("class_id", np.int32),
+    ("score", np.float32),
+    ("x1", np.int32),
+    ("y1", np.int32),
+    ("x2", np.int32),
+    ("y2", np.int32),
+    ("area", np.int32),
+])
+
+EMPTY_DETECTIONS = np.empty(0, dtype=DETECTION_DTYPE)
+
+
+class LabelFilter:
+    """Boolean lookup table over class IDs, rebuilt only when the allow-list changes."""
+
+    def __init__(self, labels):
+        self.labels = labels
+        self.size = max(labels) + 1 if labels else 1
+        self._ids_by_name = {}
+        for class_id, name in labels.items():
+            self._ids_by_name.setdefault(name.lower(), []).append(class_id)
+        self._cache = {}
+
+    def ids(self, name):
+        return self._ids_by_name.get(name.lower(), [])
+
+    def lookup(self, allowed_labels=None):
+        # None means "every known label"
+        key = None if allowed_labels is None else tuple(sorted(x.lower() for x in allowed_labels))
+        lut = self._cache.get(key)
+        if lut is None:
+            if key is None:
+                lut = np.zeros(self.size, dtype=bool)
+                lut[list(self.labels)] = True
+            else:
+                lut = np.zeros(self.size, dtype=bool)
+                for name in key:
+                    lut[self.ids(name)] = True
+            self._cache[key] = lut
+        return lut
+
+    def name(self, class_id):
+        return self.labels.get(int(class_id), f"id:{int(class_id)}")
+
+
+def postprocess(boxes, classes, scores, lut, frame_size, threshold=0.5):
+    """Filter and scale one frame of SSD output.
+
+    boxes is (N, 4) normalized [ymin, xmin, ymax, xmax], classes and scores are (N,).
+    Returns a DETECTION_DTYPE array with boxes in frame_size pixel coordinates.
+    """
+    scores = np.asarray(scores, dtype=np.float32)
+    class_ids = np.asarray(classes).astype(np.int32)
+
+    keep = scores > threshold
+    keep &= (class_ids >= 0) & (class_ids < lut.shape[0])
+    keep[keep] = lut[class_ids[keep]]
+    if not keep.any():
+        return EMPTY_DETECTIONS
+
+    width, height = frame_size
+    scaled = np.asarray(boxes, dtype=np.float32)[keep] * np.array([height, width, height, width], dtype=np.float32)
+    coords = scaled.astype(np.int32)
+    np.clip(coords[:, 0::2], 0, height, out=coords[:, 0::2])
+    np.clip(coords[:, 1::2], 0, width, out=coords[:, 1::2])
+    y1, x1, y2, x2 = coords.T
+
+    valid = (x2 > x1) & (y2 > y1)
+    out = np.empty(int(valid.sum()), dtype=DETECTION_DTYPE)
+    out["class_id"] = class_ids[keep][valid]
+    out["score"] = scores[keep][valid]
+    out["x1"] = x1[valid]
+    out["y1"] = y1[valid]
+    out["x2"] = x2[valid]
+    out["y2"] = y2[valid]
+    out["area"] = (out["x2"] - out["x1"]) * (out["y2"] - out["y1"])
+    return out
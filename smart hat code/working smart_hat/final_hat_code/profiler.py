@@ -0,0 +1,156 @@
+# Smart Hat sampling profiler
+# Started from the control panel when a hat in the field feels sluggish. A
+# background thread samples every thread's stack with sys._current_frames()
+# a hundred times a second for a fixed time box, then stops by itself. The
+# result is a collapsed-stack file ("thread;outer;inner count" per line) that
+# flamegraph.pl, speedscope or inferno render directly. Optionally the
+# tracemalloc heap is snapshotted at both ends and the growth reported.
+
+import collections
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+MAX_DURATION = 120      # seconds; longer profiles tell nothing a second one wouldn't
+MIN_INTERVAL = 0.002    # seconds between samples
+MAX_STACK_DEPTH = 64
+MEMORY_FRAMES = 10      # traceback depth tracemalloc records per allocation
+MEMORY_TOP = 30         # allocation sites listed in the diff
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def _collapse(thread_name, frame):
+    stack = []
+    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    stack.append(thread_name)
+    # Root first; ';' separates frames in the collapsed format
+    return ";".join(reversed(stack))
+
+
+class SamplingProfiler:
+    """One time-boxed profile at a time; the last result is kept until the next starts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._stacks = collections.Counter()
+        self._memory = []
+        self.started_at = None
+        self.finished_at = None
+        self.duration = 0
+        self.interval = 0
+        self.samples = 0
+        self.overhead_s = 0.0
+        self.trace_memory = False
+        self.error = None
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration=30, interval=0.01, trace_memory=False):
+        """Begin a profile; returns False if one is already running."""
+        with self._lock:
+            if self.running():
+                return False
+            self.duration = min(max(float(duration), 1.0), MAX_DURATION)
+            self.interval = max(float(interval), MIN_INTERVAL)
+            self.trace_memory = bool(trace_memory)
+            self._stacks = collections.Counter()
+            self._memory = []
+            self.samples = 0
+            self.overhead_s = 0.0
+            self.error = None
+            self.started_at = time.time()
+            self.finished_at = None
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+            self._thread.start()
+        print(f"[PROFILER] Sampling every {self.interval * 1000:.0f} ms for {self.duration:g} s"
+              + (" with tracemalloc" if self.trace_memory else ""))
+        return True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        started_tracing = False
+        before = None
+        try:
+            if self.trace_memory:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(MEMORY_FRAMES)
+                    started_tracing = True
+                before = tracemalloc.take_snapshot()
+
+            deadline = time.monotonic() + self.duration
+            while not self._stop.is_set() and time.monotonic() < deadline:
+                t0 = time.perf_counter()
+                names = {t.ident: t.name for t in threading.enumerate()}
+                sample = [_collapse(names.get(ident, f"thread-{ident}"), frame)
+                          for ident, frame in sys._current_frames().items() if ident != own_id]
+                with self._lock:
+                    self._stacks.update(sample)
+                    self.samples += 1
+                spent = time.perf_counter() - t0
+                self.overhead_s += spent
+                self._stop.wait(max(0.0, self.interval - spent))
+
+            if before is not None:
+                after = tracemalloc.take_snapshot()
+                self._memory = [{
+                    "site": str(stat.traceback[0]) if stat.traceback else "?",
+                    "size_diff_kb": round(stat.size_diff / 1024, 1),
+                    "size_kb": round(stat.size / 1024, 1),
+                    "count_diff": stat.count_diff,
+                } for stat in after.compare_to(before, "lineno")[:MEMORY_TOP]]
+        except Exception as e:
+            print("[PROFILER] Profile failed:", e)
+            self.error = str(e)
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+            self.finished_at = time.time()
+            print(f"[PROFILER] Done: {self.samples} samples, {len(self._stacks)} distinct stacks")
+
+    def collapsed(self):
+        """Flamegraph input: one 'frame;frame;frame count' line per distinct stack."""
+        with self._lock:
+            stacks = dict(self._stacks)
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+
+    def status(self):
+        with self._lock:
+            stacks = dict(self._stacks)
+        threads = collections.Counter()
+        for stack, count in stacks.items():
+            threads[stack.split(";", 1)[0]] += count
+        elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0
+        return {
+            "running": self.running(),
+            "started": int(self.started_at * 1000) if self.started_at else None,
+            "duration_s": self.duration,
+            "elapsed_s": round(elapsed, 1),
+            "interval_ms": round(self.interval * 1000, 1),
+            "samples": self.samples,
+            "stacks": len(stacks),
+            # Share of wall time the sampler itself spent walking stacks
+            "overhead_pct": round(100 * self.overhead_s / elapsed, 2) if elapsed else 0,
+            "threads": dict(threads.most_common()),
+            "memory": self._memory if self.trace_memory else None,
+            "error": self.error,
+        }
+
+
+profiler = SamplingProfiler()
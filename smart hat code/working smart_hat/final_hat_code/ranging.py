@@ -0,0 +1,185 @@
+# Smart Hat ultrasonic ranging backends
+# PollingRanger is the original busy-wait on gpio_read. EdgeRanger asks lgpio
+# for alerts on both echo edges and uses the kernel's nanosecond timestamps,
+# so the sensor thread sleeps while the pulse is in flight and readings are
+# not stretched when inference is hogging the CPU.
+
+import threading
+import time
+
+try:
+    import lgpio
+except ImportError:
+    # Off the hat only RangingScheduler is usable, with a simulated ranger
+    lgpio = None
+
+SPEED_OF_SOUND_CM_S = 34300
+
+
+def pulse_to_distance(seconds):
+    distance = (seconds * SPEED_OF_SOUND_CM_S) / 2
+    return round(distance, 2) if 2 < distance < 400 else "Out of Range"
+
+
+def measure_distance(h, trig, echo, timeout=0.02):
+    lgpio.gpio_write(h, trig, 1)
+    time.sleep(0.00001)
+    lgpio.gpio_write(h, trig, 0)
+    start = time.time()
+    timeout_start = time.time()
+    while lgpio.gpio_read(h, echo) == 0:
+        start = time.time()
+        if time.time() - timeout_start > timeout:
+            return "No Echo"
+    timeout_start = time.time()
+    while lgpio.gpio_read(h, echo) == 1:
+        stop = time.time()
+        if time.time() - timeout_start > timeout:
+            return "Echo Timeout"
+    return pulse_to_distance(stop - start)
+
+
+class PollingRanger:
+    def __init__(self, h, sensors):
+        self.h = h
+        for s in sensors.values():
+            try:
+                lgpio.gpio_free(h, s["trigger"])
+                lgpio.gpio_free(h, s["echo"])
+            except:
+                pass
+            lgpio.gpio_claim_output(h, s["trigger"])
+            lgpio.gpio_claim_input(h, s["echo"])
+
+    def measure_distance(self, trig, echo, timeout=0.02):
+        return measure_distance(self.h, trig, echo, timeout)
+
+    def close(self):
+        pass
+
+
+class _Echo:
+    __slots__ = ("rise", "fall", "done")
+
+    def __init__(self):
+        self.rise = None
+        self.fall = None
+        self.done = threading.Event()
+
+
+class EdgeRanger:
+    """Edge-timestamped ranging with the same results as measure_distance()."""
+
+    def __init__(self, h, sensors):
+        self.h = h
+        self._echoes = {}
+        self._callbacks = []
+        for s in sensors.values():
+            try:
+                lgpio.gpio_free(h, s["trigger"])
+                lgpio.gpio_free(h, s["echo"])
+            except:
+                pass
+            lgpio.gpio_claim_output(h, s["trigger"])
+            lgpio.gpio_claim_alert(h, s["echo"], lgpio.BOTH_EDGES)
+            self._echoes[s["echo"]] = _Echo()
+            self._callbacks.append(lgpio.callback(h, s["echo"], lgpio.BOTH_EDGES, self._on_edge))
+
+    def _on_edge(self, chip, gpio, level, tick):
+        echo = self._echoes.get(gpio)
+        if echo is None or echo.done.is_set():
+            return
+        # tick is the kernel timestamp of the edge in nanoseconds
+        if level == 1:
+            echo.rise = tick
+        elif level == 0 and echo.rise is not None:
+            echo.fall = tick
+            echo.done.set()
+
+    def trigger(self, trig, echo):
+        """Reset the echo state and fire a 10 us trigger pulse."""
+        state = self._echoes[echo]
+        state.rise = None
+        state.fall = None
+        state.done.clear()
+        lgpio.gpio_write(self.h, trig, 1)
+        time.sleep(0.00001)
+        lgpio.gpio_write(self.h, trig, 0)
+
+    def result(self, echo, timeout=0.02):
+        """Wait for the falling edge of a triggered sensor and convert to cm."""
+        state = self._echoes[echo]
+        # Same budget as the polling version: `timeout` for each edge
+        if not state.done.wait(2 * timeout):
+            return "No Echo" if state.rise is None else "Echo Timeout"
+        return pulse_to_distance((state.fall - state.rise) / 1e9)
+
+    def measure_distance(self, trig, echo, timeout=0.02):
+        self.trigger(trig, echo)
+        return self.result(echo, timeout)
+
+    def close(self):
+        for cb in self._callbacks:
+            cb.cancel()
+        self._callbacks = []
+
+
+class RangingScheduler:
+    """Fires sensors at their own rates, in groups that do not hear each other.
+
+    groups is a list of sensor-name lists; members of a group point in
+    different directions and are triggered together, groups run one after
+    another with a short settle gap so one group's echo is not picked up by
+    the next. rates maps sensor name to pings per second. settle is that gap
+    in seconds; by default a quarter of the echo timeout (5 ms at 20 ms).
+    """
+
+    def __init__(self, ranger, sensors, groups, rates, default_rate=5.0, timeout=0.02, settle=None):
+        self.ranger = ranger
+        self.sensors = sensors
+        self.groups = [list(g) for g in groups]
+        grouped = {name for g in self.groups for name in g}
+        # Anything left out of the groups is fired on its own
+        self.groups += [[name] for name in sensors if name not in grouped]
+        self.default_rate = default_rate
+        self.timeout = timeout
+        self.settle = timeout / 4 if settle is None else settle
+        self.rates = {}
+        self.set_rates(rates)
+        self._next_due = {name: 0.0 for name in sensors}
+        self.latest = {}
+        # Only backends with split trigger/result can fire a group in parallel
+        self.parallel = hasattr(ranger, "trigger") and hasattr(ranger, "result")
+
+    def set_rates(self, rates):
+        self.rates = {name: float((rates or {}).get(name, self.default_rate)) for name in self.sensors}
+
+    def run_due(self):
+        """Ping every sensor that is due and return [(name, distance, timestamp)]."""
+        results = []
+        for group in self.groups:
+            now = time.monotonic()
+            due = [name for name in group if self._next_due[name] <= now and self.rates[name] > 0]
+            if not due:
+                continue
+            for name in due:
+                self._next_due[name] = now + 1.0 / self.rates[name]
+            if self.parallel:
+                for name in due:
+                    self.ranger.trigger(self.sensors[name]["trigger"], self.sensors[name]["echo"])
+                readings = [self.ranger.result(self.sensors[name]["echo"], self.timeout) for name in due]
+            else:
+                readings = [self.ranger.measure_distance(self.sensors[name]["trigger"], self.sensors[name]["echo"],
+                                                         self.timeout) for name in due]
+            stamp = time.time()
+            for name, dist in zip(due, readings):
+                self.latest[name] = (dist, stamp)
+                results.append((name, dist, stamp))
+            time.sleep(self.settle)
+        return results
+
+    def time_to_next(self):
+        active = [t for name, t in self._next_due.items() if self.rates[name] > 0]
+        if not active:
+            return 0.5
+        return max(0.0, min(active) - time.monotonic())
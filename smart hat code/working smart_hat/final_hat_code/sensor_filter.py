@@ -0,0 +1,109 @@
+# Smart Hat ultrasonic signal filtering
+# One SensorFilter per sensor keeps a fixed ring buffer of recent readings and
+# produces a median-of-N, an exponential average and a constant-velocity
+# Kalman estimate (distance + closing speed). A lone spurious echo or a
+# single missed ping no longer reaches the alerts or the fault log.
+
+import math
+
+import numpy as np
+
+
+class SensorFilter:
+    def __init__(self, size=16, median_n=5, alpha=0.4, process_noise=500.0, measurement_noise=4.0,
+                 max_missing=3, reset_after=1.0):
+        self.size = size
+        self.median_n = median_n
+        self.alpha = alpha
+        self.q = process_noise        # (cm/s^2)^2, how hard the distance may accelerate
+        self.r = measurement_noise    # cm^2, sensor noise
+        self.max_missing = max_missing
+        self.reset_after = reset_after
+        self.values = np.full(size, np.nan)
+        self.times = np.full(size, np.nan)
+        self.count = 0
+        self.missing = 0
+        self.ema = None
+        self._x = None   # [distance cm, velocity cm/s]
+        self._p = None   # 2x2 covariance as [p00, p01, p11]
+        self._t = None
+        self.last = {"raw": None, "median": None, "ema": None, "kalman": None,
+                     "velocity_cm_s": 0.0, "fault": False}
+
+    def _push(self, value, t):
+        i = self.count % self.size
+        self.values[i] = value
+        self.times[i] = t
+        self.count += 1
+
+    def recent(self, n):
+        """Last n buffered readings, oldest first (NaN for misses)."""
+        n = min(n, self.count, self.size)
+        idx = (np.arange(self.count - n, self.count)) % self.size
+        return self.values[idx], self.times[idx]
+
+    def _kalman(self, z, t):
+        if self._x is None or t - self._t > self.reset_after:
+            self._x = [z, 0.0]
+            self._p = [self.r, 0.0, 1000.0]
+            self._t = t
+            return
+        dt = max(1e-3, t - self._t)
+        self._t = t
+        d, v = self._x
+        p00, p01, p11 = self._p
+        # Predict
+        d += v * dt
+        q = self.q
+        p00 += dt * (2 * p01 + dt * p11) + q * dt ** 4 / 4
+        p01 += dt * p11 + q * dt ** 3 / 2
+        p11 += q * dt ** 2
+        # Update with the distance measurement
+        s = p00 + self.r
+        k0, k1 = p00 / s, p01 / s
+        y = z - d
+        d += k0 * y
+        v += k1 * y
+        p00, p01, p11 = (1 - k0) * p00, (1 - k0) * p01, p11 - k1 * p01
+        self._x = [d, v]
+        self._p = [p00, p01, p11]
+
+    def update(self, raw, t):
+        """Feed one reading (cm, or a fault string) taken at time t (seconds)."""
+        valid = isinstance(raw, (int, float)) and not math.isnan(raw)
+        self._push(raw if valid else np.nan, t)
+
+        if not valid:
+            self.missing += 1
+            if self.missing >= self.max_missing:
+                self.ema = None
+                self._x = None
+                self.last = {"raw": raw, "median": None, "ema": None, "kalman": None,
+                             "velocity_cm_s": 0.0, "fault": True}
+            else:
+                # Hold the last estimate through a short dropout
+                self.last = dict(self.last, raw=raw)
+            return self.last
+
+        self.missing = 0
+        window, _ = self.recent(self.median_n)
+        median = float(np.nanmedian(window))
+        self.ema = median if self.ema is None else self.alpha * median + (1 - self.alpha) * self.ema
+        # Kalman runs on the median so single-sample spikes never enter the state
+        self._kalman(median, t)
+        self.last = {
+            "raw": raw,
+            "median": round(median, 2),
+            "ema": round(self.ema, 2),
+            "kalman": round(self._x[0], 2),
+            "velocity_cm_s": round(self._x[1], 2),
+            "fault": False,
+        }
+        return self.last
+
+    def value(self, mode="kalman"):
+        return self.last["raw"] if mode == "raw" else self.last.get(mode)
+
+    def approach_speed(self):
+        """Closing speed in cm/s; positive while the obstacle gets nearer."""
+        return -self.last["velocity_cm_s"]
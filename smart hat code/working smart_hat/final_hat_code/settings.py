@@ -0,0 +1,60 @@
+# Smart Hat settings
+# Hardware layout and default configuration shared by new_app.py and
+# benchmark.py, so the benchmark always measures the hat as it is wired.
+
+# Camera: full-size frames for streaming and clips, lores for the model
+FRAME_SIZE = (2028, 1520)
+LORES_SIZE = (300, 300)
+
+SENSORS = {
+    "Left Front":  {"trigger": 4,  "echo": 17},
+    "Left Middle": {"trigger": 27, "echo": 22},
+    "Left Rear":   {"trigger": 23, "echo": 24},
+    "Right Front": {"trigger": 5,  "echo": 6},
+    "Right Middle": {"trigger": 12, "echo": 13},
+    "Right Rear":   {"trigger": 19, "echo": 26}
+}
+
+CHIP = 4
+ULTRASONIC_BACKEND = "edge"  # "edge" (lgpio alerts) or "polling" (busy-wait on gpio_read)
+# Sensors in one group face different ways and are fired together; groups take turns
+ULTRASONIC_GROUPS = [
+    ("Left Front", "Right Rear"),
+    ("Right Front", "Left Rear"),
+    ("Left Middle", "Right Middle"),
+]
+# Pings per second; front matters most to a walking user
+ULTRASONIC_RATES_HZ = {
+    "Left Front": 20, "Right Front": 20,
+    "Left Middle": 10, "Right Middle": 10,
+    "Left Rear": 5, "Right Rear": 5,
+}
+
+# Alert clips are cut from this stream profile (parse_profile args); in the
+# "metadata" render mode its frames, and so the clips, carry no boxes
+CLIP_STREAM = {"w": 640, "q": 70, "fps": 10}
+
+# Default config; the control panel's /config overrides individual keys
+DEFAULT_CONFIG = {
+    "filter_classes": ["person"],
+    "logging": True,
+    "ultrasonic_thresholds": {
+        "Left Front": 70,
+        "Left Middle": 70,
+        "Left Rear": 70,
+        "Right Front": 70,
+        "Right Middle": 70,
+        "Right Rear": 70
+    },
+    "render_mode": "inplace",  # "inplace": boxes burned into the JPEG, "metadata": browser overlays them
+    "ultrasonic_filter": "kalman",  # value used for alerts/logs: "kalman", "median", "ema" or "raw"
+    "ultrasonic_alert_mode": "ttc",  # "ttc": time-to-collision, "threshold": fixed cm per sensor
+    # Sensors that look along the walking direction; only these assume the wearer's pace as closing
+    # speed. The "Front" pair on the hat face left and right, so by default none do.
+    "forward_sensors": [],
+    "adaptive_inference": True,  # skip inference on frames where nothing changed and nobody moves
+    "performance_profile": "auto"  # "auto" lets the governor decide, or force "performance", "balanced", "saver", "critical"
+}
+
+# Labels watched in indoor mode, in place of filter_classes
+INDOOR_LABELS = ["person", "tv", "chair", "bed"]
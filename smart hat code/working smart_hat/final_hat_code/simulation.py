@@ -0,0 +1,520 @@
+# Smart Hat simulated hardware
+# Stand-ins for the camera, the ultrasonic sensors, the battery/thermal
+# readings and Firebase, so the app and the benchmarks run on any machine.
+# Cameras replay a video file or an image directory, or draw a synthetic
+# scene; rangers replay a recorded ultrasonic_logs trace or a scripted walk
+# towards a wall; SyntheticDetector finds the synthetic scene's figure
+# without a model; MemoryFirestore keeps documents in dicts.
+
+import copy
+import csv
+import itertools
+import json
+import math
+import os
+import random
+import shutil
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from ranging import SPEED_OF_SOUND_CM_S
+
+
+# --- Camera sources ---
+class _FrameSource:
+    """Paces frames like a camera and returns (lores, main) at the configured sizes."""
+
+    def __init__(self, main_size, lores_size, fps=30.0, realtime=True):
+        self.main_size = main_size
+        self.lores_size = lores_size
+        self.fps = fps
+        self.realtime = realtime   # False: as fast as the consumer can take them (benchmarks)
+        self.frames = 0
+        self._next = 0.0
+
+    def start(self):
+        self._next = time.monotonic()
+
+    def _read(self):
+        raise NotImplementedError
+
+    def capture(self):
+        if self.realtime:
+            delay = self._next - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._next = max(self._next, time.monotonic() - 1.0) + 1.0 / self.fps
+        frame = self._read()
+        self.frames += 1
+        if (frame.shape[1], frame.shape[0]) == tuple(self.main_size):
+            # The pipeline draws into main, so never hand out a cached array
+            main = frame.copy()
+        else:
+            main = cv2.resize(frame, tuple(self.main_size), interpolation=cv2.INTER_LINEAR)
+        lores = cv2.resize(frame, tuple(self.lores_size), interpolation=cv2.INTER_AREA)
+        return lores, main
+
+    def stop(self):
+        pass
+
+
+class VideoFileCamera(_FrameSource):
+    def __init__(self, path, main_size, lores_size, fps=None, realtime=True, loop=True):
+        self.path = path
+        self.loop = loop
+        self._cap = cv2.VideoCapture(path)
+        if not self._cap.isOpened():
+            raise IOError(f"Cannot open video {path}")
+        super().__init__(main_size, lores_size, fps or self._cap.get(cv2.CAP_PROP_FPS) or 30.0, realtime)
+
+    def _read(self):
+        ok, frame = self._cap.read()
+        if not ok and self.loop:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self._cap.read()
+        if not ok:
+            raise EOFError(f"End of video {self.path}")
+        return frame
+
+    def stop(self):
+        self._cap.release()
+
+
+class ImageDirCamera(_FrameSource):
+    EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+    def __init__(self, path, main_size, lores_size, fps=10.0, realtime=True):
+        super().__init__(main_size, lores_size, fps, realtime)
+        self.files = sorted(os.path.join(path, f) for f in os.listdir(path) if f.lower().endswith(self.EXTENSIONS))
+        if not self.files:
+            raise IOError(f"No images in {path}")
+        self._cycle = itertools.cycle(self.files)
+
+    def _read(self):
+        frame = cv2.imread(next(self._cycle), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise IOError("Unreadable image in image directory")
+        return frame
+
+
+class SyntheticCamera(_FrameSource):
+    """A static gradient with a figure that walks up to the camera every `period` seconds."""
+
+    def __init__(self, main_size, lores_size, fps=30.0, realtime=True, period=6.0):
+        super().__init__(main_size, lores_size, fps, realtime)
+        self.period = period
+        w, h = main_size
+        gradient = np.linspace(40, 160, w, dtype=np.uint8)
+        self._background = np.dstack([np.tile(gradient, (h, 1))] * 3)
+
+    def _read(self):
+        w, h = self.main_size
+        phase = (self.frames / self.fps) % self.period / self.period
+        frame = self._background.copy()
+        fh = int(h * (0.2 + 0.7 * phase))
+        fw = fh // 3
+        cx = int(w * (0.3 + 0.4 * phase))
+        cv2.rectangle(frame, (cx - fw // 2, h - fh), (cx + fw // 2, h - 1), (30, 60, 200), -1)
+        return frame
+
+
+class SyntheticDetector:
+    """Finds SyntheticCamera's red figure and reports it as a person, SSD-style.
+
+    Stands in for the TFLite model when none is installed, so detection,
+    tracking and alerts still run end to end.
+    """
+
+    labels = {0: "person"}
+
+    def __call__(self, image):
+        mask = cv2.inRange(image, (0, 0, 120), (110, 130, 255))
+        boxes = np.zeros((10, 4), np.float32)
+        classes = np.zeros(10, np.float32)
+        scores = np.zeros(10, np.float32)
+        x, y, w, h = cv2.boundingRect(mask)
+        if w and h:
+            height, width = image.shape[:2]
+            boxes[0] = (y / height, x / width, (y + h) / height, (x + w) / width)
+            scores[0] = 0.9
+        return boxes, classes, scores
+
+    def close(self):
+        pass
+
+
+def open_camera(source, main_size, lores_size, realtime=True):
+    if not source:
+        return SyntheticCamera(main_size, lores_size, realtime=realtime)
+    if os.path.isdir(source):
+        return ImageDirCamera(source, main_size, lores_size, realtime=realtime)
+    return VideoFileCamera(source, main_size, lores_size, realtime=realtime)
+
+
+# --- Distance traces and ranging ---
+class ReplayTrace:
+    """Recorded readings as [(seconds from start, {sensor: cm or fault})], looped."""
+
+    def __init__(self, rows, loop=True):
+        if not rows:
+            raise ValueError("Empty distance trace")
+        self.rows = sorted(rows, key=lambda row: row[0])
+        self.times = [t for t, _ in self.rows]
+        self.duration = self.times[-1] + (self.times[-1] - self.times[-2] if len(rows) > 1 else 1.0)
+        self.loop = loop
+
+    @classmethod
+    def from_file(cls, path, loop=True):
+        """Load ultrasonic_logs documents (JSONL, also telemetry spill files) or a CSV with sensor columns."""
+        raw = []
+        with open(path, newline="") as f:
+            if path.endswith(".csv"):
+                for row in csv.DictReader(f):
+                    stamp = float(row.pop("timestamp"))
+                    raw.append((stamp, {k: _parse_reading(v) for k, v in row.items()}))
+            else:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    doc = json.loads(line)
+                    if "doc" in doc:
+                        if doc.get("collection") != "ultrasonic_logs":
+                            continue
+                        doc = doc["doc"]
+                    readings = doc.get("raw") or doc.get("readings")
+                    if readings and "timestamp" in doc:
+                        raw.append((float(doc["timestamp"]), readings))
+        if not raw:
+            raise ValueError(f"No ultrasonic readings in {path}")
+        start = min(stamp for stamp, _ in raw)
+        # Firestore timestamps are milliseconds
+        scale = 1000.0 if start > 1e11 else 1.0
+        return cls([((stamp - start) / scale, readings) for stamp, readings in raw], loop)
+
+    def distance(self, name, t):
+        if self.loop:
+            t %= self.duration
+        i = max(0, min(len(self.times) - 1, np.searchsorted(self.times, t, side="right") - 1))
+        value = self.rows[i][1].get(name)
+        return "No Echo" if value is None else value
+
+
+def _parse_reading(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value or None
+
+
+class ScriptedTrace:
+    """Each sensor's distance as a function of time; faults are injected at `dropout` rate."""
+
+    def __init__(self, scripts, noise_cm=1.0, dropout=0.02, seed=0):
+        self.scripts = scripts
+        self.noise_cm = noise_cm
+        self.dropout = dropout
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def distance(self, name, t):
+        script = self.scripts.get(name)
+        with self._lock:
+            if script is None or self._random.random() < self.dropout:
+                return "No Echo"
+            value = script(t) + self._random.gauss(0, self.noise_cm)
+        return round(value, 2) if 2 < value < 400 else "Out of Range"
+
+
+def walking_scenario(sensors, period=10.0, speed_cm_s=110.0):
+    """Front sensors close in on a wall at walking pace, the sides see a corridor wall."""
+    def front(t):
+        return max(20.0, 350.0 - speed_cm_s * (t % period))
+
+    def side(t):
+        return 90.0 + 10.0 * math.sin(t / 2.0)
+
+    scripts = {}
+    for name in sensors:
+        if "Front" in name:
+            scripts[name] = front
+        elif "Middle" in name:
+            scripts[name] = side
+        else:
+            scripts[name] = lambda t: 380.0
+    return ScriptedTrace(scripts)
+
+
+def open_trace(source, sensors):
+    return ReplayTrace.from_file(source) if source else walking_scenario(sensors)
+
+
+class SimulatedRanger:
+    """Same interface as EdgeRanger; echo time is simulated from the distance."""
+
+    def __init__(self, sensors, trace, realtime=True):
+        self.trace = trace
+        self.realtime = realtime
+        self._names = {s["echo"]: name for name, s in sensors.items()}
+        self._fired = {}
+        self._t0 = time.monotonic()
+
+    def trigger(self, trig, echo):
+        self._fired[echo] = time.monotonic()
+
+    def result(self, echo, timeout=0.02):
+        fired = self._fired.pop(echo, time.monotonic())
+        value = self.trace.distance(self._names[echo], fired - self._t0)
+        if self.realtime:
+            flight = 2 * value / SPEED_OF_SOUND_CM_S if isinstance(value, (int, float)) else 2 * timeout
+            delay = fired + flight - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        return value
+
+    def measure_distance(self, trig, echo, timeout=0.02):
+        self.trigger(trig, echo)
+        return self.result(echo, timeout)
+
+    def close(self):
+        pass
+
+
+class SimulatedRanging:
+    def __init__(self, sensors, trace, realtime=True):
+        self.sensors = sensors
+        self.trace = trace
+        self.realtime = realtime
+
+    def open(self):
+        return SimulatedRanger(self.sensors, self.trace, self.realtime)
+
+    def close(self):
+        pass
+
+
+# --- Battery and thermal ---
+class SimulatedPower:
+    """Temperature and battery drifting linearly from their starting values."""
+
+    def __init__(self, temperature=50.0, heat_per_min=0.0, battery=90.0, drain_per_min=0.2, plugged=False):
+        self.temperature = temperature
+        self.heat_per_min = heat_per_min
+        self.battery = battery
+        self.drain_per_min = drain_per_min
+        self.plugged = plugged
+        self._t0 = time.monotonic()
+
+    def read(self):
+        minutes = (time.monotonic() - self._t0) / 60.0
+        try:
+            import psutil
+            cpu, memory = psutil.cpu_percent(), psutil.virtual_memory().percent
+        except ImportError:
+            cpu, memory = 0.0, 0.0
+        return {
+            "cpu": cpu,
+            "memory": memory,
+            "temperature": round(self.temperature + self.heat_per_min * minutes, 1),
+            "battery": None if self.battery is None else max(0.0, round(self.battery - self.drain_per_min * minutes, 1)),
+            "plugged": self.plugged,
+        }
+
+
+# --- Firestore and Storage stand-ins ---
+_OPERATORS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a is not None and a < b,
+    "<=": lambda a, b: a is not None and a <= b,
+    ">": lambda a, b: a is not None and a > b,
+    ">=": lambda a, b: a is not None and a >= b,
+    "in": lambda a, b: a in b,
+    "array_contains": lambda a, b: isinstance(a, list) and b in a,
+}
+
+
+class _Snapshot:
+    def __init__(self, reference, doc):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = doc is not None
+        self._doc = doc
+
+    def to_dict(self):
+        return copy.deepcopy(self._doc)
+
+
+class _DocumentReference:
+    def __init__(self, db, collection, doc_id):
+        self._db = db
+        self.collection = collection
+        self.id = doc_id
+
+    def set(self, doc, merge=False):
+        self._db._write(self.collection, self.id, doc, merge)
+
+    def update(self, fields):
+        self._db._write(self.collection, self.id, fields, True)
+
+    def get(self):
+        return _Snapshot(self, self._db._read(self.collection, self.id))
+
+    def delete(self):
+        self._db._delete(self.collection, self.id)
+
+
+class _Query:
+    def __init__(self, db, collection, filters=(), order=None, limit=None):
+        self._db = db
+        self._collection = collection
+        self._filters = filters
+        self._order = order
+        self._limit = limit
+
+    def where(self, field, op, value):
+        return _Query(self._db, self._collection, self._filters + ((field, _OPERATORS[op], value),),
+                      self._order, self._limit)
+
+    def order_by(self, field, direction="ASCENDING"):
+        return _Query(self._db, self._collection, self._filters, (field, str(direction).upper().endswith("DESCENDING")),
+                      self._limit)
+
+    def limit(self, count):
+        return _Query(self._db, self._collection, self._filters, self._order, count)
+
+    def stream(self):
+        docs = [(doc_id, doc) for doc_id, doc in self._db._scan(self._collection)
+                if all(op(doc.get(field), value) for field, op, value in self._filters)]
+        if self._order:
+            field, descending = self._order
+            docs = [d for d in docs if d[1].get(field) is not None]
+            docs.sort(key=lambda d: d[1][field], reverse=descending)
+        if self._limit is not None:
+            docs = docs[:self._limit]
+        for doc_id, doc in docs:
+            yield _Snapshot(_DocumentReference(self._db, self._collection, doc_id), copy.deepcopy(doc))
+
+    def get(self):
+        return list(self.stream())
+
+
+class _Collection(_Query):
+    def document(self, doc_id=None):
+        return _DocumentReference(self._db, self._collection, doc_id or self._db._new_id())
+
+    def add(self, doc):
+        ref = self.document()
+        ref.set(doc)
+        return time.time(), ref
+
+
+class _WriteBatch:
+    def __init__(self, db):
+        self._db = db
+        self._ops = []
+
+    def set(self, ref, doc, merge=False):
+        self._ops.append((ref.set, (doc, merge)))
+
+    def update(self, ref, fields):
+        self._ops.append((ref.update, (fields,)))
+
+    def delete(self, ref):
+        self._ops.append((ref.delete, ()))
+
+    def commit(self):
+        self._db._commit_delay()
+        for fn, args in self._ops:
+            fn(*args)
+        self._db.counters["commits"] += 1
+        self._ops = []
+
+
+class MemoryFirestore:
+    """Just enough of the Firestore client for the app, the dashboard and the tests.
+
+    latency adds a sleep per write or batch commit to mimic the network.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self._data = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.counters = {"writes": 0, "reads": 0, "deletes": 0, "commits": 0}
+
+    def _new_id(self):
+        return f"mem{next(self._ids):012d}"
+
+    def _commit_delay(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _write(self, collection, doc_id, doc, merge):
+        with self._lock:
+            docs = self._data.setdefault(collection, {})
+            if merge and doc_id in docs:
+                docs[doc_id].update(copy.deepcopy(doc))
+            else:
+                docs[doc_id] = copy.deepcopy(doc)
+            self.counters["writes"] += 1
+
+    def _read(self, collection, doc_id):
+        with self._lock:
+            self.counters["reads"] += 1
+            return copy.deepcopy(self._data.get(collection, {}).get(doc_id))
+
+    def _delete(self, collection, doc_id):
+        with self._lock:
+            if self._data.get(collection, {}).pop(doc_id, None) is not None:
+                self.counters["deletes"] += 1
+
+    def _scan(self, collection):
+        with self._lock:
+            docs = list(self._data.get(collection, {}).items())
+            self.counters["reads"] += len(docs)
+        return docs
+
+    def collection(self, name):
+        return _Collection(self, name)
+
+    def collections(self):
+        with self._lock:
+            return [_Collection(self, name) for name in self._data]
+
+    def batch(self):
+        return _WriteBatch(self)
+
+    def count(self, collection):
+        with self._lock:
+            return len(self._data.get(collection, {}))
+
+
+class _LocalBlob:
+    def __init__(self, directory, name):
+        self.name = name
+        self.path = os.path.join(directory, name)
+
+    def upload_from_filename(self, filename):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        shutil.copyfile(filename, self.path)
+
+    def make_public(self):
+        pass
+
+    @property
+    def public_url(self):
+        return "file://" + os.path.abspath(self.path)
+
+
+class LocalBucket:
+    """Storage bucket stand-in that copies uploads into a directory."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def blob(self, name):
+        return _LocalBlob(self.directory, name)
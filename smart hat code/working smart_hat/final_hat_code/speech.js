@@ -163,6 +163,13 @@ class SpeechSystem {
     return voiceMatch || this.voices[0];
   }
 
+  // Drop whatever is playing or queued so an urgent message is heard immediately
+  interrupt() {
+    this.synth.cancel();
+    this.queue = [];
+    this.speaking = false;
+  }
+
   mute(toggle) {
     this.muted = toggle;
     if (toggle) {
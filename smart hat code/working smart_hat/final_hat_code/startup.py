@@ -0,0 +1,100 @@
+# Smart Hat startup
+# Boot order matters on the hat: obstacle alerts must be live long before the
+# analytics dashboard or the cloud connection. The tracker records when each
+# subsystem came up, relative to process start, for /ready and the startup
+# benchmark. Lazy stands in for anything slow to import or connect (Firebase,
+# the Dash app) and builds it the first time somebody actually uses it.
+
+import threading
+import time
+
+PROCESS_START = time.time()
+
+
+class StartupTracker:
+    """Seconds from process start to each subsystem's first mark()."""
+
+    def __init__(self, expected=(), required=()):
+        self.expected = tuple(expected)
+        self.required = tuple(required)   # the hat is "ready" once these are up
+        self._lock = threading.Lock()
+        self._ready = {}
+        self._failed = {}
+
+    def mark(self, name):
+        # Cheap enough to call from a loop; only the first call counts
+        if name in self._ready:
+            return
+        with self._lock:
+            if name in self._ready:
+                return
+            self._ready[name] = time.time() - PROCESS_START
+        print(f"[STARTUP] {name} ready after {self._ready[name]:.2f} s")
+
+    def fail(self, name, error):
+        """Record that a subsystem gave up, so /ready reports why instead of waiting forever."""
+        with self._lock:
+            self._failed[name] = str(error)
+        print(f"[STARTUP] {name} failed after {time.time() - PROCESS_START:.2f} s: {error}")
+
+    def is_ready(self, name=None):
+        names = self.required if name is None else (name,)
+        return all(n in self._ready for n in names)
+
+    def report(self):
+        with self._lock:
+            ready = dict(self._ready)
+            failed = dict(self._failed)
+        subsystems = {name: None for name in self.expected}
+        subsystems.update({name: round(t, 3) for name, t in ready.items()})
+        return {
+            "ready": all(n in ready for n in self.required),
+            "required": list(self.required),
+            "uptime_s": round(time.time() - PROCESS_START, 1),
+            "subsystems": subsystems,
+            "failed": failed,
+        }
+
+
+class Lazy:
+    """Proxy that calls factory() on first attribute access or call.
+
+    A factory that raises is tried again on the next use, so a hat that boots
+    offline still connects once the network is back.
+    """
+
+    def __init__(self, factory, on_load=None):
+        self._factory = factory
+        self._on_load = on_load
+        self._obj = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        obj = self._obj
+        if obj is None:
+            with self._lock:
+                if self._obj is None:
+                    self._obj = self._factory()
+                    if self._on_load is not None:
+                        self._on_load()
+                obj = self._obj
+        return obj
+
+    def __getattr__(self, name):
+        # Only reached for attributes the proxy itself doesn't have
+        return getattr(self._load(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+
+def peek(lazy):
+    """The object behind a Lazy if it has been built, else None; never builds it."""
+    return lazy._obj
+
+
+startup = StartupTracker(
+    expected=("alerts", "ultrasonic", "flask", "telemetry", "camera", "model", "detection",
+              "firestore", "ngrok", "analytics"),
+    required=("alerts", "ultrasonic", "flask"),
+)
@@ -0,0 +1,157 @@
+# Smart Hat video streaming
+# Per-client stream profiles (?w=640&q=60&fps=10) for /video_feed. Each distinct
+# profile is encoded once per frame no matter how many clients watch it (and
+# profiles the governor caps to the same output share that one encode), and
+# profiles nobody is watching are never encoded. Clients block on a condition
+# variable until a genuinely new frame exists and always jump to the latest one.
+
+import collections
+import threading
+import time
+
+import cv2
+
+StreamProfile = collections.namedtuple("StreamProfile", "width height quality fps")
+
+MIN_WIDTH = 160
+DEFAULT_QUALITY = 95   # cv2.imencode default, keeps the plain /video_feed unchanged
+DEFAULT_FPS = 20
+MAX_FPS = 30
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+def parse_profile(args, full_size):
+    """Build a StreamProfile from request args, clamped to sane values."""
+    full_w, full_h = full_size
+    try:
+        width = int(args.get("w", full_w))
+        quality = int(args.get("q", DEFAULT_QUALITY))
+        fps = int(args.get("fps", DEFAULT_FPS))
+    except (TypeError, ValueError):
+        width, quality, fps = full_w, DEFAULT_QUALITY, DEFAULT_FPS
+    width = _clamp(width, MIN_WIDTH, full_w)
+    # Keep the sensor's aspect ratio; JPEG likes even dimensions
+    height = int(round(width * full_h / full_w)) & ~1
+    return StreamProfile(width & ~1, height, _clamp(quality, 10, 100), _clamp(fps, 1, MAX_FPS))
+
+
+class StreamHub:
+    """Tracks viewers per profile and broadcasts the latest JPEG for each watched profile."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._new_frame = threading.Condition(self._lock)
+        self._viewers = collections.Counter()
+        self._frames = {}
+        self._seq = collections.Counter()
+        self._last_encode = {}
+        self._encoded = collections.Counter()
+        self.encodes = 0     # JPEG encodes actually run, across all profiles
+        self.limits = None   # (max_width, max_quality, max_fps) from the performance governor
+
+    def set_limits(self, max_width=None, max_quality=None, max_fps=None):
+        """Cap every profile's width, JPEG quality and frame rate; None removes the cap."""
+        self.limits = (max_width, max_quality, max_fps) if any((max_width, max_quality, max_fps)) else None
+
+    def _effective(self, profile, full_size):
+        if self.limits is None:
+            return profile
+        max_width, max_quality, max_fps = self.limits
+        width, height, quality, fps = profile
+        if max_width and width > max_width:
+            width = max(MIN_WIDTH, max_width) & ~1
+            height = int(round(width * full_size[1] / full_size[0])) & ~1
+        return StreamProfile(width, height, min(quality, max_quality or quality), min(fps, max_fps or fps))
+
+    def add_viewer(self, profile):
+        with self._lock:
+            self._viewers[profile] += 1
+
+    def remove_viewer(self, profile):
+        with self._lock:
+            self._viewers[profile] -= 1
+            if self._viewers[profile] <= 0:
+                del self._viewers[profile]
+                self._frames.pop(profile, None)
+
+    def active_profiles(self):
+        with self._lock:
+            return list(self._viewers)
+
+    def publish(self, frame):
+        """Encode `frame` once per effective profile that is due for a new frame.
+
+        Requested profiles the governor caps to the same size, quality and
+        rate share one encode. Returns {requested profile: jpeg_bytes} for
+        the profiles that got a new frame this time.
+        """
+        now = time.monotonic()
+        resized = {}
+        encoded = {}
+        full_size = (frame.shape[1], frame.shape[0])
+        # Viewers keep their requested profile as the key; the governor may encode it smaller
+        groups = {}
+        for profile in self.active_profiles():
+            groups.setdefault(self._effective(profile, full_size), []).append(profile)
+
+        for encode, profiles in groups.items():
+            if now - self._last_encode.get(encode, 0) < 1.0 / encode.fps:
+                continue
+            size = (encode.width, encode.height)
+            image = resized.get(size)
+            if image is None:
+                if size == full_size:
+                    image = frame
+                else:
+                    image = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+                resized[size] = image
+            ret, jpeg = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, encode.quality])
+            if not ret:
+                continue
+            jpeg = jpeg.tobytes()
+            with self._lock:
+                self._last_encode[encode] = now
+                self.encodes += 1
+                for profile in profiles:
+                    if profile in self._viewers:
+                        encoded[profile] = self._frames[profile] = jpeg
+                        self._encoded[profile] += 1
+                        self._seq[profile] += 1
+                self._new_frame.notify_all()
+
+        with self._lock:
+            # Forget the encode times of profiles nobody maps to any more
+            for stale in set(self._last_encode) - set(groups):
+                del self._last_encode[stale]
+        return encoded
+
+    def latest(self, profile):
+        with self._lock:
+            return self._frames.get(profile)
+
+    def wait_for_frame(self, profile, last_seq, timeout=5.0):
+        """Block until `profile` has a frame newer than `last_seq`.
+
+        Returns (seq, jpeg_bytes), or (last_seq, None) on timeout. A client that
+        fell behind gets the newest frame and silently skips the ones between.
+        """
+        with self._new_frame:
+            self._new_frame.wait_for(lambda: self._seq[profile] > last_seq, timeout)
+            seq = self._seq[profile]
+            if seq <= last_seq:
+                return last_seq, None
+            return seq, self._frames.get(profile)
+
+    def stats(self):
+        with self._lock:
+            return {
+                f"{p.width}x{p.height}@q{p.quality}/{p.fps}fps": {
+                    "viewers": n,
+                    "encoded": self._encoded[p],
+                    "frame_bytes": len(self._frames.get(p) or b""),
+                }
+                for p, n in self._viewers.items()
+            }
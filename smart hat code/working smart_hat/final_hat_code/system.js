@@ -206,3 +206,50 @@ class SystemManager {
     };
     
     fileInput.click();
+  }
+}
+
+// --- On-demand profiler ---
+// Samples every thread on the hat for a fixed time; the result downloads as a
+// collapsed-stack file for flamegraph.pl or speedscope.
+let profilerPoll = null;
+
+async function toggleProfiler() {
+  const button = document.getElementById('profileBtn');
+  const status = document.getElementById('profileStatus');
+  try {
+    if (profilerPoll) {
+      await fetch('/profile/stop', { method: 'POST' });
+      return;
+    }
+    const duration = parseInt(document.getElementById('profileDuration').value, 10) || 30;
+    const response = await fetch('/profile/start', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ duration: duration, memory: document.getElementById('profileMemory').checked })
+    });
+    if (!response.ok && response.status !== 409) {
+      throw new Error((await response.json()).error);
+    }
+    button.textContent = '⏹️ Stop Profiling';
+    speak(`Profiling for ${duration} seconds`);
+    profilerPoll = setInterval(async () => {
+      const data = await (await fetch('/profile')).json();
+      status.textContent = `${data.elapsed_s}s, ${data.samples} samples, ${data.overhead_pct}% overhead`;
+      if (!data.running) {
+        clearInterval(profilerPoll);
+        profilerPoll = null;
+        button.textContent = '🔬 Profile';
+        document.getElementById('profileDownload').style.display = 'inline';
+        if (data.memory) {
+          status.textContent += ' | top growth: ' + data.memory.slice(0, 3)
+            .map(m => `${m.site} +${m.size_diff_kb} KB`).join(', ');
+        }
+        speak("Profile ready to download");
+      }
+    }, 1000);
+  } catch (err) {
+    console.error("Profiler failed:", err);
+    speak("Unable to start the profiler");
+  }
+}
@@ -0,0 +1,243 @@
+# Smart Hat telemetry writer
+# Producers (sensor loops, detection, Flask routes) hand documents to log(),
+# which never blocks. A background thread groups them and appends them to the
+# local store; a second thread uploads the store's unsynced rows to Firestore
+# as batched writes. Without a local store, batches go straight to Firestore
+# and spill to a JSONL file whenever the network is down.
+
+import json
+import os
+import queue
+import threading
+import time
+
+from metrics import metrics
+
+FIRESTORE_BATCH_LIMIT = 500
+
+firestore_commit_seconds = metrics.histogram("firestore_commit_seconds", "Firestore batch commit time")
+firestore_docs = metrics.counter("firestore_docs_total", "Documents sent to Firestore", ("result",))
+
+
+class TelemetryWriter:
+    def __init__(self, db, spill_path, store=None, max_queue=5000, batch_size=FIRESTORE_BATCH_LIMIT,
+                 flush_interval=2.0, retry_interval=30.0, max_spill_bytes=50 * 1024 * 1024,
+                 prune_interval=3600.0):
+        self.db = db
+        self.spill_path = spill_path
+        self.store = store
+        self.prune_interval = prune_interval
+        self.batch_size = min(batch_size, FIRESTORE_BATCH_LIMIT)
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.max_spill_bytes = max_spill_bytes
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._retry_at = 0.0
+        self._spill_lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self._thread = None
+        self._sync_thread = None
+        self._running = threading.Event()
+        self.counters = {"enqueued": 0, "dropped": 0, "written": 0, "batches": 0,
+                         "failures": 0, "spilled": 0, "spill_dropped": 0, "replayed": 0,
+                         "stored": 0, "synced": 0}
+
+    def _count(self, name, n=1):
+        with self._counter_lock:
+            self.counters[name] += n
+
+    # --- Producer side ---
+    def log(self, collection, doc):
+        """Queue one document for `collection`. Returns False if the queue is full."""
+        try:
+            self._queue.put_nowait((collection, doc))
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("enqueued")
+        return True
+
+    # --- Writer thread ---
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._running.set()
+        self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+        self._thread.start()
+        if self.store is not None:
+            self._sync_thread = threading.Thread(target=self._sync_run, name="telemetry-sync", daemon=True)
+            self._sync_thread.start()
+
+    def stop(self, timeout=5.0):
+        self._running.clear()
+        for t in (self._thread, self._sync_thread):
+            if t:
+                t.join(timeout)
+        self.flush()
+        if self.store is not None and self._online():
+            self._sync_store()
+
+    def flush(self):
+        """Write everything queued right now (used on shutdown)."""
+        while True:
+            batch = self._drain(block=False)
+            if not batch:
+                return
+            self._write(batch)
+
+    def _run(self):
+        while self._running.is_set():
+            batch = self._drain(block=True)
+            if batch:
+                self._write(batch)
+            elif self._online() and os.path.exists(self.spill_path):
+                self._replay_spill()
+
+    def _drain(self, block):
+        # Collect up to batch_size items; once the first arrives, wait at most
+        # flush_interval for the rest so sparse events still go out promptly.
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            try:
+                if not block:
+                    item = self._queue.get_nowait()
+                else:
+                    timeout = self.flush_interval if deadline is None else deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+        return batch
+
+    def _online(self):
+        return time.monotonic() >= self._retry_at
+
+    def _commit(self, items):
+        batch = self.db.batch()
+        for collection, doc in items:
+            batch.set(self.db.collection(collection).document(), doc)
+        try:
+            with firestore_commit_seconds.time():
+                batch.commit()
+        except Exception:
+            firestore_docs.inc(len(items), ("failed",))
+            raise
+        firestore_docs.inc(len(items), ("ok",))
+
+    def _write(self, items):
+        if self.store is not None:
+            try:
+                self.store.append_many(items)
+            except Exception as e:
+                # Disk trouble: fall through and send this batch straight to Firestore
+                print("[TELEMETRY] Local store write failed:", e)
+            else:
+                self._count("stored", len(items))
+                return
+        if not self._online():
+            self._spill(items)
+            return
+        try:
+            self._commit(items)
+        except Exception as e:
+            print("[TELEMETRY] Firestore write failed, spilling to disk:", e)
+            self._count("failures")
+            self._retry_at = time.monotonic() + self.retry_interval
+            self._spill(items)
+            return
+        self._count("written", len(items))
+        self._count("batches")
+        if os.path.exists(self.spill_path):
+            self._replay_spill()
+
+    # --- Local store -> Firestore sync ---
+    def _sync_run(self):
+        last_prune = time.monotonic()
+        while self._running.is_set():
+            time.sleep(self.flush_interval)
+            if self._online():
+                self._sync_store()
+            if time.monotonic() - last_prune > self.prune_interval:
+                last_prune = time.monotonic()
+                try:
+                    self.store.prune()
+                except Exception as e:
+                    print("[TELEMETRY] Local store prune failed:", e)
+
+    def _sync_store(self):
+        """Upload rows the local store has not synced yet, one collection at a time."""
+        for collection in self.store.collections():
+            while True:
+                rows = self.store.pending(collection, self.batch_size)
+                if not rows:
+                    break
+                try:
+                    self._commit([(collection, doc) for _, doc in rows])
+                except Exception as e:
+                    print("[TELEMETRY] Firestore sync failed, will retry:", e)
+                    self._count("failures")
+                    self._retry_at = time.monotonic() + self.retry_interval
+                    return
+                self.store.mark_synced(collection, rows[-1][0])
+                self._count("synced", len(rows))
+                self._count("batches")
+
+    # --- Offline spill ---
+    def _spill(self, items):
+        with self._spill_lock:
+            try:
+                size = os.path.getsize(self.spill_path) if os.path.exists(self.spill_path) else 0
+                if size >= self.max_spill_bytes:
+                    self._count("spill_dropped", len(items))
+                    return
+                with open(self.spill_path, "a") as f:
+                    for collection, doc in items:
+                        f.write(json.dumps({"collection": collection, "doc": doc}) + "\n")
+                self._count("spilled", len(items))
+            except Exception as e:
+                print("[TELEMETRY] Spill to disk failed:", e)
+                self._count("spill_dropped", len(items))
+
+    def _replay_spill(self):
+        replay_path = self.spill_path + ".replay"
+        with self._spill_lock:
+            if not os.path.exists(replay_path):
+                try:
+                    os.replace(self.spill_path, replay_path)
+                except FileNotFoundError:
+                    return
+        with open(replay_path) as f:
+            items = []
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                items.append((entry["collection"], entry["doc"]))
+        print(f"[TELEMETRY] Replaying {len(items)} spilled documents")
+        for i in range(0, len(items), self.batch_size):
+            chunk = items[i:i + self.batch_size]
+            try:
+                self._commit(chunk)
+            except Exception as e:
+                print("[TELEMETRY] Replay failed, keeping spill for later:", e)
+                self._count("failures")
+                self._retry_at = time.monotonic() + self.retry_interval
+                self._spill(items[i:])
+                break
+            self._count("replayed", len(chunk))
+        os.remove(replay_path)
+
+    def stats(self):
+        with self._counter_lock:
+            stats = dict(self.counters)
+        stats["queued"] = self._queue.qsize()
+        stats["online"] = self._online()
+        if self.store is not None:
+            stats["unsynced"] = self.store.backlog()
+        return stats
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from adaptive import AdaptiveInference
+
+STILL = np.full((300, 300, 3), 100, dtype=np.uint8)
+CHANGED = np.full((300, 300, 3), 200, dtype=np.uint8)
+
+
+def run_frames(rate, frames, fps=30, start=0.0, **context):
+    """Feed frames at `fps` and return the times the detector ran."""
+    ran = []
+    for i, lores in enumerate(frames):
+        now = start + i / fps
+        if rate.decide(lores, now, **context):
+            ran.append(now)
+    return ran
+
+
+@pytest.fixture
+def rate():
+    return AdaptiveInference()
+
+
+def test_static_scene_backs_off_to_max_interval(rate):
+    ran = run_frames(rate, [STILL] * 150)
+    assert rate.reason == "static" and rate.interval == rate.max_interval
+    assert ran == pytest.approx([0.0, 2.0, 4.0], abs=1 / 30)
+
+
+@pytest.mark.parametrize("lores, context, reason", [
+    (CHANGED, {}, "scene change"),
+    (STILL, {"motion_active": True}, "motion"),
+    (STILL, {"nearest_cm": 80}, "proximity"),
+])
+def test_activity_snaps_back_to_min_interval(rate, lores, context, reason):
+    run_frames(rate, [STILL] * 30)
+    assert rate.interval == rate.max_interval
+    assert rate.decide(lores, 1.1, **context)
+    assert rate.reason == reason and rate.interval == rate.min_interval
+
+
+def test_far_obstacle_does_not_count_as_activity(rate):
+    run_frames(rate, [STILL] * 30, nearest_cm=300)
+    assert rate.reason == "static"
+
+
+def test_max_fps_cap_holds_even_with_motion(rate):
+    rate.max_fps = 5
+    ran = run_frames(rate, [STILL] * 60, motion_active=True)
+    assert rate.reason == "motion, capped"
+    assert len(ran) == pytest.approx(10, abs=1)
+    assert all(b - a >= 0.2 - 1e-9 for a, b in zip(ran, ran[1:]))
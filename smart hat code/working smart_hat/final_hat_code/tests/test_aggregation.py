@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregation import bucket_stats, downsample, lttb_indices, time_slice
+
+
+def series(n, start="2025-01-01"):
+    t = pd.date_range(start, periods=n, freq="s")
+    return pd.DataFrame({"timestamp": t, "cpu": np.sin(np.arange(n) / 10.0) * 50 + 50,
+                         "memory": np.arange(n, dtype=float)})
+
+
+def test_small_frames_are_returned_unchanged():
+    df = series(50)
+    assert downsample(df, ["cpu"], 100) is df
+
+
+def test_minmax_buckets_keep_the_envelope():
+    df = series(10000)
+    out = downsample(df, ["cpu", "memory"], 100)
+    assert len(out) <= 100
+    assert out["cpu_max"].max() == pytest.approx(df["cpu"].max())
+    assert out["cpu_min"].min() == pytest.approx(df["cpu"].min())
+    assert out["memory_max"].iloc[-1] == df["memory"].iloc[-1]
+
+
+def test_lttb_keeps_endpoints_and_size():
+    df = series(5000)
+    out = downsample(df, ["cpu"], 200, method="lttb")
+    assert len(out) == 200
+    assert out["timestamp"].iloc[0] == df["timestamp"].iloc[0]
+    assert out["timestamp"].iloc[-1] == df["timestamp"].iloc[-1]
+
+
+def test_lttb_indices_are_increasing():
+    x = np.arange(1000)
+    idx = lttb_indices(x, np.random.default_rng(0).normal(size=1000), 50)
+    assert len(idx) == 50 and np.all(np.diff(idx) > 0)
+
+
+def test_time_slice_bounds_are_inclusive():
+    df = series(10)
+    out = time_slice(df, df["timestamp"].iloc[2], df["timestamp"].iloc[5])
+    assert list(out["memory"]) == [2.0, 3.0, 4.0, 5.0]
+
+
+def test_bucket_stats_ignores_missing_columns():
+    assert bucket_stats(series(10), ["battery_percentage"], 5).empty
+
+
+@pytest.mark.parametrize("width", [0, -5])
+def test_non_positive_width_is_rejected(width):
+    with pytest.raises(ValueError):
+        downsample(series(10), ["cpu"], width)
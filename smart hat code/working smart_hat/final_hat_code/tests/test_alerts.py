@@ -0,0 +1,115 @@
+import threading
+import time
+
+import pytest
+
+import alerts
+from alerts import AlertArbiter, merge_messages
+
+
+def wait_for(predicate, timeout=3.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+@pytest.fixture
+def spoken(monkeypatch):
+    # Half a second per utterance keeps "still speaking" windows short but measurable
+    monkeypatch.setattr(alerts, "_speech_seconds", lambda message: 0.5)
+    return []
+
+
+@pytest.fixture
+def arbiter(spoken):
+    lock = threading.Lock()
+
+    def emit(message, severity, interrupt):
+        with lock:
+            spoken.append((message, severity, interrupt))
+
+    arbiter = AlertArbiter(emit, coalesce_window=0.05)
+    arbiter.start()
+    yield arbiter
+    arbiter.stop()
+
+
+def test_merge_messages_says_shared_words_once():
+    assert merge_messages(["Stop. Obstacle on left at 40 cm", "Stop. Obstacle on right at 55 cm"]) == \
+        "Stop. Obstacle on left at 40 cm and right at 55 cm"
+    assert merge_messages(["Battery low.", "Person ahead"]) == "Battery low. Person ahead"
+    assert merge_messages(["Only one"]) == "Only one"
+
+
+def test_simultaneous_criticals_are_spoken_together(arbiter, spoken):
+    now = time.time()
+    arbiter.submit("Stop. Obstacle on left at 40 cm", "critical", key="obstacle:left", event_time=now)
+    arbiter.submit("Stop. Obstacle on right at 55 cm", "critical", key="obstacle:right", event_time=now)
+    assert wait_for(lambda: arbiter.stats()["spoken"] == 2)
+    assert spoken == [("Stop. Obstacle on left at 40 cm and right at 55 cm", "critical", False)]
+    stats = arbiter.stats()
+    assert stats["expired"] == 0
+    assert stats["merged"] == 1
+
+
+def test_critical_queued_behind_critical_is_not_aged_out(arbiter, spoken):
+    arbiter.submit("Stop. Obstacle on left", "critical", key="obstacle:left", max_age=0.2)
+    assert wait_for(lambda: len(spoken) == 1)
+    # Arrives while the first is still being spoken and must wait longer than its max_age
+    arbiter.submit("Stop. Obstacle on right", "critical", key="obstacle:right", max_age=0.2)
+    assert wait_for(lambda: len(spoken) == 2)
+    assert spoken[1][0] == "Stop. Obstacle on right"
+    assert arbiter.stats()["expired"] == 0
+
+
+def test_critical_interrupts_lower_severity(arbiter, spoken):
+    arbiter.submit("Battery low. Please charge Smart Hat.", "info", key="battery:low")
+    assert wait_for(lambda: len(spoken) == 1)
+    arbiter.submit("Stop. Obstacle on left", "critical", key="obstacle:left")
+    assert wait_for(lambda: len(spoken) == 2)
+    assert spoken[1] == ("Stop. Obstacle on left", "critical", True)
+    assert arbiter.stats()["preempted"] == 1
+
+
+def test_higher_severity_goes_first(arbiter, spoken):
+    arbiter.submit("Person ahead", "info", key="detection:person")
+    arbiter.submit("Car approaching", "warning", key="detection:car")
+    assert wait_for(lambda: len(spoken) == 2)
+    assert [severity for _, severity, _ in spoken] == ["warning", "info"]
+
+
+def test_repeat_is_dropped_and_reported(arbiter, spoken):
+    dropped = []
+    assert arbiter.submit("Obstacle on left", "warning", key="obstacle:left")
+    assert wait_for(lambda: len(spoken) == 1)
+    assert not arbiter.submit("Obstacle on left", "warning", key="obstacle:left",
+                              on_drop=lambda: dropped.append("repeat"))
+    assert dropped == ["repeat"]
+    assert arbiter.stats()["deduped"] == 1
+
+
+def test_stale_alert_expires_and_calls_on_drop(arbiter, spoken):
+    dropped = []
+    arbiter.submit("Person ahead, stay alert", "info", key="detection:person")
+    assert wait_for(lambda: len(spoken) == 1)
+    # Waits behind the info still being spoken, which is longer than its max_age
+    arbiter.submit("Chair detected", "info", key="detection:chair", max_age=0.1,
+                   on_drop=lambda: dropped.append("chair"))
+    assert wait_for(lambda: dropped == ["chair"])
+    assert arbiter.stats()["expired"] == 1
+    assert len(spoken) == 1
+
+
+def test_coalesced_escalation_keeps_the_key_once(arbiter, spoken):
+    arbiter.stop()   # queue while nothing is being drained
+    arbiter.submit("Obstacle on left, approaching", "warning", key="obstacle:left")
+    arbiter.submit("Stop. Obstacle on left", "critical", key="obstacle:left")
+    stats = arbiter.stats()
+    assert stats["queued"] == 1
+    assert stats["coalesced"] == 1
+    arbiter.start()
+    assert wait_for(lambda: len(spoken) == 1)
+    assert spoken[0][:2] == ("Stop. Obstacle on left", "critical")
@@ -0,0 +1,66 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from clips import ClipRecorder, FrameRing
+
+
+def jpeg():
+    return cv2.imencode(".jpg", np.zeros((48, 64, 3), dtype=np.uint8))[1].tobytes()
+
+
+def test_ring_drops_oldest_frames_beyond_its_age_and_bytes():
+    ring = FrameRing(max_bytes=10, max_age=5.0)
+    for t in range(8):
+        ring.push(b"ab", float(t))
+    assert [t for t, _ in ring.window(0, 100)] == [3.0, 4.0, 5.0, 6.0, 7.0]
+    assert ring.evicted == 3
+    ring.push(b"abcdef", 8.0)
+    assert ring.stats()["bytes"] <= 10
+    assert ring.window(6.5, 8.0)[-1] == (8.0, b"abcdef")
+    ring.clear()
+    assert ring.newest_time() is None
+
+
+def wait_for_clips(recorder, clips, count):
+    done = threading.Event()
+    original = recorder.on_clip
+
+    def on_clip(filename, info):
+        original(filename, info)
+        if len(clips) >= count:
+            done.set()
+    recorder.on_clip = on_clip
+    return done
+
+
+def test_separate_triggers_each_get_their_own_clip(tmp_path):
+    ring = FrameRing(max_age=60.0)
+    clips = []
+    recorder = ClipRecorder(ring, str(tmp_path), lambda filename, info: clips.append(info),
+                            pre_roll=1.0, post_roll=1.0, max_wait=60.0)
+    done = wait_for_clips(recorder, clips, 2)
+    base = int(time.time()) - 30
+    for i in range(50):
+        ring.push(jpeg(), base + i * 0.1)
+    # The second trigger arrives while the first clip still waits for its post-roll
+    assert recorder.trigger(base + 10.0, "first")
+    assert recorder.trigger(base + 10.5, "merged")
+    assert recorder.trigger(base + 20.0, "second")
+    assert recorder.stats()["pending"] == 2
+    for i in range(50, 300):
+        ring.push(jpeg(), base + i * 0.1)
+    assert done.wait(5)
+    assert [(c["start"] - base, c["end"] - base, c["reason"]) for c in clips] == [
+        (9.0, 11.5, "first"), (19.0, 21.0, "second")]
+    assert all(c["frames"] > 0 for c in clips)
+    assert recorder.counters["merged"] == 1 and recorder.counters["written"] == 2
+
+
+def test_disabled_recorder_ignores_triggers(tmp_path):
+    recorder = ClipRecorder(FrameRing(), str(tmp_path), lambda filename, info: None)
+    recorder.enabled = False
+    assert not recorder.trigger(10.0, "ignored")
+    assert recorder.stats()["pending"] == 0
@@ -0,0 +1,73 @@
+import math
+
+from collision import CollisionPredictor
+from sensor_filter import SensorFilter
+
+
+def test_forward_sensor_uses_walking_pace_when_moving():
+    predictor = CollisionPredictor()
+    still = predictor.assess("Left Front", 200, 0.0, motion_active=False, now=10.0, forward=True)
+    walking = predictor.assess("Left Front", 200, 0.0, motion_active=True, now=10.0, forward=True)
+    assert still["level"] is None and still["ttc"] == math.inf
+    assert walking["level"] == "warn"
+    assert walking["ttc"] < predictor.warn_ttc
+
+
+def test_walking_past_a_wall_at_constant_distance_is_not_an_obstacle():
+    # The "Front" sensors look sideways: a wall 50 cm to the side while walking
+    predictor = CollisionPredictor()
+    sensor_filter = SensorFilter()
+    alerts = []
+    for i in range(60):
+        stamp = 10.0 + i * 0.05
+        sensor_filter.update(50 + (i % 3) - 1, stamp)
+        assessment = predictor.assess("Left Front", sensor_filter.value(), sensor_filter.approach_speed(),
+                                      motion_active=True, now=stamp)
+        if predictor.should_alert("Left Front", assessment["level"], stamp):
+            alerts.append(assessment)
+    assert alerts == []
+    assert assessment["ttc"] > predictor.warn_ttc
+
+
+def test_close_obstacle_is_critical_even_when_still():
+    predictor = CollisionPredictor()
+    assert predictor.assess("Right Rear", 20, 0.0, now=10.0)["level"] == "critical"
+
+
+def test_cooldown_suppresses_repeats():
+    predictor = CollisionPredictor(cooldown=4.0)
+    assert predictor.should_alert("Left Front", "warn", 10.0)
+    assert not predictor.should_alert("Left Front", "warn", 12.0)
+    assert predictor.should_alert("Left Front", "warn", 14.5)
+
+
+def test_escalation_to_critical_bypasses_cooldown():
+    predictor = CollisionPredictor(cooldown=4.0)
+    assert predictor.should_alert("Left Front", "warn", 10.0)
+    assert predictor.should_alert("Left Front", "critical", 10.5)
+    assert not predictor.should_alert("Left Front", "critical", 11.0)
+
+
+def test_release_of_unspoken_alert_lifts_cooldown():
+    predictor = CollisionPredictor(cooldown=4.0)
+    assert predictor.should_alert("Left Front", "warn", 10.0)
+    predictor.release("Left Front", 10.0)
+    assert predictor.should_alert("Left Front", "warn", 10.5)
+
+
+def test_release_restores_the_previous_alert():
+    predictor = CollisionPredictor(cooldown=4.0)
+    assert predictor.should_alert("Left Front", "warn", 10.0)
+    assert predictor.should_alert("Left Front", "critical", 11.0)
+    predictor.release("Left Front", 11.0)
+    # The spoken warning at 10.0 still holds its cooldown, and critical escalates again
+    assert not predictor.should_alert("Left Front", "warn", 12.0)
+    assert predictor.should_alert("Left Front", "critical", 12.0)
+
+
+def test_release_ignores_a_superseded_alert():
+    predictor = CollisionPredictor(cooldown=4.0)
+    assert predictor.should_alert("Left Front", "warn", 10.0)
+    assert predictor.should_alert("Left Front", "critical", 11.0)
+    predictor.release("Left Front", 10.0)
+    assert not predictor.should_alert("Left Front", "critical", 12.0)
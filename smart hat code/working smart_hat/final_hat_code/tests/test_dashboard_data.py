@@ -0,0 +1,115 @@
+import threading
+import time
+
+import pytest
+
+import simulation
+from dashboard_data import IncrementalCollection, StoreCollection, TTLCache, flatten_ultrasonic
+from local_store import LocalStore
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def test_store_collection_fetches_only_new_rows(tmp_path):
+    store = LocalStore(str(tmp_path / "telemetry.db"))
+    source = StoreCollection(store, "battery_logs", retention_hours=1)
+    t = now_ms()
+    store.append("battery_logs", {"timestamp": t, "battery_percentage": 80})
+    assert len(source.refresh()) == 1
+
+    # Same millisecond as the last row seen, and one uploaded late with an older timestamp
+    store.append("battery_logs", {"timestamp": t, "battery_percentage": 79})
+    store.append("battery_logs", {"timestamp": t - 5000, "battery_percentage": 81})
+    df = source.refresh()
+    assert list(df["battery_percentage"]) == [81, 80, 79]
+    assert source.fetched == 3
+    assert len(source.refresh()) == 3
+
+
+def test_store_collection_skips_history_outside_retention(tmp_path):
+    store = LocalStore(str(tmp_path / "telemetry.db"))
+    store.append("ultrasonic_logs", {"timestamp": now_ms() - 3 * 3600 * 1000, "readings": {"Left Front": 90}})
+    store.append("ultrasonic_logs", {"timestamp": now_ms(), "readings": {"Left Front": 40}})
+    source = StoreCollection(store, "ultrasonic_logs", retention_hours=1, flatten=flatten_ultrasonic)
+    df = source.refresh()
+    assert list(df["Left Front"]) == [40]
+
+
+def test_reset_after_clear_starts_over(tmp_path):
+    store = LocalStore(str(tmp_path / "telemetry.db"))
+    source = StoreCollection(store, "motion_logs", retention_hours=1)
+    store.append("motion_logs", {"timestamp": now_ms(), "motion_status": "active"})
+    assert len(source.refresh()) == 1
+    store.clear("motion_logs")
+    source.reset()
+    assert source.refresh().empty
+    store.append("motion_logs", {"timestamp": now_ms(), "motion_status": "inactive"})
+    assert list(source.refresh()["motion_status"]) == ["inactive"]
+
+
+def test_firestore_cursor_keeps_same_millisecond_documents():
+    db = simulation.MemoryFirestore()
+    t = now_ms()
+    db.collection("battery_logs").add({"timestamp": t, "battery_percentage": 80})
+    source = IncrementalCollection(db, "battery_logs", retention_hours=1)
+    assert len(source.refresh()) == 1
+    db.collection("battery_logs").add({"timestamp": t, "battery_percentage": 79})
+    db.collection("battery_logs").add({"timestamp": t + 1, "battery_percentage": 78})
+    assert list(source.refresh()["battery_percentage"]) == [80, 79, 78]
+    # Nothing new: the documents at the cursor are not appended again
+    assert len(source.refresh()) == 3 and source.fetched == 3
+
+
+def test_cache_coalesces_concurrent_callers():
+    cache = TTLCache()
+    started, release, calls = threading.Event(), threading.Event(), []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(2)
+        return "figure"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.get_or_compute("k", slow, 10)))
+    leader.start()
+    started.wait(2)
+    follower = threading.Thread(target=lambda: results.append(cache.get_or_compute("k", slow, 10)))
+    follower.start()
+    release.set()
+    leader.join(2)
+    follower.join(2)
+    assert results == ["figure", "figure"] and len(calls) == 1
+
+
+def test_cache_waiters_give_up_after_the_timeout():
+    cache = TTLCache(wait_timeout=0.05)
+    started, release = threading.Event(), threading.Event()
+
+    def hung():
+        started.set()
+        release.wait(2)
+        return 1
+
+    leader = threading.Thread(target=lambda: cache.get_or_compute("k", hung, 10))
+    leader.start()
+    started.wait(2)
+    with pytest.raises(TimeoutError):
+        cache.get_or_compute("k", hung, 10)
+    release.set()
+    leader.join(2)
+    assert cache.stats()["timeouts"] == 1
+
+
+def test_cache_evicts_expired_then_oldest_entries():
+    cache = TTLCache(max_entries=3)
+    cache.get_or_compute("stale", lambda: 0, -1)
+    cache.get_or_compute("a", lambda: 1, 10)
+    cache.get_or_compute("b", lambda: 2, 20)
+    cache.get_or_compute("c", lambda: 3, 30)
+    assert cache.stats()["entries"] == 3 and cache.stats()["evicted"] == 1
+    cache.get_or_compute("d", lambda: 4, 40)
+    assert cache.stats()["entries"] == 3
+    assert cache.get_or_compute("a", lambda: "recomputed", 10) == "recomputed"
@@ -0,0 +1,70 @@
+import pytest
+
+from governor import PerformanceGovernor
+
+
+@pytest.fixture
+def governor():
+    return PerformanceGovernor(min_dwell=0)
+
+
+def test_trigger_that_clears_releases_the_profile(governor):
+    # The reported case: heat puts the hat in saver, battery alone only warrants balanced
+    assert governor.update(75, 28, now=1)
+    assert governor.profile_name == "saver" and governor.reason == "temperature 75.0C"
+    assert governor.update(50, 28, now=2)
+    assert governor.profile_name == "balanced" and governor.reason == "battery 28%"
+    fresh = PerformanceGovernor(min_dwell=0)
+    fresh.update(50, 28, now=1)
+    assert fresh.profile_name == governor.profile_name
+
+
+@pytest.mark.parametrize("enter, hold, leave, level", [
+    (66, 61, 59, "balanced"),
+    (73, 68, 66, "saver"),
+    (81, 76, 74, "critical"),
+])
+def test_temperature_enters_holds_and_leaves_each_level(governor, enter, hold, leave, level):
+    governor.update(enter, 100, now=1)
+    assert governor.profile_name == level
+    governor.update(hold, 100, now=2)
+    assert governor.profile_name == level
+    governor.update(leave, 100, now=3)
+    assert governor.profile_name != level
+    assert governor.signal_levels["battery"] == 0
+
+
+@pytest.mark.parametrize("enter, hold, leave, level", [
+    (49, 54, 56, "balanced"),
+    (24, 29, 31, "saver"),
+    (9, 14, 16, "critical"),
+])
+def test_battery_enters_holds_and_leaves_each_level(governor, enter, hold, leave, level):
+    governor.update(40, enter, now=1)
+    assert governor.profile_name == level and governor.reason.startswith("battery")
+    governor.update(40, hold, now=2)
+    assert governor.profile_name == level
+    governor.update(40, leave, now=3)
+    assert governor.profile_name != level
+    assert governor.signal_levels["temperature"] == 0
+
+
+def test_plugged_in_ignores_battery(governor):
+    governor.update(40, 5, plugged=True, now=1)
+    assert governor.profile_name == "performance" and governor.reason == "normal"
+
+
+def test_stepping_up_waits_for_the_dwell_time():
+    governor = PerformanceGovernor(min_dwell=30)
+    assert governor.update(81, 100, now=100)
+    assert not governor.update(40, 100, now=110)
+    assert governor.profile_name == "critical"
+    assert governor.update(40, 100, now=131)
+    assert governor.profile_name == "performance"
+
+
+def test_manual_override(governor):
+    assert governor.update(40, 100, override="saver", now=1)
+    assert governor.reason == "manual"
+    assert not governor.update(40, 100, override="saver", now=2)
+    assert governor.reason == "manual"
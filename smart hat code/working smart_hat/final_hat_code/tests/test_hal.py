@@ -0,0 +1,56 @@
+import collections
+import sys
+import types
+
+import pytest
+
+import hal
+
+shwtemp = collections.namedtuple("shwtemp", "label current high critical")
+
+
+@pytest.fixture
+def fake_psutil(monkeypatch):
+    module = types.SimpleNamespace(
+        sensors_battery=lambda: types.SimpleNamespace(percent=64.0, power_plugged=False),
+        cpu_percent=lambda: 12.5,
+        virtual_memory=lambda: types.SimpleNamespace(percent=40.0),
+        sensors_temperatures=lambda: {},
+    )
+    monkeypatch.setitem(sys.modules, "psutil", module)
+    return module
+
+
+def test_reads_the_pi_cpu_thermal_sensor(fake_psutil):
+    fake_psutil.sensors_temperatures = lambda: {
+        "rp1_adc": [shwtemp("", 38.0, None, None)],
+        "cpu_thermal": [shwtemp("", 61.3, 110.0, 110.0)],
+    }
+    reading = hal.PsutilPower().read()
+    assert reading["temperature"] == 61.3
+    assert reading["battery"] == 64.0 and reading["plugged"] is False
+    assert reading["cpu"] == 12.5 and reading["memory"] == 40.0
+
+
+def test_falls_back_to_the_first_sensor(fake_psutil):
+    fake_psutil.sensors_temperatures = lambda: {
+        "nvme": [],
+        "acpitz": [shwtemp("", 47.0, None, None)],
+    }
+    assert hal.PsutilPower().read()["temperature"] == 47.0
+
+
+def test_no_sensors_reads_none(fake_psutil):
+    assert hal.PsutilPower().read()["temperature"] is None
+
+
+def test_sim_detector_without_a_model_finds_the_synthetic_figure(tmp_path):
+    import simulation
+
+    detector = hal.open_detector("sim", str(tmp_path / "missing.tflite"), str(tmp_path / "missing.txt"))
+    assert isinstance(detector, simulation.SyntheticDetector)
+    camera = simulation.SyntheticCamera((640, 480), (300, 300), realtime=False)
+    lores, _ = camera.capture()
+    boxes, classes, scores = detector(lores)
+    assert detector.labels[int(classes[0])] == "person"
+    assert scores[0] > 0.5 and boxes[0][2] > boxes[0][0]
@@ -0,0 +1,70 @@
+import json
+import threading
+
+from metrics import MetricsRegistry
+
+
+def test_counter_shards_are_summed_across_threads():
+    registry = MetricsRegistry()
+    counter = registry.counter("frames_total", "Frames", ("result",))
+    inferred = counter.labels("inferred")
+
+    def work():
+        for _ in range(1000):
+            inferred.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    counter.labels(result="skipped").inc(3)
+    assert counter.collect() == {("inferred",): 4000, ("skipped",): 3}
+
+
+def test_histogram_quantiles_are_bucket_upper_bounds():
+    registry = MetricsRegistry()
+    hist = registry.histogram("stage_seconds", "Stage time", buckets=(0.01, 0.1, 1.0))
+    for value in [0.005] * 90 + [0.05] * 9 + [5.0]:
+        hist.observe(value)
+    row = hist.collect()[()]
+    assert row[:-1] == [90, 9, 0, 1]
+    assert hist.quantile(row, 0.5) == 0.01
+    assert hist.quantile(row, 0.95) == 0.1
+    assert hist.quantile(row, 1.0) == float("inf")
+
+
+def test_prometheus_text_has_cumulative_buckets():
+    registry = MetricsRegistry(prefix="t_")
+    hist = registry.histogram("emit_seconds", "Emit", ("event",), buckets=(0.1, 1.0))
+    hist.observe(0.05, ("detections",))
+    hist.observe(0.5, ("detections",))
+    registry.gauge("healthy", "Healthy", fn=lambda: 1)
+    text = registry.render_prometheus()
+    assert '# TYPE t_emit_seconds histogram' in text
+    assert 't_emit_seconds_bucket{event="detections",le="0.1"} 1' in text
+    assert 't_emit_seconds_bucket{event="detections",le="+Inf"} 2' in text
+    assert 't_emit_seconds_count{event="detections"} 2' in text
+    assert 't_healthy 1' in text
+
+
+def test_summary_is_json_safe_and_in_milliseconds():
+    registry = MetricsRegistry()
+    hist = registry.histogram("commit_seconds", "Commit", buckets=(0.01,))
+    hist.observe(0.004)
+    hist.observe(3.0)
+    registry.gauge("broken", "Raises", fn=lambda: 1 / 0)
+    registry.gauge("per_sensor", "Labelled", ("sensor",), fn=lambda: {("Left Front",): 42.5})
+    summary = registry.summary()
+    json.dumps(summary, allow_nan=False)
+    assert summary["commit_seconds"]["count"] == 2
+    assert summary["commit_seconds"]["avg_ms"] == 1502.0
+    assert summary["commit_seconds"]["p50_ms"] == 10.0
+    assert summary["commit_seconds"]["p95_ms"] is None
+    assert summary["per_sensor[Left Front]"] == 42.5
+    assert "broken" not in summary
+
+
+def test_registering_twice_returns_the_same_metric():
+    registry = MetricsRegistry()
+    assert registry.counter("x", "X") is registry.counter("x", "X")
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+import model_registry
+from model_registry import ModelRegistry
+
+
+class FakeInterpreter:
+    def __init__(self, model_path, num_threads=None):
+        self.num_threads = num_threads
+        self._input = None
+
+    def allocate_tensors(self):
+        pass
+
+    def get_input_details(self):
+        return [{"index": 0, "shape": (1, 300, 300, 3)}]
+
+    def get_output_details(self):
+        return [{"index": 1}, {"index": 2}, {"index": 3}]
+
+    def set_tensor(self, index, tensor):
+        self._input = tensor
+
+    def invoke(self):
+        pass
+
+    def get_tensor(self, index):
+        return np.full((1, 10), index, dtype=np.float32)
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(model_registry, "_interpreter_class", lambda: FakeInterpreter)
+    return ModelRegistry(pool_size=1, num_threads=4)
+
+
+def test_detector_swaps_its_interpreter_when_the_thread_count_changes(registry, tmp_path):
+    labels = tmp_path / "labels.txt"
+    labels.write_text("0 person\n1 bicycle\n")
+    detector = registry.detector("model.tflite", str(labels))
+    assert detector.labels == {0: "person", 1: "bicycle"}
+
+    boxes, classes, scores = detector(np.zeros((480, 640, 3), np.uint8))
+    assert detector.interpreter._input.shape == (1, 300, 300, 3)
+    assert (boxes[0], classes[0], scores[0]) == (1, 2, 3)
+
+    registry.set_num_threads(2)
+    detector(np.zeros((480, 640, 3), np.uint8))
+    assert detector.interpreter.num_threads == 2
+    assert registry.stats()["model.tflite"]["created"] == 1
+
+    detector.close()
+    assert registry.stats()["model.tflite"]["idle"] == 1
@@ -0,0 +1,61 @@
+import simulation
+from collision import CollisionPredictor
+from perception import DetectionStages, ultrasonic_reading
+from sensor_filter import SensorFilter
+from settings import DEFAULT_CONFIG
+from streaming import StreamHub, StreamProfile
+from tracking import ObjectTracker
+
+
+class RecordingAlerts:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, message, severity, key=None, event_time=None, on_drop=None, **kwargs):
+        self.submitted.append((message, severity, key, on_drop))
+        return True
+
+
+def test_stages_detect_track_and_encode_the_synthetic_figure():
+    size = (640, 480)
+    camera = simulation.SyntheticCamera(size, (300, 300), realtime=False)
+    hub = StreamHub()
+    profile = StreamProfile(320, 240, 70, 1000)
+    hub.add_viewer(profile)
+    alerts, logs, encoded = RecordingAlerts(), [], []
+    stages = DetectionStages(camera, simulation.SyntheticDetector(), ObjectTracker(size), alerts, hub, size,
+                             settings=lambda: DEFAULT_CONFIG,
+                             log=lambda collection, doc: logs.append((collection, doc)),
+                             on_encoded=lambda jpegs, packet: encoded.append(profile in jpegs))
+    for _ in range(5):
+        stages.encode(stages.infer(stages.capture()))
+
+    assert stages.frame_id == 5
+    assert len(stages.detections) == 1
+    assert alerts.submitted[0][:3] == ("Person ahead, stay alert", "info", "detection:enter:person")
+    assert [collection for collection, doc in logs] == ["detection_logs"] * stages.events
+    # submit() only queues the message, so that is what the log claims
+    assert logs[0][1]["queued_message"] == "Person ahead, stay alert"
+    assert encoded == [True] * 5
+
+
+def test_ttc_is_assessed_even_when_speech_is_off():
+    alerts = RecordingAlerts()
+    predictor = CollisionPredictor()
+    assessment = ultrasonic_reading("Left Front", 20.0, 10.0, SensorFilter(), predictor, alerts, DEFAULT_CONFIG,
+                                    speak=False)
+    assert assessment["level"] == "critical"
+    assert alerts.submitted == []
+    # Nothing was spoken, so nothing is on cooldown either
+    assert predictor.should_alert("Left Front", "critical", 10.1)
+
+
+def test_dropped_obstacle_alert_releases_its_cooldown():
+    alerts = RecordingAlerts()
+    predictor = CollisionPredictor()
+    ultrasonic_reading("Left Front", 20.0, 10.0, SensorFilter(), predictor, alerts, DEFAULT_CONFIG)
+    message, severity, key, on_drop = alerts.submitted[0]
+    assert (message, severity, key) == ("Stop. Obstacle on left at 20 cm", "critical", "obstacle:left")
+    assert not predictor.should_alert("Left Front", "critical", 10.5)
+    on_drop()
+    assert predictor.should_alert("Left Front", "critical", 10.5)
@@ -0,0 +1,81 @@
+import itertools
+import time
+
+import pytest
+
+from pipeline import FramePipeline, LatestQueue
+
+
+def wait_for(predicate, timeout=3.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+@pytest.fixture
+def pipelines():
+    started = []
+    yield started
+    for pipeline in started:
+        pipeline.stop()
+
+
+def test_latest_queue_drops_the_oldest_item():
+    queue = LatestQueue(maxsize=2)
+    for item in range(5):
+        queue.put(item)
+    assert queue.dropped == 3
+    assert [queue.get(0), queue.get(0), queue.get(0)] == [3, 4, None]
+
+
+def test_snapshot_reports_each_queues_drops_on_the_stage_behind_it():
+    pipeline = FramePipeline(lambda: None, lambda p: p, lambda p: None)
+    for item in range(4):
+        pipeline.infer_queue.put(item)
+    pipeline.encode_queue.put(0)
+    pipeline.encode_queue.put(1)
+    snapshot = pipeline.snapshot()
+    assert snapshot["inference"]["dropped"] == 3
+    assert snapshot["encode"]["dropped"] == 1
+    assert snapshot["capture"]["dropped"] == 0
+
+
+def test_a_failing_stage_counts_the_error_and_keeps_going(pipelines):
+    counter = itertools.count()
+    encoded = []
+
+    def infer(packet):
+        if packet % 2:
+            raise ValueError("bad frame")
+        return packet
+
+    def capture():
+        time.sleep(0.005)
+        return next(counter)
+
+    pipeline = FramePipeline(capture, infer, encoded.append)
+    pipelines.append(pipeline)
+    pipeline.start()
+    assert wait_for(lambda: len(encoded) >= 3 and pipeline.stats["inference"].errors >= 3)
+    assert pipeline.is_running()
+    assert all(packet % 2 == 0 for packet in encoded)
+
+
+def test_capture_idles_while_disabled(pipelines):
+    enabled, captured = [False], []
+
+    def capture():
+        captured.append(1)
+        time.sleep(0.005)
+        return len(captured)
+
+    pipeline = FramePipeline(capture, lambda p: p, lambda p: None, is_enabled=lambda: enabled[0])
+    pipelines.append(pipeline)
+    pipeline.start()
+    time.sleep(0.2)
+    assert captured == [] and pipeline.is_running()
+    enabled[0] = True
+    assert wait_for(lambda: pipeline.stats["encode"].processed > 0)
@@ -0,0 +1,45 @@
+import numpy as np
+
+from postprocess import EMPTY_DETECTIONS, LabelFilter, postprocess
+
+LABELS = {0: "person", 2: "Car", 17: "dog"}
+FRAME = (640, 480)
+
+
+def run(classes, scores, boxes=None, allowed=None, threshold=0.5):
+    boxes = boxes if boxes is not None else [[0.1, 0.1, 0.5, 0.5]] * len(classes)
+    return postprocess(boxes, classes, scores, LabelFilter(LABELS).lookup(allowed), FRAME, threshold)
+
+
+def test_score_threshold_is_exclusive():
+    out = run([0, 0, 0], [0.49, 0.5, 0.51])
+    assert out["score"].tolist() == [np.float32(0.51)]
+    assert len(run([0], [0.3], threshold=0.25)) == 1
+
+
+def test_allow_list_is_case_insensitive():
+    out = run([0, 2, 17], [0.9] * 3, allowed=["PERSON", "car"])
+    assert out["class_id"].tolist() == [0, 2]
+
+
+def test_unknown_names_and_ids_are_filtered_out():
+    assert run([0], [0.9], allowed=["unicorn"]) is EMPTY_DETECTIONS
+    # ID 1 sits between known labels; every label allowed still excludes it
+    assert run([1, 0], [0.9, 0.9])["class_id"].tolist() == [0]
+
+
+def test_negative_and_out_of_range_class_ids_are_dropped():
+    out = run([-1, 18, 90, 17], [0.9] * 4)
+    assert out["class_id"].tolist() == [17]
+
+
+def test_boxes_are_scaled_and_clipped_to_the_frame():
+    out = run([0, 0], [0.9, 0.9], boxes=[[0.25, 0.5, 0.75, 1.0], [-0.2, -0.1, 1.3, 1.5]])
+    assert out[["x1", "y1", "x2", "y2"]].tolist() == [(320, 120, 640, 360), (0, 0, 640, 480)]
+    assert out["area"].tolist() == [320 * 240, 640 * 480]
+
+
+def test_zero_area_boxes_are_dropped():
+    boxes = [[0.5, 0.1, 0.5, 0.4], [0.1, 0.3, 0.4, 0.3], [1.2, 0.1, 1.5, 0.4], [0.1, 0.1, 0.2, 0.2]]
+    out = run([0] * 4, [0.9] * 4, boxes=boxes)
+    assert len(out) == 1 and out["area"][0] > 0
@@ -0,0 +1,35 @@
+import threading
+import time
+
+from profiler import SamplingProfiler
+
+
+def spin_here(done):
+    while not done.is_set():
+        sum(range(1000))
+
+
+def test_short_profile_collects_stacks_of_a_named_thread():
+    done = threading.Event()
+    worker = threading.Thread(target=spin_here, args=(done,), name="busy-worker", daemon=True)
+    worker.start()
+    profiler = SamplingProfiler()
+    try:
+        assert profiler.start(duration=1, interval=0.005)
+        # Only one profile at a time
+        assert not profiler.start(duration=1)
+        time.sleep(0.2)
+        profiler.stop()
+    finally:
+        done.set()
+        worker.join()
+
+    lines = [line for line in profiler.collapsed().splitlines() if line.startswith("busy-worker;")]
+    assert lines and any("spin_here (test_profiler.py:" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    status = profiler.status()
+    assert not status["running"] and status["samples"] > 5
+    assert status["threads"]["busy-worker"] > 0
+    # A finished profile makes room for the next one
+    assert profiler.start(duration=1)
+    profiler.stop()
@@ -0,0 +1,144 @@
+import pytest
+
+import ranging
+from ranging import EdgeRanger
+
+SENSORS = {"Left Front": {"trigger": 4, "echo": 17}}
+
+
+class FakeLgpio:
+    """Just enough of lgpio for EdgeRanger: the trigger's falling edge plays back scripted echo edges."""
+
+    BOTH_EDGES = 3
+
+    def __init__(self):
+        self.callbacks = {}
+        self.echo_edges = {}   # echo gpio -> [(level, tick ns)]
+        self.writes = []
+
+    def gpio_free(self, h, gpio):
+        pass
+
+    def gpio_claim_output(self, h, gpio):
+        pass
+
+    def gpio_claim_alert(self, h, gpio, edges):
+        pass
+
+    def callback(self, h, gpio, edges, func):
+        self.callbacks[gpio] = func
+        fake = self
+
+        class Callback:
+            def cancel(self):
+                fake.callbacks.pop(gpio, None)
+        return Callback()
+
+    def gpio_write(self, h, gpio, level):
+        self.writes.append((gpio, level))
+        if level == 0:
+            for echo, edges in self.echo_edges.items():
+                for edge_level, tick in edges:
+                    self.callbacks[echo](0, echo, edge_level, tick)
+
+
+@pytest.fixture
+def fake_lgpio(monkeypatch):
+    fake = FakeLgpio()
+    monkeypatch.setattr(ranging, "lgpio", fake)
+    return fake
+
+
+def test_edge_timestamps_convert_to_centimetres(fake_lgpio):
+    ranger = EdgeRanger(0, SENSORS)
+    # 5830 us round trip at 343 m/s is 100 cm
+    fake_lgpio.echo_edges[17] = [(1, 1_000_000), (0, 1_000_000 + 5_830_904)]
+    assert ranger.measure_distance(4, 17) == pytest.approx(100.0, abs=0.01)
+    assert fake_lgpio.writes == [(4, 1), (4, 0)]
+
+
+def test_missing_rising_edge_is_no_echo_and_missing_falling_edge_is_echo_timeout(fake_lgpio):
+    ranger = EdgeRanger(0, SENSORS)
+    fake_lgpio.echo_edges[17] = []
+    assert ranger.measure_distance(4, 17, timeout=0.005) == "No Echo"
+    fake_lgpio.echo_edges[17] = [(1, 1_000_000)]
+    assert ranger.measure_distance(4, 17, timeout=0.005) == "Echo Timeout"
+
+
+def test_stray_falling_edge_and_out_of_range_pulses(fake_lgpio):
+    ranger = EdgeRanger(0, SENSORS)
+    # A falling edge before any rise is ignored; the next full pulse counts
+    fake_lgpio.echo_edges[17] = [(0, 500_000), (1, 1_000_000), (0, 1_000_000 + 2_915_452)]
+    assert ranger.measure_distance(4, 17) == pytest.approx(50.0, abs=0.01)
+    fake_lgpio.echo_edges[17] = [(1, 0), (0, 30_000_000)]
+    assert ranger.measure_distance(4, 17) == "Out of Range"
+    ranger.close()
+    assert fake_lgpio.callbacks == {}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+
+
+class RecordingRanger:
+    def __init__(self):
+        self.calls = []
+
+    def trigger(self, trig, echo):
+        self.calls.append(("trigger", trig))
+
+    def result(self, echo, timeout=0.02):
+        self.calls.append(("result", echo))
+        return float(echo)
+
+
+FIVE = {name: {"trigger": i, "echo": 10 + i} for i, name in enumerate(["A", "B", "C", "D", "E"])}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(ranging, "time", fake)
+    return fake
+
+
+def test_groups_fire_together_in_order_with_a_settle_gap(clock):
+    ranger = RecordingRanger()
+    scheduler = ranging.RangingScheduler(ranger, FIVE, [("A", "C"), ("B", "D")], {}, timeout=0.02)
+    results = scheduler.run_due()
+    # E is in no group, so it runs on its own after the others
+    assert [name for name, _, _ in results] == ["A", "C", "B", "D", "E"]
+    assert ranger.calls[:4] == [("trigger", 0), ("trigger", 2), ("result", 10), ("result", 12)]
+    assert clock.sleeps == [0.005] * 3
+    assert scheduler.latest["C"] == (12.0, clock.now)
+
+
+def test_each_sensor_pings_at_its_own_rate(clock):
+    scheduler = ranging.RangingScheduler(RecordingRanger(), FIVE, [("A", "B"), ("C",)],
+                                         {"A": 20, "B": 5, "C": 0}, default_rate=10)
+    counts = dict.fromkeys(FIVE, 0)
+    for _ in range(200):   # two seconds in 10 ms steps
+        for name, _, _ in scheduler.run_due():
+            counts[name] += 1
+        clock.now += 0.01
+    expected = {"A": 40, "B": 10, "C": 0, "D": 20, "E": 20}
+    assert all(abs(counts[name] - n) <= 1 for name, n in expected.items()), counts
+
+
+def test_settle_gap_is_configurable(clock):
+    scheduler = ranging.RangingScheduler(RecordingRanger(), FIVE, [], {}, timeout=0.04)
+    assert scheduler.settle == 0.01
+    scheduler = ranging.RangingScheduler(RecordingRanger(), FIVE, [], {}, settle=0.002)
+    scheduler.run_due()
+    assert clock.sleeps == [0.002] * 5
@@ -0,0 +1,60 @@
+import math
+
+import pytest
+
+from sensor_filter import SensorFilter
+
+
+def feed(sensor_filter, readings, start=0.0, dt=0.05):
+    for i, raw in enumerate(readings):
+        sensor_filter.update(raw, start + i * dt)
+    return sensor_filter.last
+
+
+def test_single_spike_is_rejected_by_the_median():
+    f = SensorFilter()
+    last = feed(f, [100, 101, 99, 400, 100])
+    assert last["raw"] == 100
+    assert last["median"] == 100
+    assert abs(last["kalman"] - 100) < 5
+
+
+def test_short_dropout_holds_the_last_estimate():
+    f = SensorFilter(max_missing=3)
+    feed(f, [80, 80, 80])
+    last = f.update("No Echo", 0.2)
+    assert not last["fault"]
+    assert last["raw"] == "No Echo"
+    assert f.value("kalman") == pytest.approx(80, abs=1)
+
+
+def test_repeated_misses_report_a_fault():
+    f = SensorFilter(max_missing=3)
+    feed(f, [80, 80])
+    last = feed(f, ["Timeout", "Timeout", "Timeout"], start=1.0)
+    assert last["fault"]
+    assert f.value("kalman") is None
+    assert f.approach_speed() == 0.0
+
+
+def test_kalman_tracks_closing_speed():
+    f = SensorFilter()
+    # Walking towards a wall at 100 cm/s, sampled at 20 Hz
+    feed(f, [300 - 100 * 0.05 * i for i in range(40)])
+    assert f.approach_speed() == pytest.approx(100, rel=0.2)
+
+
+def test_long_gap_restarts_the_kalman_state():
+    f = SensorFilter(reset_after=1.0)
+    feed(f, [300 - 5 * i for i in range(20)])
+    f.update(150, 10.0)
+    assert f.approach_speed() == 0.0
+    assert f.value("kalman") is not None
+
+
+def test_raw_mode_and_nan_handling():
+    f = SensorFilter()
+    f.update(float("nan"), 0.0)
+    assert f.value("raw") is not None and math.isnan(f.value("raw"))
+    f.update(42, 0.05)
+    assert f.value("raw") == 42 and f.value("ema") == 42
@@ -0,0 +1,11 @@
+from startup import StartupTracker
+
+
+def test_failure_is_reported_alongside_ready_subsystems():
+    tracker = StartupTracker(expected=("alerts", "model"), required=("alerts",))
+    tracker.mark("alerts")
+    tracker.fail("model", FileNotFoundError("coco_labels.txt"))
+    report = tracker.report()
+    assert report["ready"]
+    assert report["subsystems"]["model"] is None
+    assert report["failed"] == {"model": "coco_labels.txt"}
@@ -0,0 +1,106 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import streaming
+from streaming import StreamHub, StreamProfile
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(streaming.time, "monotonic", lambda: now[0])
+    return now
+
+
+def frame():
+    return np.zeros((480, 640, 3), dtype=np.uint8)
+
+
+def test_no_viewers_means_no_encode(clock):
+    hub = StreamHub()
+    assert hub.publish(frame()) == {}
+    assert hub.encodes == 0
+
+
+def test_fps_gate_skips_frames_until_the_profile_is_due(clock):
+    hub = StreamHub()
+    profile = StreamProfile(320, 240, 60, 10)
+    hub.add_viewer(profile)
+    assert profile in hub.publish(frame())
+    clock[0] += 0.05
+    assert hub.publish(frame()) == {}
+    clock[0] += 0.06
+    assert profile in hub.publish(frame())
+    assert hub.encodes == 2
+
+
+def test_requests_capped_to_the_same_profile_share_one_encode(clock):
+    hub = StreamHub()
+    full, half = StreamProfile(640, 480, 90, 20), StreamProfile(480, 360, 80, 15)
+    hub.add_viewer(full)
+    hub.add_viewer(half)
+    hub.set_limits(max_width=320, max_quality=50, max_fps=10)
+    encoded = hub.publish(frame())
+    assert hub.encodes == 1
+    assert set(encoded) == {full, half}
+    assert encoded[full] is encoded[half]
+    assert hub.latest(full) is hub.latest(half)
+
+
+def test_wait_for_frame_blocks_until_a_newer_frame_arrives(clock):
+    hub = StreamHub()
+    profile = StreamProfile(320, 240, 60, 10)
+    hub.add_viewer(profile)
+    hub.publish(frame())
+    seq, first = hub.wait_for_frame(profile, 0, timeout=0.1)
+    assert seq == 1 and first
+
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(hub.wait_for_frame(profile, seq, timeout=2)))
+    waiter.start()
+    time.sleep(0.05)
+    assert not result
+    clock[0] += 1
+    hub.publish(frame())
+    waiter.join(2)
+    assert result and result[0][0] == 2 and result[0][1] is hub.latest(profile)
+
+
+def test_a_client_that_fell_behind_jumps_to_the_latest_frame(clock):
+    hub = StreamHub()
+    profile = StreamProfile(320, 240, 60, 10)
+    hub.add_viewer(profile)
+    for _ in range(3):
+        hub.publish(frame())
+        clock[0] += 1
+    seq, jpeg = hub.wait_for_frame(profile, 0, timeout=0.1)
+    assert seq == 3 and jpeg is hub.latest(profile)
+
+
+def test_wait_for_frame_times_out_with_none(clock):
+    hub = StreamHub()
+    profile = StreamProfile(320, 240, 60, 10)
+    hub.add_viewer(profile)
+    assert hub.wait_for_frame(profile, 0, timeout=0.05) == (0, None)
+
+
+def test_a_viewer_removed_and_added_again_gets_new_frames(clock):
+    hub = StreamHub()
+    profile = StreamProfile(320, 240, 60, 10)
+    hub.add_viewer(profile)
+    hub.publish(frame())
+    hub.remove_viewer(profile)
+    assert hub.latest(profile) is None
+    clock[0] += 1
+    assert hub.publish(frame()) == {}
+
+    # The sequence carries on, so a client still holding seq 1 is not handed a stale frame
+    hub.add_viewer(profile)
+    assert hub.wait_for_frame(profile, 1, timeout=0.05) == (1, None)
+    clock[0] += 1
+    hub.publish(frame())
+    seq, jpeg = hub.wait_for_frame(profile, 1, timeout=0.1)
+    assert seq == 2 and jpeg
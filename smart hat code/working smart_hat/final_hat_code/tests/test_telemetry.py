@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+import simulation
+from local_store import LocalStore
+from telemetry import TelemetryWriter
+
+
+class FlakyFirestore(simulation.MemoryFirestore):
+    """MemoryFirestore whose batch commits fail while `offline` is set."""
+
+    def __init__(self):
+        super().__init__()
+        self.offline = False
+
+    def _commit_delay(self):
+        if self.offline:
+            raise ConnectionError("network unreachable")
+
+
+def stored(db, collection):
+    return sorted(doc.to_dict()["n"] for doc in db.collection(collection).stream())
+
+
+@pytest.fixture
+def db():
+    return FlakyFirestore()
+
+
+def test_offline_documents_stay_local_and_sync_once_back_online(db, tmp_path):
+    store = LocalStore(str(tmp_path / "telemetry.db"))
+    writer = TelemetryWriter(db, str(tmp_path / "spill.jsonl"), store=store, retry_interval=0)
+    db.offline = True
+    for n in range(3):
+        writer.log("battery_logs", {"timestamp": 1000 + n, "n": n})
+    writer.flush()
+    writer._sync_store()
+    assert writer.counters["stored"] == 3 and writer.counters["failures"] == 1
+    assert store.backlog() == {"battery_logs": 3}
+    assert stored(db, "battery_logs") == []
+    # Readers of the local store never wait on the network
+    assert [doc["n"] for doc in store.query("battery_logs")] == [0, 1, 2]
+
+    db.offline = False
+    writer._sync_store()
+    assert stored(db, "battery_logs") == [0, 1, 2]
+    assert store.backlog() == {"battery_logs": 0}
+    # A second sync uploads nothing twice
+    writer._sync_store()
+    assert writer.counters["synced"] == 3
+
+
+def test_without_a_store_failed_batches_spill_and_replay(db, tmp_path):
+    spill = str(tmp_path / "spill.jsonl")
+    writer = TelemetryWriter(db, spill, retry_interval=0)
+    db.offline = True
+    writer.log("motion_logs", {"timestamp": 1, "n": 1})
+    writer.flush()
+    assert writer.counters["spilled"] == 1 and os.path.exists(spill)
+
+    db.offline = False
+    writer.log("motion_logs", {"timestamp": 2, "n": 2})
+    writer.flush()
+    assert stored(db, "motion_logs") == [1, 2]
+    assert writer.counters["replayed"] == 1
+    assert not os.path.exists(spill)
+
+
+def test_log_never_blocks_when_the_queue_is_full(db, tmp_path):
+    writer = TelemetryWriter(db, str(tmp_path / "spill.jsonl"), max_queue=2)
+    assert writer.log("x_logs", {"n": 1}) and writer.log("x_logs", {"n": 2})
+    assert writer.log("x_logs", {"n": 3}) is False
+    assert writer.stats()["dropped"] == 1
+
+
+def test_prune_keeps_unsynced_rows(tmp_path):
+    store = LocalStore(str(tmp_path / "telemetry.db"), retention_days=1)
+    store.append("battery_logs", {"timestamp": 0, "n": 0})
+    store.append("battery_logs", {"timestamp": 1, "n": 1})
+    assert store.prune() == 0
+    first_id = store.pending("battery_logs")[0][0]
+    store.mark_synced("battery_logs", first_id)
+    assert store.prune() == 1
+    assert [doc["n"] for _, doc in store.pending("battery_logs")] == [1]
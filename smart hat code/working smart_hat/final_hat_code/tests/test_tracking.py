@@ -0,0 +1,66 @@
+import numpy as np
+
+from postprocess import DETECTION_DTYPE, EMPTY_DETECTIONS
+from tracking import ObjectTracker, iou_matrix
+
+FRAME = (1000, 1000)
+
+
+def detections(*boxes, class_id=0):
+    out = np.zeros(len(boxes), dtype=DETECTION_DTYPE)
+    for i, (x1, y1, x2, y2) in enumerate(boxes):
+        out[i] = (class_id, 0.9, x1, y1, x2, y2, (x2 - x1) * (y2 - y1))
+    return out
+
+
+def kinds(events):
+    return [e["event"] for e in events]
+
+
+def test_iou_matrix():
+    a = np.array([[0, 0, 10, 10]], dtype=float)
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]], dtype=float)
+    np.testing.assert_allclose(iou_matrix(a, b), [[1.0, 50 / 150, 0.0]])
+
+
+def test_enter_is_announced_once_after_min_hits():
+    tracker = ObjectTracker(FRAME, min_hits=2)
+    ids1, ev1 = tracker.update(detections((100, 100, 200, 300)), 0.0)
+    ids2, ev2 = tracker.update(detections((105, 100, 205, 300)), 0.1)
+    _, ev3 = tracker.update(detections((110, 100, 210, 300)), 0.2)
+    assert ev1 == [] and kinds(ev2) == ["enter"] and ev3 == []
+    assert ids1[0] == ids2[0]
+
+
+def test_classes_are_never_merged():
+    tracker = ObjectTracker(FRAME)
+    ids1, _ = tracker.update(detections((100, 100, 200, 300), class_id=0), 0.0)
+    ids2, _ = tracker.update(detections((100, 100, 200, 300), class_id=2), 0.1)
+    assert ids1[0] != ids2[0]
+
+
+def test_fast_small_box_is_matched_by_centroid():
+    tracker = ObjectTracker(FRAME, max_center_dist=0.15)
+    ids1, _ = tracker.update(detections((100, 100, 120, 120)), 0.0)
+    ids2, _ = tracker.update(detections((150, 100, 170, 120)), 0.1)
+    assert ids1[0] == ids2[0]
+
+
+def test_growing_box_is_approaching():
+    tracker = ObjectTracker(FRAME, approach_ratio=1.4, approach_min_area=0.05)
+    events = []
+    for i in range(10):
+        half = 120 + 15 * i
+        _, ev = tracker.update(detections((500 - half, 500 - half, 500 + half, 500 + half)), i * 0.1)
+        events += kinds(ev)
+    assert events == ["enter", "approach"]
+
+
+def test_exit_needs_both_missed_updates_and_time():
+    tracker = ObjectTracker(FRAME, max_missing_s=1.0, max_misses=2)
+    tracker.update(detections((100, 100, 200, 300)), 0.0)
+    tracker.update(detections((100, 100, 200, 300)), 0.1)
+    # Only one missed update, however long ago: skipped frames don't end a track
+    assert tracker.update(EMPTY_DETECTIONS, 5.0)[1] == []
+    assert kinds(tracker.update(EMPTY_DETECTIONS, 5.1)[1]) == ["exit"]
+    assert tracker.stats()["tracks"] == 0
@@ -0,0 +1,173 @@
+# Smart Hat object tracking
+# SORT-style association of per-frame detections into tracks: greedy IoU
+# matching within a class, with a centroid-distance fallback for small boxes
+# that move more than their own width between frames. Tracks emit enter,
+# approach and exit events so speech and logging happen once per object
+# instead of once per box per frame.
+
+from collections import deque
+
+import numpy as np
+
+
+def iou_matrix(a, b):
+    """IoU between every row of a (N, 4) and b (M, 4), boxes as x1, y1, x2, y2."""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def _greedy(cost, limit, lower_is_better):
+    # Best pairs first; each row and column is used at most once
+    pairs = []
+    if cost.size == 0:
+        return pairs
+    order = np.argsort(cost, axis=None)
+    if not lower_is_better:
+        order = order[::-1]
+    rows, cols = np.unravel_index(order, cost.shape)
+    used_r, used_c = set(), set()
+    for r, c in zip(rows.tolist(), cols.tolist()):
+        value = cost[r, c]
+        if (value > limit) if lower_is_better else (value < limit):
+            break
+        if r in used_r or c in used_c:
+            continue
+        used_r.add(r)
+        used_c.add(c)
+        pairs.append((r, c))
+    return pairs
+
+
+class Track:
+    __slots__ = ("id", "class_id", "box", "score", "first_seen", "last_seen", "hits", "misses", "confirmed",
+                 "areas", "approaching")
+
+    def __init__(self, track_id, class_id, box, score, now):
+        self.id = track_id
+        self.class_id = class_id
+        self.box = box
+        self.score = score
+        self.first_seen = now
+        self.last_seen = now
+        self.hits = 1
+        self.misses = 0
+        self.confirmed = False
+        self.areas = deque(maxlen=32)   # (time, area)
+        self.approaching = False
+
+    def area(self):
+        return float((self.box[2] - self.box[0]) * (self.box[3] - self.box[1]))
+
+
+class ObjectTracker:
+    def __init__(self, frame_size, iou_threshold=0.3, max_center_dist=0.15, min_hits=2, max_missing_s=1.0,
+                 max_misses=2, approach_ratio=1.4, approach_window_s=1.5, approach_min_area=0.05):
+        self.frame_area = float(frame_size[0] * frame_size[1])
+        self.diagonal = float(np.hypot(*frame_size))
+        self.iou_threshold = iou_threshold
+        self.max_center_dist = max_center_dist      # fraction of the frame diagonal
+        self.min_hits = min_hits                    # frames before a track is announced
+        self.max_missing_s = max_missing_s          # seconds unseen before a track exits ...
+        self.max_misses = max_misses                # ... and updates it was missing from, so skipped frames don't count
+        self.approach_ratio = approach_ratio        # area growth that counts as approaching
+        self.approach_window_s = approach_window_s
+        self.approach_min_area = approach_min_area  # fraction of the frame, ignore far-away growth
+        self.tracks = []
+        self._next_id = 1
+        self.counters = {"enter": 0, "approach": 0, "exit": 0}
+
+    def _event(self, kind, track, now):
+        self.counters[kind] += 1
+        x1, y1, x2, y2 = (int(v) for v in track.box)
+        return {"event": kind, "track_id": track.id, "class_id": track.class_id,
+                "score": round(float(track.score), 3), "box": (x1, y1, x2, y2),
+                "area": int(track.area()), "duration_s": round(now - track.first_seen, 2)}
+
+    def _match(self, boxes, classes):
+        if not self.tracks or not len(boxes):
+            return []
+        track_boxes = np.array([t.box for t in self.tracks], dtype=np.float64)
+        same_class = np.array([t.class_id for t in self.tracks])[:, None] == classes[None, :]
+
+        iou = np.where(same_class, iou_matrix(track_boxes, boxes), 0.0)
+        pairs = _greedy(iou, self.iou_threshold, lower_is_better=False)
+
+        # Whatever IoU left unmatched gets a second chance on centroid distance
+        free_t = [i for i in range(len(self.tracks)) if i not in {p[0] for p in pairs}]
+        free_d = [j for j in range(len(boxes)) if j not in {p[1] for p in pairs}]
+        if free_t and free_d:
+            tc = (track_boxes[free_t, :2] + track_boxes[free_t, 2:]) / 2
+            dc = (boxes[free_d, :2] + boxes[free_d, 2:]) / 2
+            dist = np.linalg.norm(tc[:, None, :] - dc[None, :, :], axis=2) / self.diagonal
+            dist = np.where(same_class[np.ix_(free_t, free_d)], dist, np.inf)
+            pairs += [(free_t[r], free_d[c]) for r, c in _greedy(dist, self.max_center_dist, lower_is_better=True)]
+        return pairs
+
+    def update(self, detections, now):
+        """Associate one frame of detections; returns (track id per detection, events)."""
+        boxes = np.stack([detections["x1"], detections["y1"], detections["x2"], detections["y2"]],
+                         axis=1).astype(np.float64) if len(detections) else np.empty((0, 4))
+        classes = detections["class_id"]
+        track_ids = np.zeros(len(detections), dtype=np.int32)
+        events = []
+
+        matched = set()
+        for ti, di in self._match(boxes, classes):
+            track = self.tracks[ti]
+            track.box = boxes[di]
+            track.score = detections["score"][di]
+            track.last_seen = now
+            track.hits += 1
+            track.misses = 0
+            track_ids[di] = track.id
+            matched.add(di)
+
+        for di in range(len(detections)):
+            if di not in matched:
+                track = Track(self._next_id, int(classes[di]), boxes[di], detections["score"][di], now)
+                self._next_id += 1
+                self.tracks.append(track)
+                track_ids[di] = track.id
+
+        alive = []
+        for track in self.tracks:
+            if track.last_seen != now:
+                track.misses += 1
+            if track.misses >= self.max_misses and now - track.last_seen > self.max_missing_s:
+                if track.confirmed:
+                    events.append(self._event("exit", track, now))
+                continue
+            alive.append(track)
+            if track.last_seen != now:
+                continue
+
+            if not track.confirmed and track.hits >= self.min_hits:
+                track.confirmed = True
+                events.append(self._event("enter", track, now))
+
+            area = track.area()
+            track.areas.append((now, area))
+            while track.areas and now - track.areas[0][0] > self.approach_window_s:
+                track.areas.popleft()
+            smallest = min(a for _, a in track.areas)
+            growth = area / smallest if smallest > 0 else 1.0
+            if track.confirmed and not track.approaching and growth >= self.approach_ratio \
+                    and area >= self.approach_min_area * self.frame_area:
+                track.approaching = True
+                events.append(self._event("approach", track, now))
+            elif track.approaching and growth < 1.1:
+                # Re-arm once the object stops growing
+                track.approaching = False
+        self.tracks = alive
+        return track_ids, events
+
+    def stats(self):
+        return {"tracks": len(self.tracks), "confirmed": sum(t.confirmed for t in self.tracks),
+                "next_id": self._next_id, "events": dict(self.counters)}